@@ -45,4 +45,4 @@ fi
 echo "✅ All checks passed."
 echo "▶️  Launching TetOS..."
 
-python3 src/python_scripts/main.py
+python3 src/python_scripts/main.py "$@"
@@ -0,0 +1,325 @@
+# ==============================================================================
+# backup_store.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import gzip
+import json
+import time
+import zlib
+import shutil
+import hashlib
+import threading
+
+from pathlib import Path
+from typing import Optional
+from runtime import worker_pool
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# ===== Формат хранилища =====
+# <root>/objects/ab/abcdef...  — кусок файла мира, имя = sha256 несжатых данных;
+#                                первый байт — кодек ("S" zstd, "Z" zlib), дальше сжатые данные
+# <root>/snapshots/<id>.json.gz — снимок: путь -> [размер, mtime_ns, [sha256 кусков]]
+# <root>/staging/               — копии изменённых файлов, пока сервер без сохранений
+# Одинаковые куски (неизменённые части region-файлов, прошлые снимки) хранятся один раз.
+SNAPSHOT_SUFFIX = ".json.gz"
+SKIP_FILES = {"session.lock"}
+
+
+# ===== Сжатие кусков: zstd, если установлен, иначе zlib =====
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return b"S" + zstandard.ZstdCompressor(level=3).compress(data)
+    return b"Z" + zlib.compress(data, 6)
+
+
+def _decompress(blob: bytes) -> bytes:
+    tag, body = blob[:1], blob[1:]
+    if tag == b"S":
+        if zstandard is None:
+            raise RuntimeError("backup object is zstd-compressed: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return zlib.decompress(body)
+
+
+def _object_path(objects_dir: str, digest: str) -> str:
+    return os.path.join(objects_dir, digest[:2], digest)
+
+
+# ===== Работа потоков пула =====
+# Файл режется на куски по chunk_bytes; в хранилище пишутся только новые куски.
+# Запись через временный файл + os.replace: два потока с одинаковым куском не мешают друг другу.
+def _pack_file(source: str, objects_dir: str, chunk_bytes: int):
+    chunks = []
+    new_bytes = 0
+    stored_bytes = 0
+    with open(source, "rb") as f:
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            digest = hashlib.sha256(data).hexdigest()
+            chunks.append(digest)
+
+            path = _object_path(objects_dir, digest)
+            if os.path.exists(path):
+                continue
+            blob = _compress(data)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp, "wb") as out:
+                out.write(blob)
+            os.replace(temp, path)
+            new_bytes += len(data)
+            stored_bytes += len(blob)
+    return chunks, new_bytes, stored_bytes
+
+
+def _restore_file(target: str, objects_dir: str, chunks: list, mtime_ns: int) -> int:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    written = 0
+    with open(target, "wb") as out:
+        for digest in chunks:
+            with open(_object_path(objects_dir, digest), "rb") as f:
+                data = _decompress(f.read())
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"backup object {digest[:12]} is corrupted")
+            out.write(data)
+            written += len(data)
+    os.utime(target, ns=(mtime_ns, mtime_ns))
+    return written
+
+
+# ===== Снимок в процессе создания =====
+# staged: файлы, скопированные в staging (путь -> (размер, mtime_ns)),
+# reused: неизменённые файлы из прошлого снимка (путь -> запись как есть)
+class PendingSnapshot:
+    def __init__(self, snapshot_id: str, roots: list):
+        self.id = snapshot_id
+        self.roots = roots
+        self.staged = {}
+        self.reused = {}
+        self.staged_bytes = 0
+
+
+# ===== Инкрементальные бэкапы мира с дедупликацией =====
+class BackupStore:
+    def __init__(self, root: Path, chunk_bytes: int = 256 * 1024, workers: int = None):
+        self.root = Path(root)
+        self.chunk_bytes = chunk_bytes
+        self.workers = workers or os.cpu_count() or 2
+        self.objects_dir = self.root / "objects"
+        self.snapshots_dir = self.root / "snapshots"
+        self.staging_dir = self.root / "staging"
+
+        # Бэкап и восстановление одного сервера не пересекаются
+        self.lock = threading.Lock()
+
+    # ===== Список снимков: от старых к новым =====
+    def snapshot_ids(self) -> list:
+        if not self.snapshots_dir.is_dir():
+            return []
+        return sorted(p.name[:-len(SNAPSHOT_SUFFIX)] for p in self.snapshots_dir.glob("*" + SNAPSHOT_SUFFIX))
+
+    def load(self, snapshot_id: str) -> Optional[dict]:
+        path = self.snapshots_dir / (snapshot_id + SNAPSHOT_SUFFIX)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def latest(self) -> Optional[dict]:
+        for snapshot_id in reversed(self.snapshot_ids()):
+            snapshot = self.load(snapshot_id)
+            if snapshot is not None:
+                return snapshot
+        return None
+
+    # ===== Шаг 1 (сервер не пишет мир): скопировать изменённые файлы в staging =====
+    # Файл считается неизменённым, если его размер и mtime совпадают с прошлым
+    # снимком; изменённые копируются целиком, дедупликация по кускам — на шаге 2.
+    def stage(self, server_dir: Path, roots: list) -> PendingSnapshot:
+        server_dir = Path(server_dir)
+        snapshot_id = time.strftime("%Y%m%d-%H%M%S")
+        while (self.snapshots_dir / (snapshot_id + SNAPSHOT_SUFFIX)).exists():
+            time.sleep(1)
+            snapshot_id = time.strftime("%Y%m%d-%H%M%S")
+
+        previous = self.latest()
+        previous_files = previous["files"] if previous and previous.get("chunk_bytes") == self.chunk_bytes else {}
+
+        pending = PendingSnapshot(snapshot_id, roots)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+        for root in roots:
+            for dirpath, _, filenames in os.walk(server_dir / root):
+                for filename in filenames:
+                    if filename in SKIP_FILES:
+                        continue
+                    source = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(source)
+                    except OSError:
+                        continue  # файл удалили во время обхода
+                    rel = Path(source).relative_to(server_dir).as_posix()
+
+                    entry = previous_files.get(rel)
+                    if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                        pending.reused[rel] = entry
+                        continue
+
+                    target = self.staging_dir / rel
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(source, target)
+                    pending.staged[rel] = (stat.st_size, stat.st_mtime_ns)
+                    pending.staged_bytes += stat.st_size
+        return pending
+
+    # ===== Шаг 2 (сервер уже сохраняет мир): нарезать, сжать, записать снимок =====
+    def commit(self, pending: PendingSnapshot) -> dict:
+        files = dict(pending.reused)
+        new_bytes = 0
+        stored_bytes = 0
+
+        if pending.staged:
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            with worker_pool(self.workers, "tetos-backup") as pool:
+                futures = {
+                    rel: pool.submit(_pack_file, str(self.staging_dir / rel), str(self.objects_dir), self.chunk_bytes)
+                    for rel in pending.staged
+                }
+                for rel, future in futures.items():
+                    chunks, file_new, file_stored = future.result()
+                    size, mtime_ns = pending.staged[rel]
+                    files[rel] = [size, mtime_ns, chunks]
+                    new_bytes += file_new
+                    stored_bytes += file_stored
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+        snapshot = {
+            "id": pending.id,
+            "created": time.time(),
+            "roots": pending.roots,
+            "chunk_bytes": self.chunk_bytes,
+            "files": files,
+            "total_bytes": sum(entry[0] for entry in files.values()),
+            "changed_files": len(pending.staged),
+            "new_bytes": new_bytes,
+            "stored_bytes": stored_bytes,
+        }
+
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        path = self.snapshots_dir / (pending.id + SNAPSHOT_SUFFIX)
+        temp = path.with_name(path.name + ".tmp")
+        with gzip.open(temp, "wt", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(temp, path)
+        return snapshot
+
+    def discard(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    # ===== Удаление старых снимков и кусков, на которые никто не ссылается =====
+    # Возвращает (удалено снимков, удалено кусков, освобождено байт)
+    def prune(self, keep: int):
+        ids = self.snapshot_ids()
+        removed = ids[:-keep] if keep > 0 else []
+        for snapshot_id in removed:
+            (self.snapshots_dir / (snapshot_id + SNAPSHOT_SUFFIX)).unlink()
+        if not removed:
+            return 0, 0, 0
+
+        referenced = set()
+        for snapshot_id in self.snapshot_ids():
+            snapshot = self.load(snapshot_id)
+            if snapshot is None:
+                # Нечитаемый снимок: не знаем, на что он ссылается — ничего не удаляем
+                return len(removed), 0, 0
+            for entry in snapshot["files"].values():
+                referenced.update(entry[2])
+
+        objects = 0
+        freed = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if filename in referenced:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    freed += os.path.getsize(path)
+                    os.unlink(path)
+                    objects += 1
+                except OSError:
+                    pass
+        return len(removed), objects, freed
+
+    def store_size(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+
+    # ===== Восстановление снимка в папку сервера (сервер должен быть остановлен) =====
+    # Каждая папка мира собирается рядом (.<имя>.restoring) и подменяет текущую;
+    # текущая сохраняется как <имя>.pre-restore (одна, прошлая удаляется).
+    def restore(self, snapshot_id: str, server_dir: Path) -> dict:
+        snapshot = self.load(snapshot_id)
+        if snapshot is None:
+            raise FileNotFoundError(f"backup {snapshot_id} not found")
+        server_dir = Path(server_dir)
+
+        by_root = {root: {} for root in snapshot["roots"]}
+        for rel, entry in snapshot["files"].items():
+            by_root.setdefault(rel.split("/", 1)[0], {})[rel] = entry
+
+        restored_bytes = 0
+        with worker_pool(self.workers, "tetos-backup") as pool:
+            for root, files in by_root.items():
+                building = server_dir / f".{root}.restoring"
+                shutil.rmtree(building, ignore_errors=True)
+                building.mkdir(parents=True)
+
+                futures = [
+                    pool.submit(_restore_file, str(building / rel.split("/", 1)[1]), str(self.objects_dir), entry[2], entry[1])
+                    for rel, entry in files.items()
+                ]
+                try:
+                    restored_bytes += sum(future.result() for future in futures)
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    shutil.rmtree(building, ignore_errors=True)
+                    raise
+
+        # Все папки собраны — подменяем
+        replaced = []
+        for root in by_root:
+            current = server_dir / root
+            if current.exists():
+                previous = server_dir / f"{root}.pre-restore"
+                shutil.rmtree(previous, ignore_errors=True)
+                current.rename(previous)
+                replaced.append(previous.name)
+            (server_dir / f".{root}.restoring").rename(current)
+
+        return {
+            "files": len(snapshot["files"]),
+            "bytes": restored_bytes,
+            "roots": list(by_root),
+            "replaced": replaced,
+        }
@@ -0,0 +1,103 @@
+# ==============================================================================
+# bot_health.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import time
+import threading
+
+from config import (
+    GREEN,
+    YELLOW,
+    RED,
+    RESET
+    )
+
+
+# ===== Состояния бота =====
+STATE_CHECKING = "checking"
+STATE_CONNECTED = "connected"
+STATE_DEGRADED = "degraded"
+STATE_OFFLINE = "offline"
+
+# После стольких ошибок подряд бот считается offline (до этого — degraded)
+OFFLINE_AFTER_FAILURES = 3
+
+
+# ===== Кеш состояния Telegram бота с фоновым обновлением =====
+# check() — блокирующий сетевой вызов (например, bot.get_me()), выполняется
+# только в фоновом потоке: раз в ttl при успехе и с экспоненциальной
+# задержкой (до max_backoff) при ошибках.
+class BotHealthMonitor:
+    def __init__(self, check, ttl: float = 60.0, max_backoff: float = 600.0):
+        self._check = check
+        self.ttl = ttl
+        self.max_backoff = max_backoff
+
+        self.state = STATE_CHECKING
+        self.username = None
+        self.last_error = None
+        self.failures = 0
+        self._last_check = None
+        self._thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="tetos-bot-health", daemon=True)
+        self._thread.start()
+
+    # Внеочередная проверка (например, после смены токена)
+    def refresh_now(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            delay = self.check_once()
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    # Одна проверка; возвращает задержку до следующей
+    def check_once(self) -> float:
+        try:
+            info = self._check()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            if self.username is not None and self.failures < OFFLINE_AFTER_FAILURES:
+                self.state = STATE_DEGRADED
+            else:
+                self.state = STATE_OFFLINE
+            self._last_check = time.monotonic()
+            return min(self.max_backoff, self.ttl * (2 ** (self.failures - 1)) / 4)
+
+        self.username = getattr(info, "username", None)
+        self.failures = 0
+        self.last_error = None
+        self.state = STATE_CONNECTED
+        self._last_check = time.monotonic()
+        return self.ttl
+
+    # Сколько секунд назад была последняя проверка (None — ещё не было)
+    def age(self):
+        if self._last_check is None:
+            return None
+        return time.monotonic() - self._last_check
+
+    # Готовая строка для info и баннера (без сетевых запросов)
+    def status_text(self) -> str:
+        age = self.age()
+        checked = f"checked {age:.0f}s ago" if age is not None else "first check pending"
+
+        if self.state == STATE_CONNECTED:
+            return f"{GREEN}Connected (@{self.username}, {checked}){RESET}"
+        if self.state == STATE_DEGRADED:
+            return f"{YELLOW}Degraded (@{self.username}, {self.failures} failed checks, {checked}){RESET}"
+        if self.state == STATE_OFFLINE:
+            return f"{RED}Offline / invalid token ({checked}){RESET}"
+        return f"{YELLOW}Checking...{RESET}"
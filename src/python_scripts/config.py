@@ -36,22 +36,133 @@ TELEGRAM_BOT = None
 TELEGRAM_LIB_AVAILABLE = False
 TELEGRAM_BOT_THREAD = None
 TELEGRAM_BOT_RUNNING = False
+TELEGRAM_BOT_STARTING = False   # бот поднимается в фоне после появления prompt
 TELEGRAM_BOT_NOTIFICATION = False
 TELEGRAM_USERS_FILE = Path(__file__).resolve().parent.parent / "telegram_cache" / "tg_users.txt"
 TELEGRAM_USERS_FILE.parent.mkdir(parents=True, exist_ok=True)
+TELEGRAM_USERS_JOURNAL = TELEGRAM_USERS_FILE.with_suffix(".journal")
+TELEGRAM_USERS_COMPACT_EVERY = 500   # записей журнала до пересборки tg_users.txt
+TELEGRAM_DISPATCHER = None
+TELEGRAM_HEALTH = None
+TELEGRAM_HEALTH_TTL = 60.0            # сек между проверками get_me() при успехе
+TELEGRAM_HEALTH_MAX_BACKOFF = 600.0   # максимальная задержка после ошибок
+TELEGRAM_DISPATCH_WORKERS = 4
+TELEGRAM_DISPATCH_QUEUE_SIZE = 10000
+TELEGRAM_GLOBAL_RATE = 30.0     # сообщений в секунду на бота
+TELEGRAM_CHAT_RATE = 1.0        # сообщений в секунду в один чат
+TELEGRAM_MAX_RETRIES = 5
 
 
-# ===== Состояние сервера =====
-SERVER_IS_READY = False
-SERVER_GAME_MODE = "UNKNOWN"
-SERVER_MC_VERSION = "UNKNOWN"
-SERVER_PROCESS = None
-SERVER_ONLINE_PLAYERS = 0
-SERVER_MAX_PLAYERS = 1
-SERVER_MAX_RAM_MB = 2048
-SERVER_IP = "0"
-SERVER_LOCAL_IP = "0"
-SERVER_PORT = "0"
+# ===== Цикл asyncio (runtime.AsyncRuntime, создаётся в server_commands) =====
+RUNTIME = None
+RUNTIME_BLOCKING_WORKERS = 8   # потоков для блокирующей работы из цикла
+
+
+# ===== Экземпляры серверов =====
+# Основной сервер — SERVER_DIR + RUN_SCRIPT; дополнительные ищутся в
+# SERVERS_DIR/<name>/ с собственным run_server.sh.
+SERVERS_DIR = PROJECT_ROOT / "servers"
+INSTANCE_RUN_SCRIPT_NAME = "run_server.sh"
+MAIN_INSTANCE_NAME = "main"
+SERVER_INSTANCES = {}          # имя -> ServerInstance (заполняет server_commands)
+ACTIVE_INSTANCE = None         # экземпляр, к которому относятся команды CLI
+INSTANCE_POOL_WORKERS = 8      # потоков для start/stop all
+
+
+# ===== Остановка сервера: save-all -> stop -> SIGTERM -> SIGKILL =====
+SERVER_SAVE_TIMEOUT = 30.0             # сек ожидания "Saved the game" после save-all
+SERVER_STOP_TIMEOUT = 60.0             # сек после "stop" до SIGTERM
+SERVER_TERM_TIMEOUT = 15.0             # сек после SIGTERM до SIGKILL
+SERVER_STOP_PROGRESS_INTERVAL = 5.0    # как часто печатать "stopping... Ns"
+PORT_OWNER_TERM_TIMEOUT = 15.0         # start --hard: сек после SIGTERM чужому серверу до SIGKILL
+
+
+# ===== Память и флаги JVM (set jvm-profile, set ram-max) =====
+JVM_HEAP_HEADROOM_MB = 1536    # МБ доступной памяти, которые оставляем ОС и не-heap памяти JVM
+JVM_AUTO_CAP_HEAP = True       # урезать -Xmx до доступной памяти; False — только предупреждать
+
+
+# ===== Детектор лагов: MSPT из замеров метрик (tick query) =====
+LAG_THRESHOLD_MS = 50.0                # EWMA MSPT выше — тик не укладывается в 50 мс (< 20 TPS)
+LAG_CLEAR_MS = 40.0                    # восстановление — EWMA ниже этого (гистерезис)
+LAG_HOLD_SECONDS = 15.0                # сколько лаг должен длиться до уведомления
+LAG_CLEAR_HOLD_SECONDS = 30.0          # сколько MSPT должен быть в норме до "recovered"
+LAG_EWMA_ALPHA = 0.3                   # вес нового замера в EWMA
+LAG_WINDOW_SECONDS = 60.0              # окно p95 MSPT и пауз GC в уведомлении
+LAG_COOLDOWN_SECONDS = 300.0           # новый лаг раньше этого после восстановления — без уведомлений
+
+
+# ===== GC лог JVM (set gc-log, команда gc) =====
+GC_LOG_FILE = "logs/gc.log"            # относительно папки сервера
+GC_LOG_FILE_COUNT = 5                  # ротация: файлов
+GC_LOG_FILE_SIZE = "20M"               # ротация: размер одного файла
+GC_POLL_INTERVAL = 1.0                 # сек между дочитываниями gc.log
+GC_HISTORY_SECONDS = 3600.0            # сколько пауз держим в памяти
+GC_LONG_PAUSE_MS = 200.0               # пауза длиннее — событие и предупреждение
+
+
+# ===== Сетевые адреса (кеш для get-ip, /info и уведомлений) =====
+NETWORK_ADDRESSES = None
+NETWORK_REFRESH_INTERVAL = 60.0        # сек между плановыми обновлениями
+NETWORK_CHANGE_POLL_INTERVAL = 2.0     # сек между проверками набора интерфейсов
+
+
+# ===== Размер мира =====
+WORLD_SIZE_REFRESH_INTERVAL = 30.0        # сек между инкрементальными обновлениями
+WORLD_SIZE_FULL_RESCAN_INTERVAL = 600.0   # сек между полными проходами
+WORLD_STATS_WORKERS = None                # потоков для world stats; None — по числу ядер
+WORLD_STATS_TOP = 5                       # крупнейших чанков / файлов с потерями в отчёте
+
+
+# ===== Обрезка мира (world trim, только при остановленном сервере) =====
+WORLD_TRIM_MIN_INHABITED = "1m"           # чанки, где игроки провели меньше (по InhabitedTime), удаляются
+WORLD_TRIM_SPAWN_RADIUS = 1024            # блоков вокруг спавна (overworld) и 0,0 (остальные измерения) не трогаем
+WORLD_TRIM_PROTECTED = {}                 # измерение -> [(x, z, радиус в блоках)], например {"overworld": [(5000, -200, 512)]}
+
+
+# ===== Прегенерация чанков (pregen) =====
+PREGEN_DIR = Path(__file__).resolve().parent.parent / "pregen_data"
+PREGEN_MSPT_BUDGET = 40.0              # MSPT выше — пачка меньше, паузы длиннее
+PREGEN_TILE_CHUNKS = 4                 # сторона плитки спирали в чанках (одна команда forceload)
+PREGEN_MAX_BATCH_TILES = 16            # плиток в пачке максимум (forceload держит не больше 256 чанков)
+PREGEN_MIN_DWELL = 2.0                 # сек минимум между forceload add и remove
+PREGEN_MAX_DWELL = 30.0                # сек максимум ожидания возврата MSPT в бюджет
+PREGEN_IDLE_POLL = 5.0                 # сек между проверками, пока сервер не готов или не те часы
+PREGEN_ACTIVE_HOURS = None             # например "01-07": генерировать только ночью (--hours)
+
+
+# ===== Бэкапы мира (backup, restore) =====
+BACKUP_DIR = PROJECT_ROOT / "backups"
+BACKUP_KEEP = 10                       # снимков на сервер; старые удаляются после нового бэкапа
+BACKUP_CHUNK_BYTES = 256 * 1024        # размер куска для дедупликации (кратен секторам region-файла)
+BACKUP_WORKERS = None                  # потоков для сжатия; None — по числу ядер
+BACKUP_SAVE_TIMEOUT = 120.0            # сек ожидания "Saved the game" после save-all flush
+
+
+# ===== Метрики сервера =====
+METRICS_SAMPLE_INTERVAL = 5.0       # сек между замерами
+METRICS_HISTORY_SECONDS = 3600.0    # глубина кольцевых буферов
+STATS_WINDOWS = ["1m", "15m", "1h"]
+METRICS_STORE_DIR = Path(__file__).resolve().parent.parent / "metrics_data"
+METRICS_SEGMENT_RECORDS = 65536     # записей в одном mmap-сегменте (2 MB)
+METRICS_KEEP_SEGMENTS = {"raw": 2, "1m": 4, "1h": 8}
+METRICS_EXPORTER = None
+METRICS_EXPORTER_ENABLED = False      # METRICS_EXPORTER=true в .env
+METRICS_EXPORTER_HOST = "127.0.0.1"   # METRICS_EXPORTER_HOST в .env
+METRICS_EXPORTER_PORT = 9325          # METRICS_EXPORTER_PORT в .env
+
+
+# ===== Вывод консоли сервера =====
+CONSOLE_FLUSH_INTERVAL = 0.005   # сек, за которые копится пачка строк перед выводом
+
+
+# ===== Архив консоли сервера =====
+LOG_ARCHIVE_ENABLED = True
+LOG_ARCHIVE_DIR = Path(__file__).resolve().parent.parent / "logs_archive"
+LOG_ARCHIVE_SEGMENT_BYTES = 32 * 1024 * 1024   # сжатый размер сегмента до ротации
+LOG_ARCHIVE_KEEP_SEGMENTS = 50
+LOG_ARCHIVE_BLOCK_LINES = 2048                 # строк в одном сжатом блоке (максимум)
+LOG_ARCHIVE_FLUSH_INTERVAL = 1.0               # сек между сбросами на диск
 
 
 # ===== Настройки для Minecraft =====
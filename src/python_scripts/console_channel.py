@@ -0,0 +1,157 @@
+# ==============================================================================
+# console_channel.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import re
+import time
+import threading
+
+from typing import Optional
+
+
+# ===== Сколько ещё прятать хвост ответа после его получения (сек) =====
+SWALLOW_GRACE_SECONDS = 0.5
+
+
+# ===== Ожидающий ответа запрос =====
+class _PendingRequest:
+    __slots__ = ("key", "pattern", "swallow", "future", "deadline")
+
+    def __init__(self, key, pattern, swallow, future, deadline):
+        self.key = key
+        self.pattern = pattern
+        self.swallow = swallow
+        self.future = future
+        self.deadline = deadline
+
+
+# ===== Канал команд консоли: запись в stdin + ответ через единственную задачу чтения =====
+class ConsoleChannel:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._write = None
+        self._pending = []
+        self._swallow_until = {}
+
+    # Привязка к запущенному процессу сервера: write(text) -> bool ставит
+    # текст в очередь записи в stdin и не блокирует
+    def attach(self, write):
+        with self._lock:
+            self._write = write
+
+    # Процесс завершился: все ожидающие запросы завершаются ошибкой
+    def detach(self):
+        with self._lock:
+            self._write = None
+            pending, self._pending = self._pending, []
+            self._swallow_until.clear()
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(ConnectionError("server process exited"))
+
+    # Простая отправка команды без ожидания ответа
+    def send(self, command: str) -> bool:
+        write = self._write
+        if write is None:
+            return False
+        try:
+            return write(command + "\n")
+        except (BrokenPipeError, ValueError, OSError):
+            return False
+
+    # Отправка команды и Future, который разрешит задача чтения первой строкой,
+    # подходящей под pattern. Одинаковые запросы в полёте склеиваются в один.
+    def request(self, command: str, pattern, timeout: float = 5.0, swallow=None) -> "Future":
+        # concurrent.futures тянет logging — грузим при первом запросе, не при старте
+        from concurrent.futures import Future
+
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        if isinstance(swallow, str):
+            swallow = re.compile(swallow)
+
+        key = (command, pattern.pattern)
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            for request in self._pending:
+                if request.key == key:
+                    return request.future
+
+            future = Future()
+            request = _PendingRequest(key, pattern, swallow, future, now + timeout)
+            self._pending.append(request)
+
+        if not self.send(command):
+            with self._lock:
+                if request in self._pending:
+                    self._pending.remove(request)
+            future.set_exception(ConnectionError("server is not running"))
+        return future
+
+    # Вызывается задачей чтения для каждой строки.
+    # Возвращает True, если строка — служебный ответ и её не нужно выводить.
+    def feed(self, line: str) -> bool:
+        if not self._pending and not self._swallow_until:
+            return False
+
+        hide = False
+        resolved = []
+        now = time.monotonic()
+
+        with self._lock:
+            for request in list(self._pending):
+                match = request.pattern.search(line)
+                if match is not None:
+                    self._pending.remove(request)
+                    resolved.append((request, match))
+                    if request.swallow is not None:
+                        self._swallow_until[request.swallow] = now + SWALLOW_GRACE_SECONDS
+                    hide = hide or request.swallow is not None
+                elif request.swallow is not None and request.swallow.search(line):
+                    hide = True
+
+            for swallow, until in list(self._swallow_until.items()):
+                if until < now:
+                    del self._swallow_until[swallow]
+                elif swallow.search(line):
+                    hide = True
+
+            self._expire(now)
+
+        for request, match in resolved:
+            if not request.future.done():
+                request.future.set_result(match)
+        return hide
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # Просроченные запросы завершаются TimeoutError (вызывать под self._lock)
+    def _expire(self, now: float):
+        if not self._pending:
+            return
+        from concurrent.futures import TimeoutError
+
+        alive = []
+        for request in self._pending:
+            if request.deadline < now:
+                if not request.future.done():
+                    request.future.set_exception(TimeoutError(f"no response to '{request.key[0]}'"))
+            else:
+                alive.append(request)
+        self._pending = alive
+
+
+# ===== Синхронная обёртка: отправить и дождаться ответа =====
+def query(channel: ConsoleChannel, command: str, pattern, timeout: float = 5.0, swallow=None) -> Optional[re.Match]:
+    try:
+        return channel.request(command, pattern, timeout=timeout, swallow=swallow).result(timeout=timeout)
+    except Exception:
+        return None
@@ -0,0 +1,143 @@
+# ==============================================================================
+# console_renderer.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import re
+import sys
+import time
+import threading
+
+from collections import deque
+
+
+# ===== Уровни логов Minecraft/log4j по возрастанию важности =====
+LOG_LEVELS = [
+    "trace",
+    "debug",
+    "info",
+    "warn",
+    "error",
+    "fatal",
+]
+
+# "[12:00:00] [Server thread/WARN]: ..." и "[12:00:00 WARN]: ..." (Paper)
+_LEVEL_PATTERN = re.compile(r"[/ ](TRACE|DEBUG|INFO|WARN|ERROR|FATAL)\]")
+_LEVEL_RANK = {level.upper(): rank for rank, level in enumerate(LOG_LEVELS)}
+
+
+# ===== Буферизированный вывод консоли сервера с фильтрами =====
+# Строки копятся в очереди и пишутся одним write + flush: после первой
+# строки поток ждёт flush_interval, собирая всю пачку. Фильтры влияют только
+# на вывод — события и архив получают все строки.
+class ConsoleRenderer:
+    def __init__(self, stream=None, flush_interval: float = 0.005, max_pending: int = 100_000, prefix: str = ""):
+        self.stream = stream or sys.stdout
+        self.prefix = prefix   # "[lobby] ", когда в одну консоль пишут несколько серверов
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.min_level = 0
+        self.mute_patterns = []
+        self.only_patterns = []
+        self._last_level = _LEVEL_RANK["INFO"]
+
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.hidden = 0
+        self.dropped = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="tetos-console", daemon=True)
+            self._thread.start()
+
+    # ===== Фильтры =====
+    def has_filters(self) -> bool:
+        return bool(self.min_level or self.mute_patterns or self.only_patterns)
+
+    def set_level(self, level: str) -> bool:
+        level = level.lower()
+        if level not in LOG_LEVELS:
+            return False
+        self.min_level = LOG_LEVELS.index(level)
+        return True
+
+    def mute(self, pattern: str):
+        self.mute_patterns = self.mute_patterns + [re.compile(pattern)]
+
+    def unmute(self, pattern: str) -> bool:
+        kept = [regex for regex in self.mute_patterns if regex.pattern != pattern]
+        removed = len(kept) != len(self.mute_patterns)
+        self.mute_patterns = kept
+        return removed
+
+    def only(self, pattern: str):
+        self.only_patterns = self.only_patterns + [re.compile(pattern)]
+
+    def reset(self):
+        self.min_level = 0
+        self.mute_patterns = []
+        self.only_patterns = []
+
+    def is_visible(self, line: str) -> bool:
+        if self.min_level:
+            match = _LEVEL_PATTERN.search(line, 0, 64)
+            # Строки без уровня (стектрейсы) наследуют уровень предыдущей
+            if match is not None:
+                self._last_level = _LEVEL_RANK[match.group(1)]
+            if self._last_level < self.min_level:
+                return False
+        for regex in self.mute_patterns:
+            if regex.search(line):
+                return False
+        if self.only_patterns:
+            return any(regex.search(line) for regex in self.only_patterns)
+        return True
+
+    # Вызывается из потока чтения
+    def write(self, line: str):
+        if self.has_filters() and not self.is_visible(line):
+            self.hidden += 1
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append(self.prefix + line)
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Даём пачке накопиться, затем один write на всю пачку
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        chunks = []
+        while self._pending:
+            chunks.append(self._pending.popleft())
+        try:
+            self.stream.write("".join(chunks))
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    # Текущие фильтры для команды "log"
+    def describe(self) -> list:
+        lines = [f"level >= {LOG_LEVELS[self.min_level]}"]
+        lines += [f"mute: {regex.pattern}" for regex in self.mute_patterns]
+        lines += [f"only: {regex.pattern}" for regex in self.only_patterns]
+        return lines
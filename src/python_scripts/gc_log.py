@@ -0,0 +1,288 @@
+# ==============================================================================
+# gc_log.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import re
+import time
+import bisect
+import threading
+
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from metrics_sampler import percentile
+from config import (
+    RED,
+    RESET
+    )
+
+
+# ===== Строки unified logging JVM (-Xlog:gc*, декораторы time,uptime,level,tags) =====
+# [2026-10-18T12:00:00.123+0000][12.345s][info][gc] GC(3) Pause Young (Normal) (G1 Evacuation Pause) 512M->128M(2048M) 12.345ms
+# [2026-10-18T12:00:00.123+0000][12.345s][info][gc,phases] GC(7) Pause Mark Start 0.012ms                 (ZGC)
+# [2026-10-18T12:00:00.123+0000][12.345s][info][gc] GC(7) Garbage Collection (Allocation Rate) 1024M(50%)->256M(12%)  (ZGC)
+_DECORATORS = re.compile(r"((?:\[[^\]]*\])+)\s*")
+_TIME_DECORATOR = re.compile(r"\[(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d+[+-]\d{4})\]")
+_PAUSE = re.compile(
+    r"GC\((?P<id>\d+)\) (?P<kind>Pause .*?) "
+    r"(?:(?P<before>\d+)(?P<before_unit>[KMG])->(?P<after>\d+)(?P<after_unit>[KMG])\((?P<total>\d+)(?P<total_unit>[KMG])\) )?"
+    r"(?P<ms>[\d.]+)ms\s*$"
+)
+_CYCLE = re.compile(
+    r"GC\((?P<id>\d+)\) Garbage Collection \(.*?\) "
+    r"(?P<before>\d+)(?P<before_unit>[KMG])\(\d+%\)->(?P<after>\d+)(?P<after_unit>[KMG])\(\d+%\)"
+)
+
+_UNIT_MB = {"K": 1 / 1024, "M": 1.0, "G": 1024.0}
+
+
+def _mb(value: str, unit: str) -> float:
+    return int(value) * _UNIT_MB[unit]
+
+
+# ===== Одна пауза / одно изменение heap =====
+class GcPauseRecord:
+    __slots__ = ("timestamp", "gc_id", "kind", "pause_ms", "line")
+
+    def __init__(self, timestamp, gc_id, kind, pause_ms, line):
+        self.timestamp = timestamp
+        self.gc_id = gc_id
+        self.kind = kind
+        self.pause_ms = pause_ms
+        self.line = line
+
+
+class GcHeapRecord:
+    __slots__ = ("timestamp", "before_mb", "after_mb")
+
+    def __init__(self, timestamp, before_mb, after_mb):
+        self.timestamp = timestamp
+        self.before_mb = before_mb
+        self.after_mb = after_mb
+
+
+# ===== Разбор строки: (пауза или None, heap или None) =====
+def parse_gc_line(line: str, now: float = None):
+    decorators = _DECORATORS.match(line)
+    if decorators is None:
+        return None, None
+    message = line[decorators.end():]
+
+    timestamp = now if now is not None else time.time()
+    stamp = _TIME_DECORATOR.search(decorators.group(1))
+    if stamp is not None:
+        try:
+            timestamp = datetime.strptime(stamp.group(1), "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+        except ValueError:
+            pass
+
+    pause = heap = None
+    match = _PAUSE.search(message)
+    if match is not None:
+        pause = GcPauseRecord(timestamp, int(match.group("id")), match.group("kind").strip(), float(match.group("ms")), line.rstrip())
+    else:
+        match = _CYCLE.search(message)
+
+    if match is not None and match.group("before") is not None:
+        heap = GcHeapRecord(
+            timestamp,
+            _mb(match.group("before"), match.group("before_unit")),
+            _mb(match.group("after"), match.group("after_unit"))
+        )
+    return pause, heap
+
+
+# ===== Чтение растущего файла с места остановки =====
+# Помнит открытый файл и позицию. Ротация JVM (gc.log -> gc.log.0, новый gc.log)
+# видна по смене inode: старый файл дочитывается через открытый дескриптор, новый
+# читается с начала. Файл, ставший короче позиции (перезапуск JVM), — тоже с начала.
+class LogTailer:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+        self._partial = b""
+
+    # Начать с текущего конца файла: история прошлых запусков не нужна
+    def seek_end(self):
+        self.close()
+        try:
+            self._file = open(self.path, "rb")
+            self._file.seek(0, os.SEEK_END)
+        except OSError:
+            self._file = None
+
+    def read_lines(self) -> list:
+        lines = []
+        if self._file is None:
+            try:
+                self._file = open(self.path, "rb")
+            except OSError:
+                return lines
+
+        lines.extend(self._drain())
+
+        try:
+            current = os.stat(self.path)
+        except OSError:
+            return lines  # между ротациями файла может не быть
+
+        opened = os.fstat(self._file.fileno())
+        if (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self._file.close()
+            self._file = None
+            self._partial = b""
+            lines.extend(self.read_lines())
+        elif current.st_size < self._file.tell():
+            self._file.seek(0)
+            self._partial = b""
+            lines.extend(self._drain())
+        return lines
+
+    def _drain(self) -> list:
+        data = self._file.read()
+        if not data:
+            return []
+        data = self._partial + data
+        *lines, self._partial = data.split(b"\n")
+        return [line.decode("utf-8", errors="replace") for line in lines]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._partial = b""
+
+
+# ===== Статистика GC одного сервера =====
+# Поток "tetos-gc-<name>" раз в poll_interval дочитывает gc.log; паузы длиннее
+# long_pause_ms отдаются в on_long_pause (события сервера).
+class GcMonitor:
+    def __init__(self, path: Path, name: str = "main", poll_interval: float = 1.0,
+                 history_seconds: float = 3600.0, long_pause_ms: float = 200.0, on_long_pause=None):
+        self.path = Path(path)
+        self.name = name
+        self.poll_interval = poll_interval
+        self.history_seconds = history_seconds
+        self.long_pause_ms = long_pause_ms
+        self.on_long_pause = on_long_pause
+
+        self._tailer = LogTailer(self.path)
+        self._pauses = deque()
+        self._heap = deque()
+        self._lock = threading.Lock()
+        self._tail_lock = threading.Lock()
+        self._thread = None
+
+    # Вызывается при каждом запуске сервера: старое содержимое файла пропускается
+    def start(self, path: Path = None):
+        with self._tail_lock:
+            if path is not None:
+                self.path = Path(path)
+                self._tailer.path = self.path
+            self._tailer.seek_end()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f"tetos-gc-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"{RED}❌ GC log read failed ({self.path}): {e}{RESET}")
+            time.sleep(self.poll_interval)
+
+    def poll(self) -> int:
+        with self._tail_lock:
+            lines = self._tailer.read_lines()
+        if not lines:
+            return 0
+
+        long_pauses = []
+        with self._lock:
+            for line in lines:
+                pause, heap = parse_gc_line(line)
+                if pause is not None:
+                    self._pauses.append(pause)
+                    if pause.pause_ms >= self.long_pause_ms:
+                        long_pauses.append(pause)
+                if heap is not None:
+                    self._heap.append(heap)
+            self._prune(time.time() - self.history_seconds)
+
+        if self.on_long_pause is not None:
+            for pause in long_pauses:
+                self.on_long_pause(pause)
+        return len(lines)
+
+    def _prune(self, cutoff: float):
+        while self._pauses and self._pauses[0].timestamp < cutoff:
+            self._pauses.popleft()
+        while self._heap and self._heap[0].timestamp < cutoff:
+            self._heap.popleft()
+
+    def has_data(self) -> bool:
+        return bool(self._pauses or self._heap)
+
+    # ===== Паузы, аллокация и heap после GC за последние seconds =====
+    def window_stats(self, seconds: float) -> dict:
+        now = time.time()
+        start = now - seconds
+        with self._lock:
+            pauses = list(self._pauses)
+            heap = list(self._heap)
+        pauses = pauses[bisect.bisect_left([p.timestamp for p in pauses], start):]
+        heap = heap[bisect.bisect_left([h.timestamp for h in heap], start):]
+
+        durations = sorted(p.pause_ms for p in pauses)
+        result = {
+            "pauses": len(durations),
+            "total_ms": sum(durations),
+            "p50_ms": percentile(durations, 0.50) if durations else None,
+            "p99_ms": percentile(durations, 0.99) if durations else None,
+            "max_ms": durations[-1] if durations else None,
+            "long_pauses": sum(1 for d in durations if d >= self.long_pause_ms),
+            "pause_share": sum(durations) / (seconds * 1000.0) if durations else 0.0,
+            "alloc_mb_s": None,
+            "heap_after": None,
+        }
+
+        # Аллокация: сколько heap выросло между концом одной сборки и началом следующей
+        if len(heap) >= 2:
+            allocated = sum(max(0.0, cur.before_mb - prev.after_mb) for prev, cur in zip(heap, heap[1:]))
+            span = heap[-1].timestamp - heap[0].timestamp
+            if span > 0:
+                result["alloc_mb_s"] = allocated / span
+
+        # Heap после GC: min/avg/последнее и наклон (МБ в минуту, МНК)
+        if heap:
+            after = [h.after_mb for h in heap]
+            slope = None
+            if len(heap) >= 2:
+                t0 = heap[0].timestamp
+                xs = [h.timestamp - t0 for h in heap]
+                mean_x = sum(xs) / len(xs)
+                mean_y = sum(after) / len(after)
+                variance = sum((x - mean_x) ** 2 for x in xs)
+                if variance > 0:
+                    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, after)) / variance * 60.0
+            result["heap_after"] = {
+                "min": min(after),
+                "avg": sum(after) / len(after),
+                "last": after[-1],
+                "trend_mb_min": slope,
+            }
+        return result
+
+    def last_pause(self) -> Optional[GcPauseRecord]:
+        with self._lock:
+            return self._pauses[-1] if self._pauses else None
@@ -0,0 +1,248 @@
+# ==============================================================================
+# jvm_profiles.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import re
+
+from typing import Optional
+
+
+# ===== Профили JVM для set jvm-profile =====
+JVM_PROFILES = ("default", "g1-tuned", "zgc", "low-latency")
+
+# Профиль, записанный tetOS, хранится комментарием над строкой exec java
+PROFILE_MARKER = "# tetos-jvm-profile:"
+JAVA_LINE_PATTERN = r"exec java .*"
+
+# Флаги без заданного профиля, но с -XX: — набран вручную, не трогаем
+CUSTOM_PROFILE = "custom"
+
+# Unified GC logging: -Xlog:gc*:file=<путь>:<декораторы>:filecount=N,filesize=S
+GC_LOG_DECORATORS = "time,uptime,level,tags"
+
+# Общие для всех настроенных профилей: память heap забирается сразу при
+# старте (без подкачки страниц во время игры), System.gc() из плагинов игнорируется
+COMMON_FLAGS = [
+    "-XX:+AlwaysPreTouch",
+    "-XX:+DisableExplicitGC",
+    "-XX:+PerfDisableSharedMem",
+]
+
+
+# ===== Размер региона G1 по размеру heap =====
+# Как во флагах Aikar: 8M до 12G, 16M выше; маленьким heap — 4M, очень большим — 32M
+def g1_region_mb(heap_mb: int) -> int:
+    if heap_mb <= 4 * 1024:
+        return 4
+    if heap_mb <= 12 * 1024:
+        return 8
+    if heap_mb <= 24 * 1024:
+        return 16
+    return 32
+
+
+# ===== Флаги GC профиля для данного heap (без -Xms/-Xmx) =====
+def profile_flags(profile: str, heap_mb: int) -> list:
+    if profile == "default":
+        return []
+
+    if profile == "zgc":
+        return ["-XX:+UseZGC"] + COMMON_FLAGS
+
+    region = g1_region_mb(heap_mb)
+    large = heap_mb > 12 * 1024
+
+    if profile == "g1-tuned":
+        # Флаги Aikar для серверов Minecraft (для heap больше 12G — их "large" вариант)
+        return [
+            "-XX:+UseG1GC",
+            "-XX:+ParallelRefProcEnabled",
+            "-XX:MaxGCPauseMillis=200",
+            "-XX:+UnlockExperimentalVMOptions",
+        ] + COMMON_FLAGS + [
+            f"-XX:G1NewSizePercent={40 if large else 30}",
+            f"-XX:G1MaxNewSizePercent={50 if large else 40}",
+            f"-XX:G1HeapRegionSize={region}M",
+            f"-XX:G1ReservePercent={15 if large else 20}",
+            "-XX:G1HeapWastePercent=5",
+            "-XX:G1MixedGCCountTarget=4",
+            f"-XX:InitiatingHeapOccupancyPercent={20 if large else 15}",
+            "-XX:G1MixedGCLiveThresholdPercent=90",
+            "-XX:G1RSetUpdatingPauseTimePercent=5",
+            "-XX:SurvivorRatio=32",
+            "-XX:MaxTenuringThreshold=1",
+        ]
+
+    if profile == "low-latency":
+        # G1 с короткими паузами: чаще и меньше сборки ценой пропускной способности
+        return [
+            "-XX:+UseG1GC",
+            "-XX:+ParallelRefProcEnabled",
+            "-XX:MaxGCPauseMillis=50",
+            "-XX:+UnlockExperimentalVMOptions",
+        ] + COMMON_FLAGS + [
+            "-XX:G1NewSizePercent=40",
+            "-XX:G1MaxNewSizePercent=60",
+            f"-XX:G1HeapRegionSize={region}M",
+            "-XX:G1ReservePercent=20",
+            "-XX:G1MixedGCCountTarget=8",
+            "-XX:InitiatingHeapOccupancyPercent=15",
+            "-XX:MaxTenuringThreshold=1",
+        ]
+
+    raise ValueError(f"unknown JVM profile: {profile}")
+
+
+# ===== Разбор размеров памяти: "6G" -> 6144, "512M" -> 512 =====
+def size_to_mb(value: str) -> Optional[int]:
+    match = re.fullmatch(r"(\d+)([KMGkmg]?)", value)
+    if not match:
+        return None
+    number, unit = int(match.group(1)), match.group(2).upper()
+    if unit == "G":
+        return number * 1024
+    if unit == "K":
+        return number // 1024
+    if unit == "M":
+        return number
+    return number // (1024 * 1024)  # без суффикса — байты
+
+
+def format_size_mb(mb: int) -> str:
+    return f"{mb // 1024}G" if mb % 1024 == 0 else f"{mb}M"
+
+
+# ===== Строка exec java из run_server.sh =====
+# Флаги до "-jar" (или до первого аргумента без "-") делятся на управляемые
+# tetOS (-Xms, -Xmx, -XX:) и прочие (-D..., -Xlog..., и т.п.), которые
+# переносятся в новую строку как есть. Всё после флагов сохраняется дословно.
+class JavaCommand:
+    def __init__(self, line: str):
+        self.line = line
+        self.xms = None
+        self.xmx = None
+        self.xx_flags = []
+        self.extra_flags = []
+        self.tail = ""
+
+        rest = line[len("exec java"):]
+        for token in re.finditer(r"\S+", rest):
+            value = token.group(0)
+            # Флаги в кавычках ("-Xlog:gc*:...") — тоже флаги
+            bare = value.strip("\"'")
+            if bare == "-jar" or not bare.startswith("-"):
+                self.tail = rest[token.start():]
+                break
+            if value.startswith("-Xms"):
+                self.xms = value[4:]
+            elif value.startswith("-Xmx"):
+                self.xmx = value[4:]
+            elif value.startswith("-XX:"):
+                self.xx_flags.append(value)
+            else:
+                self.extra_flags.append(value)
+
+    def heap_mb(self) -> Optional[int]:
+        return size_to_mb(self.xmx) if self.xmx else None
+
+    def flags(self) -> list:
+        heap = []
+        if self.xms:
+            heap.append(f"-Xms{self.xms}")
+        if self.xmx:
+            heap.append(f"-Xmx{self.xmx}")
+        return heap + self.xx_flags + self.extra_flags
+
+    def render(self) -> str:
+        return " ".join(["exec java"] + self.flags() + ([self.tail] if self.tail else []))
+
+    # -Xlog:gc... из прочих флагов; None — GC лог выключен
+    def gc_log_flag(self) -> Optional[str]:
+        for flag in self.extra_flags:
+            if flag.strip("\"'").startswith("-Xlog:gc"):
+                return flag
+        return None
+
+    def set_gc_log_flag(self, flag: Optional[str]):
+        self.extra_flags = [f for f in self.extra_flags if not f.strip("\"'").startswith("-Xlog:gc")]
+        if flag is not None:
+            self.extra_flags.append(flag)
+
+
+# ===== Флаг GC лога с ротацией (в кавычках: "*" не должен раскрываться shell) =====
+def build_gc_log_flag(path: str, file_count: int, file_size: str) -> str:
+    return f'"-Xlog:gc*:file={path}:{GC_LOG_DECORATORS}:filecount={file_count},filesize={file_size}"'
+
+
+# Путь файла из флага -Xlog (относительно папки сервера)
+def gc_log_path(flag: str) -> Optional[str]:
+    match = re.search(r":file=([^:\"']+)", flag)
+    return match.group(1) if match else None
+
+
+def find_java_line(content: str) -> Optional[str]:
+    match = re.search(JAVA_LINE_PATTERN, content)
+    return match.group(0) if match else None
+
+
+# default — без -XX:, custom — -XX: набраны вручную
+def read_profile(content: str) -> str:
+    match = re.search(re.escape(PROFILE_MARKER) + r"\s*(\S+)", content)
+    if match and match.group(1) in JVM_PROFILES:
+        return match.group(1)
+    line = find_java_line(content)
+    if line and JavaCommand(line).xx_flags:
+        return CUSTOM_PROFILE
+    return "default"
+
+
+# ===== Новый текст run_server.sh =====
+# profile=None — оставить текущий. Для профилей tetOS флаги пересчитываются
+# под новый heap (размер региона G1), у custom меняются только -Xms/-Xmx.
+# gc_log: False — не трогать, None — выключить, строка — новый флаг -Xlog.
+# Возвращает (новый текст, JavaCommand) или None, если строки exec java нет.
+def rewrite_run_script(content: str, profile: str = None, xms: str = None, xmx: str = None, gc_log=False):
+    line = find_java_line(content)
+    if line is None:
+        return None
+
+    command = JavaCommand(line)
+    if xms is not None:
+        command.xms = xms
+    if xmx is not None:
+        command.xmx = xmx
+    if gc_log is not False:
+        command.set_gc_log_flag(gc_log)
+
+    current = read_profile(content)
+    profile = profile or current
+    if profile != CUSTOM_PROFILE:
+        command.xx_flags = profile_flags(profile, command.heap_mb() or 0)
+
+    content = content.replace(line, command.render())
+
+    # Маркер профиля над строкой exec java
+    content = re.sub(r"^" + re.escape(PROFILE_MARKER) + r".*\n", "", content, flags=re.MULTILINE)
+    if profile not in ("default", CUSTOM_PROFILE):
+        content = re.sub(JAVA_LINE_PATTERN, lambda m: f"{PROFILE_MARKER} {profile}\n{m.group(0)}", content, count=1)
+
+    return content, command
+
+
+# ===== Доступная память хоста (МБ); None — узнать нечем =====
+def available_memory_mb(psutil=None) -> Optional[int]:
+    if psutil is not None:
+        return int(psutil.virtual_memory().available / (1024**2))
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
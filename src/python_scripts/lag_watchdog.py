@@ -0,0 +1,154 @@
+# ==============================================================================
+# lag_watchdog.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import math
+import threading
+
+from collections import deque
+from typing import Optional
+from metrics_sampler import percentile
+from log_events import LagSpike, LagRecovered
+
+
+# ===== Детектор лагов по MSPT =====
+# Получает каждый замер MetricsSampler ("tick query" через ConsoleChannel).
+# EWMA сглаживает одиночные выбросы:
+#   - спайк — EWMA не ниже threshold_ms дольше hold_seconds;
+#   - восстановление — EWMA ниже clear_ms (гистерезис) дольше clear_hold_seconds.
+# На один затяжной лаг — одно событие LagSpike и одно LagRecovered. Спайк,
+# начавшийся раньше cooldown_seconds после прошлого сообщённого восстановления, событий
+# не даёт (ни о начале, ни о конце): иначе сервер "на грани" засыпает чат.
+# Замер без ответа на "tick query" (unresponsive) — тик дольше таймаута запроса:
+# в EWMA числа нет, но для спайка он считается выше порога, а восстановление
+# откладывает.
+class LagWatchdog:
+    def __init__(self, threshold_ms: float = 50.0, clear_ms: float = 40.0, hold_seconds: float = 15.0,
+                 clear_hold_seconds: float = 30.0, alpha: float = 0.3, window_seconds: float = 60.0,
+                 cooldown_seconds: float = 300.0):
+        self.threshold_ms = threshold_ms
+        self.clear_ms = clear_ms
+        self.hold_seconds = hold_seconds
+        self.clear_hold_seconds = clear_hold_seconds
+        self.alpha = alpha
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+
+        self._lock = threading.Lock()
+        self._last_recovered = None
+        self.reset()
+
+    # Новый запуск сервера: история MSPT прошлого процесса не нужна
+    def reset(self):
+        with self._lock:
+            self.ewma = None
+            self.lagging = False
+            self._window = deque()
+            self._above_since = None
+            self._below_since = None
+            self._lag_started = None
+            self._peak = 0.0
+            self._silent = False
+            self._unresponsive = False
+
+    def p95(self) -> Optional[float]:
+        values = sorted(mspt for _, mspt in self._window)
+        return percentile(values, 0.95) if values else None
+
+    # Один замер; возвращает LagSpike / LagRecovered или None
+    def feed(self, timestamp: float, mspt: float, unresponsive: bool = False):
+        if unresponsive:
+            with self._lock:
+                if self.lagging:
+                    self._below_since = None
+                    return None
+                if self._above_since is None:
+                    self._above_since = timestamp
+                self._unresponsive = True
+                return self._spike_if_held(timestamp)
+
+        if mspt is None or math.isnan(mspt) or mspt <= 0:
+            return None
+
+        with self._lock:
+            self.ewma = mspt if self.ewma is None else self.alpha * mspt + (1 - self.alpha) * self.ewma
+            self._window.append((timestamp, mspt))
+            while self._window and self._window[0][0] < timestamp - self.window_seconds:
+                self._window.popleft()
+
+            if not self.lagging:
+                return self._check_spike(timestamp, mspt)
+            return self._check_recovery(timestamp, mspt)
+
+    def _check_spike(self, timestamp, mspt):
+        if self.ewma < self.threshold_ms:
+            self._above_since = None
+            self._peak = 0.0
+            self._unresponsive = False
+            return None
+
+        if self._above_since is None:
+            self._above_since = timestamp
+        self._peak = max(self._peak, mspt)
+        return self._spike_if_held(timestamp)
+
+    def _spike_if_held(self, timestamp):
+        if timestamp - self._above_since < self.hold_seconds:
+            return None
+
+        self.lagging = True
+        self._lag_started = self._above_since
+        self._below_since = None
+        self._silent = (self._last_recovered is not None
+                        and self._lag_started - self._last_recovered < self.cooldown_seconds)
+        if self._silent:
+            return None
+
+        seconds = timestamp - self._lag_started
+        ewma = self.ewma if self.ewma is not None else 0.0
+        line = f"no tick query answer for {seconds:.0f}s" if self._unresponsive else f"MSPT {ewma:.1f} ms for {seconds:.0f}s"
+        return LagSpike(
+            line,
+            ewma_ms=ewma,
+            p95_ms=self.p95(),
+            peak_ms=self._peak,
+            seconds=seconds,
+            unresponsive=self._unresponsive
+        )
+
+    def _check_recovery(self, timestamp, mspt):
+        self._peak = max(self._peak, mspt)
+        if self.ewma >= self.clear_ms:
+            self._below_since = None
+            return None
+
+        if self._below_since is None:
+            self._below_since = timestamp
+        if timestamp - self._below_since < self.clear_hold_seconds:
+            return None
+
+        duration = self._below_since - self._lag_started
+        peak = self._peak
+        silent = self._silent
+
+        self.lagging = False
+        self._above_since = None
+        self._peak = 0.0
+        self._silent = False
+        self._unresponsive = False
+        if silent:
+            return None  # молчаливый спайк cooldown не продлевает
+
+        self._last_recovered = timestamp
+
+        return LagRecovered(
+            f"MSPT back to {self.ewma:.1f} ms after {duration:.0f}s",
+            ewma_ms=self.ewma,
+            peak_ms=peak,
+            seconds=duration
+        )
@@ -0,0 +1,251 @@
+# ==============================================================================
+# log_archive.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import re
+import time
+import zlib
+import struct
+import threading
+
+from collections import deque
+from pathlib import Path
+from config import (
+    RED,
+    RESET
+    )
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# ===== Формат архива =====
+# Сегмент — набор независимо сжатых блоков (gzip members / zstd frames),
+# так что файл целиком читается и обычным zcat/zstdcat. Рядом лежит
+# разреженный индекс: по записи на блок (первое/последнее время, смещение,
+# длина), по нему grep прыгает сразу к нужным блокам.
+INDEX_RECORD = struct.Struct("<ddQI")
+
+# Время в начале строки консоли: "[12:34:56] [Server thread/INFO]" или "[12:34:56 INFO]"
+LINE_TIME = re.compile(r"^(?:\x1b\[[0-9;]*m)*\[(\d{2}):(\d{2}):(\d{2})[\] ]")
+# Время строки отстаёт от прихода в архив (секунды отброшены, очередь записи),
+# поэтому блоки чуть позже until тоже просматриваются
+LINE_TIME_SLACK = 5.0
+
+
+# ===== Сжатие блоков: zstd, если установлен, иначе gzip =====
+class _GzipCodec:
+    suffix = ".log.gz"
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return zlib.decompress(data, 31)
+
+
+class _ZstdCodec:
+    suffix = ".log.zst"
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+_CODECS = {".log.gz": _GzipCodec()}
+if zstandard is not None:
+    _CODECS[".log.zst"] = _ZstdCodec()
+
+
+def _codec_for(path: Path):
+    for suffix, codec in _CODECS.items():
+        if path.name.endswith(suffix):
+            return codec
+    return None
+
+
+# ===== Время строки: её [ЧЧ:ММ:СС] + дата блока; без метки — время блока =====
+def _line_time(line: str, block_time: float) -> float:
+    match = LINE_TIME.match(line)
+    if match is None:
+        return block_time
+    hour, minute, second = (int(part) for part in match.groups())
+    if hour > 23 or minute > 59 or second > 59:
+        return block_time
+
+    day = time.localtime(block_time)
+    stamp = time.mktime((day.tm_year, day.tm_mon, day.tm_mday, hour, minute, second, 0, 0, -1))
+    # Блок у полуночи: строка может относиться к соседним суткам
+    if stamp - block_time > 43200:
+        stamp = time.mktime((day.tm_year, day.tm_mon, day.tm_mday - 1, hour, minute, second, 0, 0, -1))
+    elif block_time - stamp > 43200:
+        stamp = time.mktime((day.tm_year, day.tm_mon, day.tm_mday + 1, hour, minute, second, 0, 0, -1))
+    return stamp
+
+
+# ===== Архив консоли сервера =====
+class LogArchive:
+    def __init__(self, root: Path, segment_bytes: int = 32 * 1024 * 1024, keep_segments: int = 50,
+                 block_lines: int = 2048, flush_interval: float = 1.0, max_pending: int = 200_000):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.keep_segments = keep_segments
+        self.block_lines = block_lines
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._codec = _CODECS[".log.zst"] if ".log.zst" in _CODECS else _CODECS[".log.gz"]
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._thread = None
+        self._segment = None
+        self._index = None
+        self._segment_path = None
+        self._io_lock = threading.Lock()
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="tetos-log-archive", daemon=True)
+        self._thread.start()
+
+    # Вызывается из потока чтения: только добавление в очередь
+    def write(self, line: str):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), line))
+        if len(self._pending) >= self.block_lines:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"{RED}❌ Log archive write failed: {e}{RESET}")
+
+    # Сжать накопленные строки блоками и дописать в текущий сегмент
+    def flush(self):
+        with self._io_lock:
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.block_lines:
+                    batch.append(self._pending.popleft())
+                self._write_block(batch)
+
+            if self._segment is not None:
+                self._segment.flush()
+                self._index.flush()
+
+    def _write_block(self, batch: list):
+        if self._segment is None or self._segment.tell() >= self.segment_bytes:
+            self._rotate(batch[0][0])
+
+        data = "".join(line if line.endswith("\n") else line + "\n" for _, line in batch).encode("utf-8", "replace")
+        compressed = self._codec.compress(data)
+        offset = self._segment.tell()
+        self._segment.write(compressed)
+        self._index.write(INDEX_RECORD.pack(batch[0][0], batch[-1][0], offset, len(compressed)))
+
+    def _rotate(self, timestamp: float):
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
+        counter = 0
+        path = self.root / f"{name}-{counter:03d}{self._codec.suffix}"
+        while path.exists():
+            counter += 1
+            path = self.root / f"{name}-{counter:03d}{self._codec.suffix}"
+
+        self._segment_path = path
+        self._segment = open(path, "ab")
+        self._index = open(self._index_path(path), "ab")
+
+        segments = self.segments()
+        for stale in segments[:-self.keep_segments]:
+            for file in (stale, self._index_path(stale)):
+                try:
+                    file.unlink()
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _index_path(segment: Path) -> Path:
+        return segment.with_name(segment.name.split(".log.")[0] + ".idx")
+
+    def segments(self) -> list:
+        if not self.root.exists():
+            return []
+        return sorted(path for path in self.root.iterdir() if _codec_for(path) is not None)
+
+    # Блоки сегмента, пересекающиеся с [since, until]
+    def _blocks(self, segment: Path, since: float, until: float) -> list:
+        try:
+            data = self._index_path(segment).read_bytes()
+        except OSError:
+            return []
+        blocks = []
+        for offset in range(0, len(data) - INDEX_RECORD.size + 1, INDEX_RECORD.size):
+            first, last, position, length = INDEX_RECORD.unpack_from(data, offset)
+            if last >= since and first <= until:
+                blocks.append((first, last, position, length))
+        return blocks
+
+    # Поиск по архиву: распаковываются только блоки из нужного интервала
+    def grep(self, pattern: str, since: float = 0.0, until: float = None, limit: int = 200,
+             ignore_case: bool = False) -> list:
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        until = until if until is not None else float("inf")
+        self.flush()
+
+        matches = deque(maxlen=limit)
+        for segment in self.segments():
+            codec = _codec_for(segment)
+            blocks = self._blocks(segment, since, until + LINE_TIME_SLACK)
+            if not blocks:
+                continue
+            with open(segment, "rb") as f:
+                for first, _, position, length in blocks:
+                    f.seek(position)
+                    try:
+                        text = codec.decompress(f.read(length)).decode("utf-8", "replace")
+                    except Exception:
+                        continue
+                    for line in text.splitlines():
+                        if regex.search(line):
+                            timestamp = _line_time(line, first)
+                            if since <= timestamp <= until:
+                                matches.append((timestamp, line))
+        return list(matches)
+
+    def close(self):
+        self.flush()
+        with self._io_lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._index.close()
+                self._segment = None
+                self._index = None
@@ -0,0 +1,229 @@
+# ==============================================================================
+# log_events.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import re
+import sys
+import time
+import queue
+import threading
+
+from dataclasses import dataclass
+from typing import Optional
+from config import (
+    GREEN,
+    YELLOW,
+    RED,
+    CYAN,
+    RESET
+    )
+
+
+# ===== Типы событий сервера =====
+@dataclass(frozen=True)
+class ServerEvent:
+    line: str
+
+
+@dataclass(frozen=True)
+class ServerStarting(ServerEvent):
+    host: str
+    port: str
+
+
+@dataclass(frozen=True)
+class VersionDetected(ServerEvent):
+    version: str
+
+
+@dataclass(frozen=True)
+class GameModeDetected(ServerEvent):
+    game_mode: str
+
+
+@dataclass(frozen=True)
+class Ready(ServerEvent):
+    elapsed: str
+
+
+@dataclass(frozen=True)
+class PlayerJoined(ServerEvent):
+    username: str
+
+
+@dataclass(frozen=True)
+class PlayerLeft(ServerEvent):
+    username: str
+
+
+@dataclass(frozen=True)
+class ServerStopping(ServerEvent):
+    pass
+
+
+# Не из консоли: длинная пауза GC из gc.log (см. gc_log.GcMonitor)
+@dataclass(frozen=True)
+class GcPause(ServerEvent):
+    kind: str
+    pause_ms: float
+
+
+# Не из консоли: затяжной рост MSPT и его окончание (см. lag_watchdog.LagWatchdog)
+@dataclass(frozen=True)
+class LagSpike(ServerEvent):
+    ewma_ms: float
+    p95_ms: Optional[float]
+    peak_ms: float
+    seconds: float
+    unresponsive: bool = False  # были замеры без ответа на "tick query"
+
+
+@dataclass(frozen=True)
+class LagRecovered(ServerEvent):
+    ewma_ms: float
+    peak_ms: float
+    seconds: float
+
+
+# ===== Таблица шаблонов (имя группы, regex, фабрика события) =====
+# Все шаблоны склеиваются в один regex, который проверяется ровно один раз
+# с начала сообщения (после "]: "), а не поиском по всей строке.
+_EVENT_TABLE = [
+    ("starting", r"Starting Minecraft server on (?P<starting_host>\S*?):(?P<starting_port>\d+)",
+        lambda m, line: ServerStarting(line, m.group("starting_host"), m.group("starting_port"))),
+    ("version", r"Starting minecraft server version (?P<version_value>.+)",
+        lambda m, line: VersionDetected(line, m.group("version_value").strip())),
+    ("gamemode", r"Default game type: (?P<gamemode_value>.+)",
+        lambda m, line: GameModeDetected(line, m.group("gamemode_value").strip())),
+    ("ready", r"Done \((?P<ready_elapsed>[^)]*)\)",
+        lambda m, line: Ready(line, m.group("ready_elapsed"))),
+    ("stopping", r"Stopping server",
+        lambda m, line: ServerStopping(line)),
+    # Ник ограничен по длине, чтобы несовпадающие строки отбрасывались быстро
+    ("player", r"(?P<player_name>[\w.]{1,17}) (?P<player_action>joined|left) the game",
+        lambda m, line: (PlayerJoined if m.group("player_action") == "joined" else PlayerLeft)(line, m.group("player_name"))),
+]
+
+_EVENT_PATTERN = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in _EVENT_TABLE))
+_EVENT_FACTORIES = {name: factory for name, _, factory in _EVENT_TABLE}
+
+
+# ===== Разбор одной строки лога в событие =====
+def parse_line(line: str) -> Optional[ServerEvent]:
+    pos = line.find("]: ")
+    pos = pos + 3 if pos >= 0 else 0
+    match = _EVENT_PATTERN.match(line, pos)
+    if match is None:
+        return None
+    return _EVENT_FACTORIES[match.lastgroup](match, line)
+
+
+# ===== Движок событий: разбор в потоке чтения, обработчики в отдельном потоке =====
+class LogEventEngine:
+    def __init__(self):
+        self._handlers = {}
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Подписка обработчика на тип события (или ServerEvent для всех)
+    def on(self, event_type, handler):
+        self._handlers.setdefault(event_type, []).append(handler)
+        return handler
+
+    # Запуск потока-диспетчера (повторный вызов ничего не делает)
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._dispatch_loop, name="tetos-log-events", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread = None
+
+    # Вызывается из потока чтения: только разбор и постановка в очередь
+    def feed(self, line: str) -> Optional[ServerEvent]:
+        event = parse_line(line)
+        if event is not None:
+            self._queue.put(event)
+        return event
+
+    # Событие не из консоли сервера (GC лог и т.п.) — к тем же обработчикам
+    def emit(self, event: ServerEvent):
+        self._queue.put(event)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _dispatch_loop(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            for handler in self._handlers.get(type(event), []) + self._handlers.get(ServerEvent, []):
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f"{RED}❌ Event handler {getattr(handler, '__name__', handler)} failed: {e}{RESET}")
+
+
+# ===== Бенчмарк пропускной способности (строк в секунду) =====
+def run_benchmark(total_lines: int = 500_000):
+    sample = [
+        "[12:00:00] [Worker-Main-3/INFO]: Preparing spawn area: 42%\n",
+        "[12:00:00] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 2034ms or 40 ticks behind\n",
+        "[12:00:00] [Server thread/INFO]: [SomePlugin] Loaded 1234 entries from cache in 12ms\n",
+        "[12:00:00] [Server thread/INFO]: <Steve> hello everyone, who joined the game today?\n",
+        "[12:00:00] [Server thread/INFO]: Steve joined the game\n",
+        "[12:00:00] [Server thread/INFO]: Steve left the game\n",
+        "[12:00:00] [Server thread/INFO]: Done (3.512s)! For help, type \"help\"\n",
+        "[12:00:00] [Chunk I/O/ERROR]: Failed to read chunk [12, -4] from region r.0.-1.mca\n",
+    ]
+    weights = [40, 20, 20, 5, 1, 1, 1, 12]
+    lines = []
+    for line, weight in zip(sample, weights):
+        lines.extend([line] * weight)
+    lines = (lines * (total_lines // len(lines) + 1))[:total_lines]
+
+    engine = LogEventEngine()
+    done = threading.Event()
+    handled = [0]
+
+    def count_event(event):
+        handled[0] += 1
+        if event.line is lines[-1]:
+            done.set()
+
+    engine.on(ServerEvent, count_event)
+    lines[-1] = "[12:00:00] [Server thread/INFO]: Stopping server\n"
+    expected = sum(1 for line in lines if parse_line(line) is not None)
+    engine.start()
+
+    started = time.perf_counter()
+    for line in lines:
+        engine.feed(line)
+    fed = time.perf_counter() - started
+    done.wait(timeout=30)
+    drained = time.perf_counter() - started
+    engine.stop()
+
+    print(f"{CYAN}Log event engine benchmark ({total_lines} lines){RESET}")
+    print(f" - reader thread (match + enqueue): {YELLOW}{total_lines / fed:,.0f} lines/s{RESET}")
+    print(f" - end-to-end (handlers drained): {YELLOW}{total_lines / drained:,.0f} lines/s{RESET}")
+    print(f" - events dispatched: {GREEN}{handled[0]} / {expected}{RESET}")
+    return total_lines / fed, total_lines / drained
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    run_benchmark(count)
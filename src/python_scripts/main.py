@@ -7,15 +7,19 @@
 # ==============================================================================
 
 
-import os
 import sys
-import subprocess
 import threading
-import platform
-import config
-import server_commands
 
-from pathlib import Path
+from startup_profile import PROFILE
+
+PROFILE.enabled = "--startup-profile" in sys.argv[1:]
+
+with PROFILE.phase("import config"):
+    import config
+
+with PROFILE.phase("import server_commands"):
+    import server_commands
+
 from config import (
     GREEN,
     YELLOW,
@@ -25,14 +29,62 @@ from config import (
     VERSION
     )
 
-try:
-    from telegram_bot import (
-        init_bot, 
-        )
-    config.TELEGRAM_LIB_AVAILABLE = True
-except ImportError as e:
-    print(f"Failed to import telegram_bot.py: {e}")
-    config.TELEGRAM_LIB_AVAILABLE = False
+
+# ===== Строка статуса Telegram уведомлений для баннера =====
+def telegram_status_line() -> str:
+    if config.TELEGRAM_BOT_STARTING:
+        return f"Telegram notifications: {YELLOW}starting...{RESET}"
+
+    if not config.TELEGRAM_BOT_RUNNING:
+        tg_color = RED
+        tg_available = "not available"
+    else:
+        tg_color = GREEN
+        tg_available = "available"
+
+    if config.TELEGRAM_BOT_NOTIFICATION:
+        tg_color_available = GREEN
+        tg_status = "(on)"
+    else:
+        tg_color_available = RED
+        tg_status = "(off)"
+
+    return f"Telegram notifications: {tg_color}{tg_available} {tg_color_available}{tg_status}{RESET}"
+
+
+# ===== Серверы, Telegram бот и экспортёр метрик поднимаются в фоне, prompt их не ждёт =====
+def deferred_startup():
+    try:
+        with PROFILE.phase("load servers", background=True):
+            server_commands.load_instances()
+        if len(config.SERVER_INSTANCES) > 1:
+            print(f"Servers: {CYAN}{', '.join(config.SERVER_INSTANCES)}{RESET} (using {YELLOW}{config.ACTIVE_INSTANCE.name}{RESET}, switch with 'use <name>')")
+
+        with PROFILE.phase("import telegram_bot", background=True):
+            try:
+                from telegram_bot import (
+                    init_bot,
+                    )
+                config.TELEGRAM_LIB_AVAILABLE = True
+            except ImportError as e:
+                print(f"Failed to import telegram_bot.py: {e}")
+                config.TELEGRAM_LIB_AVAILABLE = False
+
+        if config.TELEGRAM_LIB_AVAILABLE:
+            with PROFILE.phase("init_bot", background=True):
+                init_bot()
+
+        # Экспортёр метрик Prometheus (METRICS_EXPORTER=true в .env, .env экспортёр читает сам)
+        with PROFILE.phase("metrics exporter", background=True):
+            server_commands.start_metrics_exporter()
+    finally:
+        config.TELEGRAM_BOT_STARTING = False
+
+    print(telegram_status_line())
+    print(f"Telegram bot: {server_commands.get_telegram_bot_status()}")
+    if not config.TELEGRAM_LIB_AVAILABLE:
+        print(f"{RED}🔕 Telegram notifications disabled (missing telegram_bot.py or libraries){RESET}")
+    PROFILE.report("background init", background=True)
 
 
 # ===== Основная CLI петля =====
@@ -45,101 +97,137 @@ banner = f"""{RED}
        |_|    \___|  \__|  {RESET}\___/  |____/ {RESET}
    """
 
-bot_success = False
-if config.TELEGRAM_LIB_AVAILABLE:
-    bot_success = init_bot()
+config.TELEGRAM_BOT_STARTING = True
 
-info_line = f"Version: {YELLOW}{VERSION}{RESET}"
+with PROFILE.phase("banner"):
+    info_line = f"Version: {YELLOW}{VERSION}{RESET}"
+    status_line = telegram_status_line()
 
-if not config.TELEGRAM_BOT_RUNNING:
-    tg_color = RED
-    tg_available = "not available"
-else:
-    tg_color = GREEN
-    tg_available = "available"
+    max_len = max(len(info_line), len(status_line)) - 6
+    print(banner)
+    print(f"┌{'─' * (max_len - 3)}┐")
+    print(f"│  {info_line.center(max_len)}    │")
+    print(f"│  {status_line.center(max_len)}   │")
+    print(f"└{'─' * (max_len - 3)}┘\n")
 
-if config.TELEGRAM_BOT_NOTIFICATION:
-    tg_color_available = GREEN
-    tg_status = "(on)"
-else:
-    tg_color_available = RED
-    tg_status = "(off)"
+threading.Thread(target=deferred_startup, name="tetos-startup", daemon=True).start()
+PROFILE.report("prompt ready")
 
-status_line = f"Telegram notifications: {tg_color}{tg_available} {tg_color_available}{tg_status}{RESET}"
 
-max_len = max(len(info_line), len(status_line)) - 6
-print(banner)
-print(f"┌{'─' * (max_len - 3)}┐")
-print(f"│  {info_line.center(max_len)}    │")
-print(f"│  {status_line.center(max_len)}   │")
-print(f"└{'─' * (max_len - 3)}┘\n")
+# ===== Одна команда CLI (выполняется в потоке tetos-cli, не в цикле asyncio) =====
+def handle_command(cmd_input: str):
+    # Команда раньше фоновой загрузки серверов ждёт её (или грузит сама)
+    server_commands.load_instances()
 
-if not config.TELEGRAM_LIB_AVAILABLE:
-    print(f"{RED}🔕 Telegram notifications disabled (missing telegram_bot.py or libraries){RESET}")
+    parts = cmd_input.split()
+    cmd = parts[0]
+    args = parts[1:]
 
+    # Команды утилиты 
+    if cmd == "info":
+        server_commands.print_server_info()
 
-# Получаем и задаем макс значения игроков и памяти
-config.SERVER_MAX_PLAYERS = server_commands.get_max_players()
-config.SERVER_MAX_RAM_MB = server_commands.get_max_ram_mb()
+    elif cmd in ["tetos", "version"]:
+        print(f"Utility version: {YELLOW}{VERSION}{RESET}")
 
+    elif cmd == "start":
+        server_commands.handle_start_command(args)
 
-try:
-    while True:
-        cmd_input = input().strip()
-        parts = cmd_input.split()
-        cmd = parts[0]
-        args = parts[1:]
+    elif cmd == "exit":
+        server_commands.exit_utility()
+
+    elif cmd == "clear" or cmd == "cls":
+        server_commands.clear_terminal()
+
+    elif cmd == "stop":
+        server_commands.handle_stop_command(args)
 
-        # Команды утилиты 
-        if cmd == "info":
-            server_commands.print_server_info()
+    elif cmd == "restart":
+        server_commands.handle_restart_command(args)
 
-        elif cmd in ["tetos", "version"]:
-            print(f"Utility version: {YELLOW}{VERSION}{RESET}")
+    elif cmd == "status":
+        server_commands.print_status()
 
-        elif cmd == "start":
-            hard_mode = "--hard" in args
-            server_commands.start_server(hard=hard_mode)
+    elif cmd == "use":
+        server_commands.handle_use_command(args)
+    
+    elif cmd == "tps":
+        server_commands.print_tps_info("tps")
 
-        elif cmd == "exit":
-            server_commands.exit_utility()
+    elif cmd == "mspt":
+        server_commands.print_tps_info("mspt")
 
-        elif cmd == "clear" or cmd == "cls":
-            server_commands.clear_terminal()
+    elif cmd == "stats":
+        server_commands.print_stats(args)
 
-        elif cmd == "stop":
-            server_commands.stop_server()
+    elif cmd == "history":
+        server_commands.print_history(args)
 
-        elif cmd == "restart":
-            server_commands.restart_server()
-        
-        elif cmd == "tps":
-            server_commands.print_tps_info("tps")
+    elif cmd == "gc":
+        server_commands.print_gc_stats(args)
 
-        elif cmd == "mspt":
-            server_commands.print_tps_info("mspt")
+    elif cmd == "world":
+        server_commands.handle_world_command(args)
 
-        elif cmd == "get-ip":
-            server_commands.print_ip_server()
+    elif cmd == "pregen":
+        server_commands.handle_pregen_command(args)
 
-        elif cmd == "set":
-            server_commands.handle_set_command(args)
+    elif cmd == "backup":
+        server_commands.handle_backup_command(args)
 
-        elif cmd == "help":
-            server_commands.print_help_server()
+    elif cmd == "restore":
+        server_commands.restore_backup(args)
 
-        else:
-            if config.SERVER_PROCESS is not None and config.SERVER_PROCESS.poll() is None:
-                config.SERVER_PROCESS.stdin.write(cmd_input + "\n")
-                config.SERVER_PROCESS.stdin.flush()
-            else:
-                print(f"{YELLOW}Server is not running! Use 'start' to launch.{RESET}")
+    elif cmd == "log":
+        server_commands.handle_log_command(args)
+
+    elif cmd == "logs":
+        server_commands.handle_logs_command(args)
+
+    elif cmd == "get-ip":
+        server_commands.print_ip_server()
+
+    elif cmd == "set":
+        server_commands.handle_set_command(args)
+
+    elif cmd == "help":
+        server_commands.print_help_server()
+
+    else:
+        if not server_commands.current_instance().console.send(cmd_input):
+            print(f"{YELLOW}Server is not running! Use 'start' to launch.{RESET}")
+
+
+# ===== Ввод читается в цикле RUNTIME, команды по одной уходят в поток tetos-cli =====
+# Пока команда выполняется, цикл продолжает читать вывод серверов и Telegram.
+async def cli_loop(executor) -> int:
+    while True:
+        try:
+            cmd_input = (await server_commands.RUNTIME.read_line()).strip()
+        except EOFError:
+            # Ctrl+D или конец пайпа: серверы в своих сессиях сами не остановятся, выходим как по exit
+            print()
+            cmd_input = "exit"
+        if not cmd_input:
+            continue
+        try:
+            await server_commands.RUNTIME.run_blocking(handle_command, cmd_input, executor=executor)
+        except SystemExit as e:  # exit_utility()
+            return e.code
+        except Exception as e:
+            # Ошибка одной команды не должна ронять tetOS и бросать серверы без присмотра
+            print(f"{RED}❌ Command '{cmd_input}' failed: {e}{RESET}")
+
+
+# concurrent.futures (как и asyncio) грузится уже после prompt
+from concurrent.futures import ThreadPoolExecutor
+
+cli_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tetos-cli")
+try:
+    sys.exit(server_commands.RUNTIME.run(cli_loop(cli_executor)))
 
 except KeyboardInterrupt:
     print(f"\n{RED}✋ All be okay...{RESET}")
-    if config.SERVER_PROCESS is not None and config.SERVER_PROCESS.poll() is None:
-        config.SERVER_PROCESS.stdin.write("stop\n")
-        config.SERVER_PROCESS.stdin.flush()
-        config.SERVER_PROCESS.wait()
+    server_commands.interrupt_all()
     sys.exit(0)
 
@@ -0,0 +1,102 @@
+# ==============================================================================
+# metrics_exporter.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import (
+    GREEN,
+    RED,
+    RESET
+    )
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ===== Экранирование значения label =====
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ===== Рендер в текстовый формат Prometheus =====
+# metrics: список (name, type, help, samples), samples: список (labels: dict, value)
+def render(metrics: list) -> str:
+    lines = []
+    for name, metric_type, help_text, samples in metrics:
+        samples = [(labels, value) for labels, value in samples if value is not None and value == value]
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_text = ""
+            if labels:
+                label_text = "{" + ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items()) + "}"
+            lines.append(f"{name}{label_text} {float(value):.17g}")
+    return "\n".join(lines) + "\n"
+
+
+# ===== HTTP-экспортёр на фоне (только /metrics) =====
+# collect() должен читать только закешированные значения: скрейп никогда не
+# отправляет "tick query" и не обходит файловую систему.
+class MetricsExporter:
+    def __init__(self, collect, host: str = "127.0.0.1", port: int = 9325):
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self) -> bool:
+        if self._server is not None:
+            return True
+
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render(exporter.collect()).encode("utf-8")
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # Без лога каждого скрейпа в консоль tetOS
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        except OSError as e:
+            print(f"{RED}❌ Metrics exporter failed to bind {self.host}:{self.port}: {e}{RESET}")
+            self._server = None
+            return False
+
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tetos-exporter", daemon=True)
+        self._thread.start()
+        print(f"{GREEN}📊 Metrics exporter: http://{self.host}:{self.port}/metrics{RESET}")
+        return True
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
@@ -0,0 +1,226 @@
+# ==============================================================================
+# metrics_sampler.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import math
+import time
+import bisect
+import threading
+
+from array import array
+from config import (
+    RED,
+    RESET
+    )
+
+
+# ===== Метрики, которые собирает сэмплер =====
+METRICS = [
+    ("mspt", "MSPT", "ms"),
+    ("tps", "TPS", ""),
+    ("rss_mb", "RAM (RSS)", "MB"),
+    ("cpu_percent", "CPU", "%"),
+    ("threads", "Threads", ""),
+    ("players", "Players", ""),
+]
+
+NAN = float("nan")
+
+
+# ===== Кольцевой буфер фиксированного размера на array (без списков словарей) =====
+class RingBuffer:
+    def __init__(self, capacity: int, typecode: str = "d"):
+        self._data = array(typecode, [0]) * capacity
+        self._capacity = capacity
+        self._next = 0
+        self._size = 0
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        if self._size < self._capacity:
+            self._size += 1
+
+    # Значения от старых к новым (копия)
+    def values(self) -> array:
+        if self._size < self._capacity:
+            return self._data[:self._size]
+        return self._data[self._next:] + self._data[:self._next]
+
+    def last(self):
+        if self._size == 0:
+            return None
+        return self._data[self._next - 1]
+
+    def __len__(self):
+        return self._size
+
+
+# ===== Перцентиль по отсортированному списку =====
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return NAN
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# ===== Фоновый сэмплер метрик сервера =====
+# Источники данных передаются функциями, чтобы модуль не зависел от
+# server_commands: get_pid() -> pid | None, fetch_tick() -> (tps, mspt),
+# get_players() -> int. on_sample(timestamp, values) вызывается после
+# каждого замера (например, для записи на диск).
+class MetricsSampler:
+    def __init__(self, get_pid, fetch_tick, get_players, interval: float = 5.0, history_seconds: float = 3600.0,
+                 on_sample=None):
+        self.interval = interval
+        self.capacity = max(1, int(history_seconds / interval))
+
+        self._get_pid = get_pid
+        self._fetch_tick = fetch_tick
+        self._get_players = get_players
+        self._on_sample = on_sample
+
+        self._timestamps = RingBuffer(self.capacity)
+        self._series = {name: RingBuffer(self.capacity) for name, _, _ in METRICS}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        self._process = None
+        self._psutil = None
+        self._psutil_checked = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tetos-metrics", daemon=True)
+        self._thread.start()
+
+    # Ждёт текущий замер (до timeout сек), чтобы после stop() он уже ничего не писал
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"{RED}❌ Metrics sampling failed: {e}{RESET}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    # Процесс psutil переиспользуется между замерами, иначе cpu_percent всегда 0
+    def _process_for(self, pid):
+        if not self._psutil_checked:
+            self._psutil_checked = True
+            try:
+                import psutil
+                self._psutil = psutil
+            except ImportError:
+                self._psutil = None
+        if self._psutil is None:
+            return None
+        if self._process is None or self._process.pid != pid:
+            try:
+                self._process = self._psutil.Process(pid)
+                self._process.cpu_percent(None)
+            except Exception:
+                self._process = None
+        return self._process
+
+    # Один замер; при остановленном сервере ничего не пишется
+    def sample(self) -> bool:
+        pid = self._get_pid()
+        if pid is None:
+            self._process = None
+            return False
+
+        rss_mb = cpu = threads = NAN
+        process = self._process_for(pid)
+        if process is not None:
+            try:
+                with process.oneshot():
+                    rss_mb = process.memory_info().rss / (1024**2)
+                    cpu = process.cpu_percent(None)
+                    threads = process.num_threads()
+            except Exception:
+                self._process = None
+
+        tps, mspt = self._fetch_tick()
+        if mspt <= 0:
+            tps = mspt = NAN
+
+        values = {
+            "mspt": mspt,
+            "tps": tps,
+            "rss_mb": rss_mb,
+            "cpu_percent": cpu,
+            "threads": threads,
+            "players": self._get_players(),
+        }
+        timestamp = time.time()
+        with self._lock:
+            self._timestamps.append(timestamp)
+            for name, value in values.items():
+                self._series[name].append(value)
+
+        if self._on_sample is not None:
+            self._on_sample(timestamp, values)
+        return True
+
+    # Последнее значение метрики (или None)
+    def latest(self, name: str):
+        with self._lock:
+            value = self._series[name].last()
+        if value is None or math.isnan(value):
+            return None
+        return value
+
+    def last_sample_time(self):
+        with self._lock:
+            return self._timestamps.last()
+
+    # min/avg/p95/max по каждой метрике за последние seconds секунд
+    def window_stats(self, seconds: float) -> dict:
+        with self._lock:
+            timestamps = self._timestamps.values()
+            series = {name: buffer.values() for name, buffer in self._series.items()}
+
+        start = bisect.bisect_left(timestamps, time.time() - seconds)
+        result = {"samples": len(timestamps) - start}
+        for name, values in series.items():
+            window = sorted(v for v in values[start:] if not math.isnan(v))
+            if not window:
+                result[name] = None
+                continue
+            result[name] = {
+                "min": window[0],
+                "avg": sum(window) / len(window),
+                "p95": percentile(window, 0.95),
+                "max": window[-1],
+            }
+        return result
+
+
+# ===== Текстовая таблица статистики (для CLI и Telegram) =====
+def format_stats_table(stats: dict) -> list:
+    lines = [f"{'':<14}{'min':>9}{'avg':>9}{'p95':>9}{'max':>9}"]
+    for name, title, unit in METRICS:
+        row = stats.get(name)
+        label = f"{title}{(' ' + unit) if unit else ''}"
+        if row is None:
+            lines.append(f"{label:<14}{'-':>9}{'-':>9}{'-':>9}{'-':>9}")
+            continue
+        lines.append(
+            f"{label:<14}{row['min']:>9.1f}{row['avg']:>9.1f}{row['p95']:>9.1f}{row['max']:>9.1f}"
+        )
+    return lines
@@ -0,0 +1,310 @@
+# ==============================================================================
+# metrics_store.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import mmap
+import math
+import struct
+import bisect
+import threading
+
+from pathlib import Path
+from config import (
+    RED,
+    RESET
+    )
+
+
+# ===== Формат файлов =====
+# Сегмент = заголовок + заранее выделенное место под capacity записей.
+# Заголовок: magic, версия, уровень (tier), число записей.
+# Запись фиксированной ширины: timestamp, MSPT, RSS, игроки, размер мира.
+SEGMENT_MAGIC = b"TETS"
+SEGMENT_VERSION = 1
+HEADER = struct.Struct("<4sHHI4x")
+RECORD = struct.Struct("<dfQHQ2x")
+
+# Уровни хранения: имя -> размер корзины даунсэмплинга в секундах
+TIERS = [
+    ("raw", 0),
+    ("1m", 60),
+    ("1h", 3600),
+]
+
+
+# ===== Один mmap-сегмент =====
+class _Segment:
+    def __init__(self, path: Path, tier_index: int, capacity: int, create: bool = False):
+        self.path = path
+        if create:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, tier_index, 0))
+                f.truncate(HEADER.size + capacity * RECORD.size)
+
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, _, count = HEADER.unpack_from(self._map, 0)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            self.close()
+            raise ValueError(f"{path.name} is not a tetOS metrics segment")
+        self.count = count
+        self.capacity = (len(self._map) - HEADER.size) // RECORD.size
+
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def append(self, record: tuple):
+        RECORD.pack_into(self._map, HEADER.size + self.count * RECORD.size, *record)
+        self.count += 1
+        struct.pack_into("<I", self._map, 8, self.count)
+
+    def timestamp_at(self, index: int) -> float:
+        return struct.unpack_from("<d", self._map, HEADER.size + index * RECORD.size)[0]
+
+    def first_timestamp(self):
+        return self.timestamp_at(0) if self.count else None
+
+    def last_timestamp(self):
+        return self.timestamp_at(self.count - 1) if self.count else None
+
+    # Записи в диапазоне [start, end]; поиск начала бинарный
+    def read(self, start: float, end: float) -> list:
+        index = bisect.bisect_left(_TimestampView(self), start)
+        result = []
+        offset = HEADER.size + index * RECORD.size
+        while index < self.count:
+            record = RECORD.unpack_from(self._map, offset)
+            if record[0] > end:
+                break
+            result.append(record)
+            index += 1
+            offset += RECORD.size
+        return result
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        try:
+            self._map.close()
+        finally:
+            self._file.close()
+
+
+# ===== Обёртка для bisect по timestamp без копирования записей =====
+class _TimestampView:
+    def __init__(self, segment: _Segment):
+        self._segment = segment
+
+    def __len__(self):
+        return self._segment.count
+
+    def __getitem__(self, index):
+        return self._segment.timestamp_at(index)
+
+
+# ===== Агрегатор корзины для даунсэмплинга =====
+class _Bucket:
+    __slots__ = ("key", "n", "mspt_n", "mspt", "rss", "players", "world")
+
+    def __init__(self, key):
+        self.key = key
+        self.n = 0
+        self.mspt_n = 0
+        self.mspt = 0.0
+        self.rss = 0
+        self.players = 0
+        self.world = 0
+
+    def add(self, record):
+        _, mspt, rss, players, world = record
+        self.n += 1
+        if mspt > 0:    # 0 — MSPT неизвестен (сервер ещё не готов)
+            self.mspt_n += 1
+            self.mspt += mspt
+        self.rss += rss
+        self.players = max(self.players, players)
+        self.world = world
+
+    # Среднее MSPT/RSS, максимум игроков, последний размер мира
+    def record(self, size: int) -> tuple:
+        mspt = self.mspt / self.mspt_n if self.mspt_n else 0.0
+        return (float(self.key * size), mspt, self.rss // self.n, self.players, self.world)
+
+
+# ===== Хранилище временных рядов: raw -> 1m -> 1h, с ротацией сегментов =====
+class MetricsStore:
+    def __init__(self, root: Path, segment_records: int = 65536, keep_segments: dict = None):
+        self.root = Path(root)
+        self.segment_records = segment_records
+        self.keep_segments = keep_segments or {"raw": 2, "1m": 4, "1h": 8}
+
+        self._lock = threading.Lock()
+        self._active = {}
+        self._buckets = {}
+        self._opened = False
+
+    def _tier_dir(self, tier: str) -> Path:
+        return self.root / tier
+
+    def _open(self):
+        if self._opened:
+            return
+        for index, (tier, _) in enumerate(TIERS):
+            directory = self._tier_dir(tier)
+            directory.mkdir(parents=True, exist_ok=True)
+            segments = sorted(directory.glob("*.seg"))
+            if segments:
+                try:
+                    segment = _Segment(segments[-1], index, self.segment_records)
+                    if not segment.is_full():
+                        self._active[tier] = segment
+                    else:
+                        segment.close()
+                except (OSError, ValueError) as e:
+                    print(f"{RED}❌ Skipping metrics segment {segments[-1].name}: {e}{RESET}")
+        self._opened = True
+
+    # Новый сегмент + удаление старых сверх лимита
+    def _rollover(self, tier: str, timestamp: float) -> _Segment:
+        old = self._active.pop(tier, None)
+        if old is not None:
+            old.flush()
+            old.close()
+
+        index = [name for name, _ in TIERS].index(tier)
+        directory = self._tier_dir(tier)
+        path = directory / f"{int(timestamp):012d}.seg"
+        segment = _Segment(path, index, self.segment_records, create=True)
+        self._active[tier] = segment
+
+        segments = sorted(directory.glob("*.seg"))
+        for stale in segments[:-self.keep_segments.get(tier, 1)]:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+        return segment
+
+    def _append_tier(self, tier: str, record: tuple):
+        segment = self._active.get(tier)
+        if segment is None or segment.is_full():
+            segment = self._rollover(tier, record[0])
+        segment.append(record)
+
+    # Добавить сырой замер; агрегаты 1m/1h пишутся при смене корзины
+    def append(self, timestamp: float, mspt: float, rss_bytes: int, players: int, world_bytes: int):
+        if mspt is None or math.isnan(mspt):
+            mspt = 0.0
+        record = (float(timestamp), float(mspt), int(rss_bytes or 0), int(players or 0), int(world_bytes or 0))
+
+        with self._lock:
+            self._open()
+            self._append_tier("raw", record)
+
+            for tier, size in TIERS[1:]:
+                key = int(record[0] // size)
+                bucket = self._buckets.get(tier)
+                if bucket is not None and bucket.key != key:
+                    aggregated = bucket.record(size)
+                    self._append_tier(tier, aggregated)
+                    bucket = None
+                if bucket is None:
+                    bucket = self._buckets[tier] = _Bucket(key)
+                bucket.add(record)
+
+    # Выбор уровня по длине диапазона
+    @staticmethod
+    def tier_for(seconds: float) -> str:
+        if seconds <= 6 * 3600:
+            return "raw"
+        if seconds <= 14 * 86400:
+            return "1m"
+        return "1h"
+
+    def query(self, start: float, end: float, tier: str = None) -> list:
+        tier = tier or self.tier_for(end - start)
+        result = []
+        with self._lock:
+            self._open()
+            active = self._active.get(tier)
+            for path in sorted(self._tier_dir(tier).glob("*.seg")):
+                if active is not None and path == active.path:
+                    segment, temporary = active, False
+                else:
+                    try:
+                        segment, temporary = _Segment(path, 0, self.segment_records), True
+                    except (OSError, ValueError):
+                        continue
+                try:
+                    last = segment.last_timestamp()
+                    if last is not None and last >= start and segment.first_timestamp() <= end:
+                        result.extend(segment.read(start, end))
+                finally:
+                    if temporary:
+                        segment.close()
+        return result
+
+    def flush(self):
+        with self._lock:
+            for segment in self._active.values():
+                segment.flush()
+
+    # Незавершённые корзины 1m/1h дописываются как есть, иначе при выходе они теряются
+    def close(self):
+        with self._lock:
+            if self._opened:
+                for tier, size in TIERS[1:]:
+                    bucket = self._buckets.pop(tier, None)
+                    if bucket is not None:
+                        self._append_tier(tier, bucket.record(size))
+            for segment in self._active.values():
+                segment.flush()
+                segment.close()
+            self._active = {}
+            self._opened = False
+
+
+# ===== Сводка записей по равным интервалам (для команды history) =====
+def summarize(records: list, start: float, end: float, rows: int = 24) -> list:
+    width = max(1.0, (end - start) / rows)
+    summary = []
+    index = 0
+    for row in range(rows):
+        row_start = start + row * width
+        row_end = row_start + width
+        mspt_sum = 0.0
+        mspt_n = 0
+        mspt_max = 0.0
+        rss_max = 0
+        players_max = 0
+        world = None
+        n = 0
+        while index < len(records) and records[index][0] < row_end:
+            timestamp, mspt, rss, players, world_bytes = records[index]
+            index += 1
+            if timestamp < row_start:
+                continue
+            n += 1
+            if mspt > 0:
+                mspt_n += 1
+                mspt_sum += mspt
+            mspt_max = max(mspt_max, mspt)
+            rss_max = max(rss_max, rss)
+            players_max = max(players_max, players)
+            world = world_bytes
+        if n:
+            summary.append({
+                "start": row_start,
+                "mspt_avg": mspt_sum / mspt_n if mspt_n else 0.0,
+                "mspt_max": mspt_max,
+                "rss_max": rss_max,
+                "players_max": players_max,
+                "world_bytes": world,
+            })
+    return summary
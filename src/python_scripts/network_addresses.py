@@ -0,0 +1,188 @@
+# ==============================================================================
+# network_addresses.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import sys
+import time
+import struct
+import threading
+
+
+# ===== Классы адресов =====
+KIND_VPN = "vpn"
+KIND_LAN = "lan"
+KIND_LOOPBACK = "loopback"
+KIND_OTHER = "other"
+
+# Префиксы имён интерфейсов: VPN (Hamachi — ham0) и виртуальные сети контейнеров
+VPN_PREFIXES = ("ham", "tun", "tap", "wg", "utun", "zt", "tailscale", "ppp", "ipsec")
+VIRTUAL_PREFIXES = ("docker", "br-", "veth", "virbr", "vmnet", "vboxnet", "lxc", "lxdbr", "cni", "flannel")
+
+# Подписи VPN для вывода по префиксу интерфейса
+VPN_LABELS = {
+    "ham": "Hamachi",
+    "wg": "WireGuard",
+    "zt": "ZeroTier",
+    "tailscale": "Tailscale",
+}
+
+
+def _is_private(ip: str) -> bool:
+    first, second = (int(part) for part in ip.split(".")[:2])
+    return first == 10 or (first == 172 and 16 <= second <= 31) or (first == 192 and second == 168)
+
+
+# ===== Класс адреса по имени интерфейса и диапазону =====
+def classify(interface: str, ip: str) -> str:
+    name = interface.lower()
+    if name.startswith("lo") or ip.startswith("127."):
+        return KIND_LOOPBACK
+    if ip.startswith("169.254."):
+        return KIND_OTHER
+    if name.startswith(VPN_PREFIXES) or ip.startswith("25."):  # 25.0.0.0/8 — адреса Hamachi
+        return KIND_VPN
+    if name.startswith(VIRTUAL_PREFIXES):
+        return KIND_OTHER
+    return KIND_LAN
+
+
+def vpn_label(interface: str) -> str:
+    name = interface.lower()
+    for prefix, label in VPN_LABELS.items():
+        if name.startswith(prefix):
+            return label
+    return "VPN"
+
+
+# ===== Источники адресов (без запуска внешних программ) =====
+def _addresses_psutil(psutil) -> list:
+    import socket
+
+    result = []
+    for interface, addresses in psutil.net_if_addrs().items():
+        for address in addresses:
+            if address.family == socket.AF_INET:
+                result.append((interface, address.address))
+    return result
+
+
+# Linux без psutil: ioctl(SIOCGIFADDR) по списку интерфейсов
+def _addresses_ioctl() -> list:
+    import fcntl
+    import socket
+
+    SIOCGIFADDR = 0x8915
+    result = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, interface in socket.if_nameindex():
+            request = struct.pack("256s", interface.encode()[:15])
+            try:
+                response = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)
+            except OSError:
+                continue  # у интерфейса нет IPv4
+            result.append((interface, socket.inet_ntoa(response[20:24])))
+    return result
+
+
+# Последний вариант: адрес маршрута по умолчанию (UDP connect ничего не отправляет)
+def _addresses_route() -> list:
+    import socket
+
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("192.0.2.1", 9))
+            return [("default", sock.getsockname()[0])]
+    except OSError:
+        return []
+
+
+def _interface_names() -> tuple:
+    import socket
+
+    try:
+        return tuple(sorted(name for _, name in socket.if_nameindex()))
+    except OSError:
+        return ()
+
+
+# ===== Кеш адресов с фоновым обновлением =====
+# Адреса перечитываются раз в refresh_interval и сразу, когда меняется
+# набор интерфейсов (например, поднялся ham0); проверка набора — один
+# вызов if_nameindex() раз в change_poll_interval.
+class NetworkAddressResolver:
+    def __init__(self, get_psutil=None, refresh_interval: float = 60.0, change_poll_interval: float = 2.0):
+        self._get_psutil = get_psutil or (lambda: None)
+        self.refresh_interval = refresh_interval
+        self.change_poll_interval = change_poll_interval
+
+        self._addresses = None
+        self._interfaces = None
+        self._updated_at = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="tetos-net-addresses", daemon=True)
+            self._thread.start()
+
+    def refresh_now(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            interfaces = _interface_names()
+            stale = self._updated_at is None or time.monotonic() - self._updated_at >= self.refresh_interval
+            if stale or interfaces != self._interfaces or self._wake.is_set():
+                self._wake.clear()
+                self.refresh()
+            self._wake.wait(self.change_poll_interval)
+
+    def refresh(self):
+        psutil = self._get_psutil()
+        addresses = []
+        try:
+            if psutil is not None:
+                addresses = _addresses_psutil(psutil)
+            elif sys.platform.startswith("linux"):
+                addresses = _addresses_ioctl()
+        except OSError:
+            addresses = []
+        if not addresses:
+            addresses = _addresses_route()
+
+        classified = [(classify(interface, ip), interface, ip) for interface, ip in addresses]
+        # VPN Hamachi первым, затем остальные VPN; внутри класса — по имени интерфейса
+        classified.sort(key=lambda item: (not item[1].lower().startswith("ham"), item[1]))
+        self._addresses = classified
+        self._interfaces = _interface_names()
+        self._updated_at = time.monotonic()
+
+    # Мгновенный ответ из кеша; до первого обновления — синхронный замер (без fork, < 1 мс)
+    def addresses(self, kind: str = None) -> list:
+        if self._addresses is None:
+            self.refresh()
+        return [(interface, ip) for address_kind, interface, ip in self._addresses if kind is None or address_kind == kind]
+
+    # [(класс, подпись, "ip:port")] для get-ip, /info и уведомления о запуске
+    def describe(self, port) -> list:
+        lines = []
+        for interface, ip in self.addresses(KIND_VPN):
+            lines.append((KIND_VPN, f"{vpn_label(interface)} {interface}", f"{ip}:{port}"))
+        for interface, ip in self.addresses(KIND_LAN):
+            scope = "Local" if _is_private(ip) else "Public"
+            lines.append((KIND_LAN, f"{scope} {interface}", f"{ip}:{port}"))
+        return lines
+
+    def age(self):
+        if self._updated_at is None:
+            return None
+        return time.monotonic() - self._updated_at
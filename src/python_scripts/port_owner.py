@@ -0,0 +1,200 @@
+# ==============================================================================
+# port_owner.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import time
+import signal
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+# Состояние LISTEN в /proc/net/tcp
+_TCP_LISTEN = "0A"
+_PROC = Path("/proc")
+
+# Признаки сервера Minecraft в командной строке java-процесса
+MINECRAFT_MARKERS = (
+    "minecraft",
+    "server.jar",
+    "paper",
+    "purpur",
+    "spigot",
+    "fabric",
+    "forge",
+    "nogui",
+)
+
+
+# ===== Процесс, который слушает порт =====
+@dataclass(frozen=True)
+class PortOwner:
+    pid: int
+    name: str
+    cmdline: tuple
+
+    def describe(self) -> str:
+        command = " ".join(self.cmdline) or self.name
+        if len(command) > 120:
+            command = command[:117] + "..."
+        return f"PID {self.pid} ({command})"
+
+    def is_java(self) -> bool:
+        executable = os.path.basename(self.cmdline[0]) if self.cmdline else self.name
+        return executable.lower().startswith("java")
+
+    # java + один из признаков Minecraft (jar сервера, --nogui, ядро)
+    def is_minecraft(self) -> bool:
+        if not self.is_java():
+            return False
+        command = " ".join(self.cmdline).lower()
+        return any(marker in command for marker in MINECRAFT_MARKERS)
+
+
+# ===== Linux: /proc/net/tcp{,6} -> inode сокета -> /proc/<pid>/fd =====
+def _listening_inodes(port: int) -> set:
+    inodes = set()
+    for table in ("tcp", "tcp6"):
+        try:
+            with open(_PROC / "net" / table, "r") as f:
+                next(f, None)  # заголовок
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 10 or fields[3] != _TCP_LISTEN:
+                        continue
+                    if int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    inodes.discard("0")
+    return inodes
+
+
+def _proc_owner(pid: int) -> PortOwner:
+    try:
+        raw = (_PROC / str(pid) / "cmdline").read_bytes()
+        cmdline = tuple(part.decode("utf-8", "replace") for part in raw.split(b"\0") if part)
+    except OSError:
+        cmdline = ()
+    try:
+        name = (_PROC / str(pid) / "comm").read_text().strip()
+    except OSError:
+        name = "?"
+    return PortOwner(pid, name, cmdline)
+
+
+def _owners_from_proc(port: int) -> list:
+    targets = {f"socket:[{inode}]" for inode in _listening_inodes(port)}
+    if not targets:
+        return []
+
+    owners = []
+    for entry in os.scandir(_PROC):
+        if not entry.name.isdigit():
+            continue
+        fd_dir = os.path.join(entry.path, "fd")
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue  # чужой процесс без прав или уже завершился
+        for fd in fds:
+            try:
+                if os.readlink(os.path.join(fd_dir, fd)) in targets:
+                    owners.append(_proc_owner(int(entry.name)))
+                    break
+            except OSError:
+                continue
+    return owners
+
+
+# ===== macOS и прочие: psutil =====
+def _owners_from_psutil(psutil, port: int) -> list:
+    pids = set()
+    try:
+        for conn in psutil.net_connections(kind="tcp"):
+            if conn.laddr and conn.laddr.port == port and conn.status == psutil.CONN_LISTEN and conn.pid:
+                pids.add(conn.pid)
+    except psutil.AccessDenied:
+        # macOS без root: обходим процессы пользователя по одному
+        for process in psutil.process_iter():
+            try:
+                connections = process.net_connections(kind="tcp") if hasattr(process, "net_connections") \
+                    else process.connections(kind="tcp")
+            except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            if any(conn.laddr and conn.laddr.port == port and conn.status == psutil.CONN_LISTEN for conn in connections):
+                pids.add(process.pid)
+
+    owners = []
+    for pid in sorted(pids):
+        try:
+            process = psutil.Process(pid)
+            owners.append(PortOwner(pid, process.name(), tuple(process.cmdline())))
+        except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+            owners.append(PortOwner(pid, "?", ()))
+    return owners
+
+
+# ===== Кто слушает TCP порт (None — нечем проверить) =====
+def find_port_owners(port: int, psutil=None) -> Optional[list]:
+    if (_PROC / "net" / "tcp").exists():
+        return _owners_from_proc(port)
+    if psutil is not None:
+        return _owners_from_psutil(psutil, port)
+    return None
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    # Завершившийся, но ещё не собранный родителем процесс (зомби) порт уже не держит
+    try:
+        stat = (_PROC / str(pid) / "stat").read_text()
+        return stat[stat.rindex(")") + 2] != "Z"
+    except (OSError, ValueError, IndexError):
+        return True
+
+
+def _wait_gone(pid: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while _is_alive(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+    return True
+
+
+# ===== SIGTERM, ожидание, затем SIGKILL =====
+# Возвращает "terminated", "killed" или "failed"
+def terminate_process(pid: int, timeout: float = 10.0) -> str:
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return "terminated"
+    except PermissionError:
+        return "failed"
+
+    if _wait_gone(pid, timeout):
+        return "terminated"
+
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except ProcessLookupError:
+        return "terminated"
+    except PermissionError:
+        return "failed"
+    return "killed" if _wait_gone(pid, 5.0) else "failed"
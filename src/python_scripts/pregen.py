@@ -0,0 +1,383 @@
+# ==============================================================================
+# pregen.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import json
+import time
+import threading
+
+from itertools import islice
+from pathlib import Path
+from typing import Optional
+from console_channel import query
+from config import (
+    GREEN,
+    YELLOW,
+    RED,
+    RESET
+    )
+
+
+# ===== Измерения: короткое имя -> id для "execute in" =====
+DIMENSIONS = {
+    "overworld": "minecraft:overworld",
+    "nether": "minecraft:the_nether",
+    "end": "minecraft:the_end",
+}
+
+# Ответ на forceload add/remove (в том числе "уже помечены" и превышение лимита)
+FORCELOAD_PATTERN = r"\]: (Marked |Unmarked |No chunks were |Too many chunks)"
+FORCELOAD_TIMEOUT = 10.0
+
+# Ответ на "execute ... if loaded ..." без run: все чанки плитки загружены целиком или нет
+LOADED_PATTERN = r"\]: Test (passed|failed)"
+
+# forceload за одну команду принимает не больше 256 чанков
+FORCELOAD_MAX_CHUNKS = 256
+
+
+def dimension_id(name: str) -> Optional[str]:
+    if name in DIMENSIONS:
+        return DIMENSIONS[name]
+    if ":" in name:
+        return name
+    return None
+
+
+# ===== Спираль квадратных плиток tile x tile чанков вокруг центра =====
+# Плитка — прямоугольник чанков (x1, z1, x2, z2), обрезанный по радиусу.
+# Порядок детерминирован: по номеру плитки задание продолжается после перезапуска.
+def spiral_tiles(center_x: int, center_z: int, radius: int, tile: int):
+    for ring in range(radius // tile + 2):
+        if ring == 0:
+            cells = [(0, 0)]
+        else:
+            cells = (
+                [(x, -ring) for x in range(-ring, ring + 1)]
+                + [(ring, z) for z in range(-ring + 1, ring + 1)]
+                + [(x, ring) for x in range(ring - 1, -ring - 1, -1)]
+                + [(-ring, z) for z in range(ring - 1, -ring, -1)]
+            )
+        for tx, tz in cells:
+            x1 = tx * tile - tile // 2
+            z1 = tz * tile - tile // 2
+            x1, x2 = max(x1, -radius), min(x1 + tile - 1, radius)
+            z1, z2 = max(z1, -radius), min(z1 + tile - 1, radius)
+            if x1 > x2 or z1 > z2:
+                continue
+            yield center_x + x1, center_z + z1, center_x + x2, center_z + z2
+
+
+def tile_chunks(tile: tuple) -> int:
+    return (tile[2] - tile[0] + 1) * (tile[3] - tile[1] + 1)
+
+
+# ===== "01-07" / "22:30-06:00" -> (минуты начала, минуты конца) =====
+def parse_hours(value: str) -> Optional[tuple]:
+    try:
+        start, end = value.split("-")
+
+        def minutes(text):
+            hours, _, mins = text.partition(":")
+            result = int(hours) * 60 + int(mins or 0)
+            if not 0 <= result <= 24 * 60:
+                raise ValueError(text)
+            return result
+
+        return minutes(start), minutes(end)
+    except ValueError:
+        return None
+
+
+def in_hours(hours, now: float = None) -> bool:
+    if not hours:
+        return True
+    local = time.localtime(now)
+    current = local.tm_hour * 60 + local.tm_min
+    start, end = hours
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end  # окно через полночь
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+# ===== Прегенерация чанков через forceload с подстройкой под MSPT =====
+# Поток "tetos-pregen-<name>" берёт из спирали пачку плиток, помечает их
+# forceload add (сервер грузит и генерирует чанки), ждёт, пока MSPT вернётся в
+# бюджет, проверяет через "execute if loaded", что чанки плиток загружены
+# целиком, и снимает пометку forceload remove. Не догруженные плитки не
+# засчитываются и идут в начало следующей пачки (retry). Размер пачки и пауза
+# между пачками подстраиваются: MSPT выше бюджета (или сервер не ответил, или
+# плитки не успели) — пачка вдвое меньше и пауза вдвое дольше, MSPT с запасом —
+# пачка на плитку больше.
+# Состояние (позиция в спирали, скорость, пачка в работе) пишется в JSON после
+# каждой пачки: задание переживает остановку сервера и tetOS. Помеченные, но не
+# снятые плитки (сервер упал посреди пачки) снимаются при продолжении.
+class PregenScheduler:
+    def __init__(self, state_path: Path, console, fetch_tick, is_ready, name: str = "main", label=None,
+                 mspt_budget: float = 40.0, tile: int = 4, max_batch_tiles: int = 16,
+                 min_dwell: float = 2.0, max_dwell: float = 30.0, idle_poll: float = 5.0):
+        self.state_path = Path(state_path)
+        self.console = console
+        self.fetch_tick = fetch_tick
+        self.is_ready = is_ready
+        self.name = name
+        self.label = label or (lambda: "")
+        self.mspt_budget = mspt_budget
+        self.tile = tile
+        self.max_batch_tiles = max(1, min(max_batch_tiles, FORCELOAD_MAX_CHUNKS // (tile * tile)))
+        self.min_dwell = min_dwell
+        self.max_dwell = max_dwell
+        self.idle_poll = idle_poll
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.job = self._load()
+
+    # ===== Состояние задания =====
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        job = self.job
+        if job is None:
+            try:
+                self.state_path.unlink()
+            except FileNotFoundError:
+                pass
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=1)
+        os.replace(temp, self.state_path)
+
+    # ===== Управление =====
+    def create(self, dimension: str, center_x: int, center_z: int, radius_chunks: int, hours=None) -> dict:
+        tiles = list(spiral_tiles(center_x, center_z, radius_chunks, self.tile))
+        with self._lock:
+            self.job = {
+                "dimension": dimension,
+                "center": [center_x, center_z],
+                "radius": radius_chunks,
+                "tile": self.tile,
+                "hours": list(hours) if hours else None,
+                "status": "running",
+                "next_tile": 0,
+                "total_tiles": len(tiles),
+                "chunks_done": 0,
+                "total_chunks": sum(tile_chunks(t) for t in tiles),
+                "batch_tiles": 1,
+                "pace": self.min_dwell,
+                "active_seconds": 0.0,
+                "inflight": [],
+                "retry": [],
+                "created": time.time(),
+            }
+            self._save()
+        self.start()
+        return self.job
+
+    def set_status(self, status: str) -> bool:
+        with self._lock:
+            if self.job is None or self.job["status"] == "done":
+                return False
+            self.job["status"] = status
+            self._save()
+        self._wake.set()
+        if status != "paused":
+            self.start()
+        return True
+
+    def cancel(self) -> bool:
+        return self.set_status("cancelled")
+
+    # Продолжение после запуска сервера (Ready): только если задание не на паузе
+    def resume_pending(self):
+        job = self.job
+        if job is not None and job["status"] == "running":
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._wake.set()
+                return
+            self._thread = threading.Thread(target=self._run, name=f"tetos-pregen-{self.name}", daemon=True)
+            self._thread.start()
+
+    # ===== Прогресс для pregen status =====
+    def progress(self) -> Optional[dict]:
+        job = self.job
+        if job is None:
+            return None
+        done = job["chunks_done"]
+        rate = done / job["active_seconds"] if job["active_seconds"] > 0 else None
+        remaining = job["total_chunks"] - done
+        return {
+            "status": job["status"],
+            "dimension": job["dimension"],
+            "center": tuple(job["center"]),
+            "radius": job["radius"],
+            "chunks_done": done,
+            "total_chunks": job["total_chunks"],
+            "percent": done / job["total_chunks"] * 100 if job["total_chunks"] else 100.0,
+            "rate": rate,
+            "eta_seconds": remaining / rate if rate else None,
+            "batch_chunks": job["batch_tiles"] * self.tile * self.tile,
+            "pace": job["pace"],
+            "hours": job["hours"],
+        }
+
+    # ===== Поток прегенерации =====
+    def _run(self):
+        while True:
+            job = self.job
+            if job is None:
+                return
+            try:
+                if job["status"] == "cancelled":
+                    self._release_inflight()
+                    with self._lock:
+                        self.job = None
+                        self._save()
+                    print(f"{YELLOW}⏹ Pre-generation{self.label()} cancelled{RESET}")
+                    return
+                if job["status"] != "running":
+                    if job["inflight"] and self.is_ready():
+                        self._release_inflight()
+                    return
+                if not self.is_ready() or not in_hours(job["hours"]):
+                    self._wake.wait(self.idle_poll)
+                    self._wake.clear()
+                    continue
+
+                self._release_inflight()
+                if not self._step(job):
+                    continue
+                if job["next_tile"] >= job["total_tiles"] and not job.get("retry"):
+                    with self._lock:
+                        job["status"] = "done"
+                        self._save()
+                    print(f"{GREEN}✅ Pre-generation{self.label()} finished: {job['chunks_done']} chunks in "
+                          f"{format_eta(job['active_seconds'])}{RESET}")
+                    return
+            except Exception as e:
+                print(f"{RED}❌ Pre-generation{self.label()} error: {e}{RESET}")
+                self._wake.wait(self.idle_poll)
+                self._wake.clear()
+
+    def _forceload(self, action: str, tile) -> bool:
+        dimension = dimension_id(self.job["dimension"]) or DIMENSIONS["overworld"]
+        x1, z1, x2, z2 = tile
+        command = f"execute in {dimension} run forceload {action} {x1 * 16} {z1 * 16} {x2 * 16} {z2 * 16}"
+        # Каждая команда ждёт свой ответ: одинаковый шаблон ответа у разных команд
+        # в полёте разрешился бы первой же строкой
+        match = query(self.console, command, FORCELOAD_PATTERN, timeout=FORCELOAD_TIMEOUT, swallow=FORCELOAD_PATTERN)
+        return match is not None and match.group(1) != "Too many chunks"
+
+    # Все чанки плитки загружены (сгенерированы); нет ответа — считаем, что нет
+    def _is_loaded(self, tile) -> bool:
+        dimension = dimension_id(self.job["dimension"]) or DIMENSIONS["overworld"]
+        x1, z1, x2, z2 = tile
+        checks = " ".join(
+            f"if loaded {x * 16} 0 {z * 16}" for x in range(x1, x2 + 1) for z in range(z1, z2 + 1)
+        )
+        match = query(self.console, f"execute in {dimension} {checks}", LOADED_PATTERN,
+                      timeout=FORCELOAD_TIMEOUT, swallow=LOADED_PATTERN)
+        return match is not None and match.group(1) == "passed"
+
+    # Пачка, помеченная перед падением сервера или паузой, — снимаем
+    def _release_inflight(self):
+        job = self.job
+        if not job or not job["inflight"]:
+            return
+        for tile in job["inflight"]:
+            self._forceload("remove", tile)
+        with self._lock:
+            job["inflight"] = []
+            self._save()
+
+    # Одна пачка; False — сервер перестал отвечать, пачка не засчитана
+    def _step(self, job: dict) -> bool:
+        started = time.monotonic()
+        retry = job.setdefault("retry", [])[:job["batch_tiles"]]
+        fresh = job["batch_tiles"] - len(retry)
+        spiral = spiral_tiles(job["center"][0], job["center"][1], job["radius"], job["tile"])
+        tiles = retry + [list(tile) for tile in islice(spiral, job["next_tile"], job["next_tile"] + fresh)]
+        fresh = len(tiles) - len(retry)
+
+        with self._lock:
+            job["inflight"] = tiles
+            self._save()
+        for tile in tiles:
+            if not self._forceload("add", tile):
+                return False
+
+        # Генерация идёт в тиках после forceload add: ждём хотя бы pace и пока MSPT не в бюджете
+        mspt = self._wait_for_budget(job["pace"])
+        if mspt is None:
+            return False
+
+        # Засчитываем только загруженные целиком плитки; остальные — в следующую пачку
+        loaded = [tile for tile in tiles if self._is_loaded(tile)]
+        if not self.is_ready():
+            return False
+        pending = [tile for tile in tiles if tile not in loaded]
+
+        for tile in tiles:
+            self._forceload("remove", tile)
+
+        budget = self.mspt_budget
+        with self._lock:
+            job["inflight"] = []
+            job["retry"] = pending + job["retry"][len(retry):]
+            job["next_tile"] += fresh
+            job["chunks_done"] += sum(tile_chunks(tile) for tile in loaded)
+            job["active_seconds"] += time.monotonic() - started
+            if mspt > budget or pending:
+                job["batch_tiles"] = max(1, job["batch_tiles"] // 2)
+                job["pace"] = min(self.max_dwell, job["pace"] * 2)
+            elif mspt < budget * 0.6:
+                job["batch_tiles"] = min(self.max_batch_tiles, job["batch_tiles"] + 1)
+                job["pace"] = max(self.min_dwell, job["pace"] * 0.8)
+            self._save()
+        return True
+
+    # Самый высокий MSPT за ожидание; None — сервер не готов.
+    # fetch_tick() отдаёт 0, если сервер не ответил на запрос тика (обычно — перегружен):
+    # это не замер, а превышение бюджета — ждём дальше, а пачку потом уменьшаем (inf).
+    def _wait_for_budget(self, pace: float) -> Optional[float]:
+        deadline = time.monotonic() + self.max_dwell
+        time.sleep(pace)
+        peak = 0.0
+        while True:
+            if not self.is_ready():
+                return None
+            _, mspt = self.fetch_tick()
+            if mspt <= 0:
+                peak = float("inf")
+            else:
+                peak = max(peak, mspt)
+            if 0 < mspt <= self.mspt_budget or time.monotonic() >= deadline:
+                return peak
+            time.sleep(1.0)
@@ -0,0 +1,214 @@
+# ==============================================================================
+# region_files.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import re
+import mmap
+import struct
+import heapq
+
+from pathlib import Path
+from typing import Optional
+from runtime import worker_pool
+
+
+# ===== Формат region-файла Anvil (.mca) =====
+# 0..4 KiB — 1024 записи расположения: 3 байта смещения (в секторах) + 1 байт числа секторов
+# 4..8 KiB — 1024 метки времени последней записи чанка (секунды, big-endian)
+# Дальше сектора по 4 KiB; в начале данных чанка — длина (4 байта) и тип сжатия (1 байт).
+# Тип | 128 — чанк не поместился и лежит рядом в c.<x>.<z>.mcc.
+SECTOR_BYTES = 4096
+HEADER_SECTORS = 2
+CHUNKS_PER_REGION = 1024
+EXTERNAL_FLAG = 0x80
+
+_HEADER = struct.Struct(">1024I1024I")
+_CHUNK_HEADER = struct.Struct(">IB")
+_REGION_NAME = re.compile(r"r\.(-?\d+)\.(-?\d+)\.mca$")
+
+# Папки с region-файлами: блоки, сущности (1.17+), точки интереса
+REGION_KINDS = ("region", "entities", "poi")
+
+# Первая папка внутри папки мира -> измерение (как в world_size)
+_DIMENSION_BY_DIR = {
+    "DIM-1": "nether",
+    "DIM1": "end",
+}
+_DIMENSION_BY_NAME = {
+    "overworld": "overworld",
+    "the_nether": "nether",
+    "the_end": "end",
+}
+
+
+def region_coords(path) -> Optional[tuple]:
+    match = _REGION_NAME.search(os.path.basename(str(path)))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+# ===== Измерение по пути папки region относительно папки мира =====
+# world/region -> overworld, world/DIM-1/region и world_nether/DIM-1/region -> nether,
+# world/dimensions/<ns>/<имя>/region -> <имя> (the_nether/the_end -> nether/end)
+def dimension_of(region_dir: Path, world_dir: Path) -> str:
+    parts = Path(os.path.relpath(region_dir, world_dir)).parts[:-1]
+    if not parts:
+        return "overworld"
+    if parts[0] == "dimensions" and len(parts) >= 3:
+        return _DIMENSION_BY_NAME.get(parts[2], f"{parts[1]}:{parts[2]}")
+    return _DIMENSION_BY_DIR.get(parts[0], "/".join(parts))
+
+
+# ===== Все region-файлы мира: (путь, измерение, вид) =====
+def find_region_files(world_dirs: list) -> list:
+    found = []
+    for world_dir in world_dirs:
+        world_dir = Path(world_dir)
+        for dirpath, dirnames, filenames in os.walk(world_dir):
+            kind = os.path.basename(dirpath)
+            if kind not in REGION_KINDS:
+                continue
+            dirnames.clear()  # внутри region-папок подпапок нет
+            dimension = dimension_of(Path(dirpath), world_dir)
+            for filename in sorted(filenames):
+                if _REGION_NAME.search(filename):
+                    found.append((os.path.join(dirpath, filename), dimension, kind))
+    return found
+
+
+# ===== Заголовок: [(индекс, смещение, секторы, метка времени)] для занятых слотов =====
+def read_header(data) -> list:
+    values = _HEADER.unpack_from(data, 0)
+    entries = []
+    for index in range(CHUNKS_PER_REGION):
+        location = values[index]
+        if location == 0:
+            continue
+        entries.append((index, location >> 8, location & 0xFF, values[CHUNKS_PER_REGION + index]))
+    return entries
+
+
+# ===== Разбор одного файла (выполняется в пуле) =====
+# Читаются только заголовок и по 5 байт в начале каждого чанка — без распаковки.
+# Возвращает сводку и top_chunks крупнейших чанков файла.
+def analyze_region(path: str, top_chunks: int = 5) -> dict:
+    result = {
+        "path": path,
+        "file_bytes": 0,
+        "chunks": 0,
+        "external": 0,
+        "used_sectors": 0,
+        "free_sectors": 0,
+        "data_bytes": 0,
+        "oldest": None,
+        "newest": None,
+        "largest": [],
+        "error": None,
+    }
+    try:
+        size = os.path.getsize(path)
+        result["file_bytes"] = size
+        if size == 0:
+            return result
+        if size < HEADER_SECTORS * SECTOR_BYTES:
+            result["error"] = "truncated header"
+            return result
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            file_sectors = (size + SECTOR_BYTES - 1) // SECTOR_BYTES
+            occupied = bytearray(file_sectors)
+            occupied[:HEADER_SECTORS] = b"\x01" * HEADER_SECTORS
+            region = region_coords(path) or (0, 0)
+            largest = []
+
+            for index, offset, sectors, timestamp in read_header(data):
+                start = offset * SECTOR_BYTES
+                # Последний сектор может быть не дописан до 4 KiB: заголовок чанка должен влезать в файл
+                if offset < HEADER_SECTORS or offset + sectors > file_sectors or sectors == 0 \
+                        or start + _CHUNK_HEADER.size > size:
+                    result["error"] = "chunk outside the file"
+                    continue
+                occupied[offset:offset + sectors] = b"\x01" * sectors
+                result["chunks"] += 1
+                result["used_sectors"] += sectors
+
+                length, compression = _CHUNK_HEADER.unpack_from(data, start)
+                if compression & EXTERNAL_FLAG:
+                    result["external"] += 1
+                    length = 0  # данные в .mcc, в секторах — только заголовок
+                else:
+                    length = min(length, sectors * SECTOR_BYTES)
+                result["data_bytes"] += length
+
+                if timestamp:
+                    result["oldest"] = timestamp if result["oldest"] is None else min(result["oldest"], timestamp)
+                    result["newest"] = timestamp if result["newest"] is None else max(result["newest"], timestamp)
+
+                chunk = (length, region[0] * 32 + index % 32, region[1] * 32 + index // 32)
+                if len(largest) < top_chunks:
+                    heapq.heappush(largest, chunk)
+                elif chunk > largest[0]:
+                    heapq.heapreplace(largest, chunk)
+
+            result["free_sectors"] = occupied.count(0)
+            result["largest"] = sorted(largest, reverse=True)
+    except (OSError, ValueError, struct.error) as e:
+        result["error"] = str(e)
+    return result
+
+
+# ===== Статистика мира: файлы разбираются параллельно в пуле =====
+# Сводка по (измерение, вид) + крупнейшие чанки и файлы с наибольшими потерями.
+def world_region_stats(world_dirs: list, workers: int = None, top: int = 5) -> dict:
+    files = find_region_files(world_dirs)
+    workers = workers or os.cpu_count() or 2
+
+    results = []
+    if files:
+        with worker_pool(min(workers, len(files)), "tetos-regions") as pool:
+            results = list(pool.map(analyze_region, [path for path, _, _ in files], [top] * len(files)))
+
+    groups = {}
+    largest = []
+    wasted = []
+    errors = []
+    for (path, dimension, kind), result in zip(files, results):
+        group = groups.setdefault((dimension, kind), {
+            "files": 0,
+            "file_bytes": 0,
+            "chunks": 0,
+            "external": 0,
+            "used_sectors": 0,
+            "free_sectors": 0,
+            "data_bytes": 0,
+            "oldest": None,
+            "newest": None,
+        })
+        group["files"] += 1
+        for key in ("file_bytes", "chunks", "external", "used_sectors", "free_sectors", "data_bytes"):
+            group[key] += result[key]
+        for key, pick in (("oldest", min), ("newest", max)):
+            if result[key] is not None:
+                group[key] = result[key] if group[key] is None else pick(group[key], result[key])
+
+        if result["error"] is not None:
+            errors.append((path, result["error"]))
+        if kind == "region":
+            for length, cx, cz in result["largest"]:
+                largest.append((length, dimension, cx, cz, path))
+        free_bytes = result["free_sectors"] * SECTOR_BYTES
+        if free_bytes:
+            wasted.append((free_bytes, dimension, kind, path, result["file_bytes"]))
+
+    return {
+        "files": len(files),
+        "groups": groups,
+        "largest_chunks": heapq.nlargest(top, largest),
+        "most_wasted": heapq.nlargest(top, wasted),
+        "errors": errors,
+    }
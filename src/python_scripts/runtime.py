@@ -0,0 +1,173 @@
+# ==============================================================================
+# runtime.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import sys
+import threading
+
+from functools import partial
+
+
+# ===== Пул для тяжёлой работы на CPU (сжатие бэкапов, разбор region-файлов) =====
+# Потоки: zlib/zstd, sha256 и чтение файлов отпускают GIL.
+# Процессы не подходят: fork из многопоточного tetOS может унаследовать чужую
+# захваченную блокировку и зависнуть, а spawn заново выполнил бы main.py.
+def worker_pool(workers: int, name: str = "tetos-worker"):
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+
+# ===== Один цикл asyncio для процессов серверов, CLI и Telegram =====
+# Цикл крутится в потоке "tetos-loop": чтение вывода серверов, запись в их
+# stdin, остановка, ввод CLI и запросы Telegram идут в нём. Граница с
+# блокирующим кодом одна и явная:
+#   - из цикла в потоки: await run_blocking(func, ...)  (диск, psutil, команды CLI)
+#   - из потоков в цикл: submit(coro) / run(coro) / call_soon(func, ...)
+# В самом цикле ничего блокирующего не вызываем, а run() из цикла — ошибка.
+# asyncio (~60 мс импорта) грузится при старте цикла, уже после prompt.
+class AsyncRuntime:
+    def __init__(self, workers: int = 8):
+        self.workers = workers
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Ввод CLI: байты из stdin, которые ещё не сложились в строку
+        self._stdin_buffer = b""
+        self._stdin_lines = None
+        self._stdin_eof = False
+
+    @property
+    def loop(self) -> "asyncio.AbstractEventLoop":
+        self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="tetos-loop", daemon=True)
+            self._thread.start()
+        ready.wait()
+
+    def _run(self, ready: threading.Event):
+        import asyncio
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        self._loop.run_forever()
+
+    def in_loop(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    # ===== Из потоков в цикл =====
+    def submit(self, coro) -> "Future":
+        import asyncio
+
+        loop = self.loop
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    # Дождаться корутины из обычного потока. Ждём короткими отрезками, чтобы
+    # Ctrl+C в главном потоке срабатывал на любой платформе.
+    def run(self, coro, timeout: float = None):
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run() called from the event loop; use await instead")
+
+        from concurrent.futures import TimeoutError
+
+        future = self.submit(coro)
+        deadline = None if timeout is None else self._loop.time() + timeout
+        while True:
+            wait = 0.5 if deadline is None else min(0.5, max(0.0, deadline - self._loop.time()))
+            try:
+                return future.result(timeout=wait)
+            except TimeoutError:
+                if deadline is not None and self._loop.time() >= deadline:
+                    future.cancel()
+                    raise
+
+    def call_soon(self, callback, *args):
+        if self.in_loop():
+            self._loop.call_soon(callback, *args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    # ===== Из цикла в потоки =====
+    async def run_blocking(self, func, *args, executor=None, **kwargs):
+        if executor is None:
+            executor = self._blocking_executor()
+        return await self._loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+    def _blocking_executor(self):
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tetos-blocking")
+            return self._executor
+
+    # ===== Ввод CLI =====
+    # POSIX: цикл ждёт готовности stdin в селекторе и читает его через
+    # os.read (без O_NONBLOCK на терминале, который делят stdin и stdout).
+    # Windows и циклы без add_reader: input() в фоновом потоке "tetos-stdin".
+    # Конец ввода — EOFError, как у input().
+    async def read_line(self) -> str:
+        import asyncio
+
+        if self._stdin_lines is None:
+            self._stdin_lines = asyncio.Queue()
+            try:
+                self._loop.add_reader(sys.stdin.fileno(), self._on_stdin)
+            except (NotImplementedError, AttributeError, ValueError, OSError):
+                threading.Thread(target=self._read_stdin_blocking, name="tetos-stdin", daemon=True).start()
+
+        if self._stdin_lines.empty() and self._stdin_eof:
+            raise EOFError
+        line = await self._stdin_lines.get()
+        if line is None:
+            self._stdin_eof = True
+            raise EOFError
+        return line
+
+    def _read_stdin_blocking(self):
+        while True:
+            try:
+                line = input()
+            except EOFError:
+                line = None
+            self._loop.call_soon_threadsafe(self._stdin_lines.put_nowait, line)
+            if line is None:
+                return
+
+    def _on_stdin(self):
+        fd = sys.stdin.fileno()
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self._loop.remove_reader(fd)
+            if self._stdin_buffer:
+                self._stdin_lines.put_nowait(self._stdin_buffer.decode(errors="replace"))
+                self._stdin_buffer = b""
+            self._stdin_lines.put_nowait(None)
+            return
+
+        self._stdin_buffer += data
+        *lines, self._stdin_buffer = self._stdin_buffer.split(b"\n")
+        for line in lines:
+            self._stdin_lines.put_nowait(line.rstrip(b"\r").decode(errors="replace"))
@@ -8,12 +8,16 @@
 
 import os
 import sys
-import subprocess
 import threading
-import platform
 import config
 
 from typing import Optional
+from functools import partial
+from runtime import AsyncRuntime
+from server_instance import ServerInstance, discover_instance_dirs
+from network_addresses import NetworkAddressResolver, KIND_VPN
+from world_size import WORLD_PARTS, format_size
+from console_renderer import LOG_LEVELS
 from config import (
     GREEN,
     YELLOW,
@@ -23,84 +27,159 @@ from config import (
     VERSION
     )
 
-try:
-    from telegram_bot import (
-        broadcast,
-        notify_server_ready,
-        notify_server_stopped,
-        notify_server_restarted
-    )
-except ImportError:
-    print(f"Failed to import telegram_bot.py (notification) in server_commands.py: {e}")
-    broadcast = lambda *_: None
-    notify_server_ready = lambda: None
-    notify_server_stopped = lambda: None
-    notify_server_restarted = lambda: None
 
+# ===== Цикл asyncio: процессы серверов, ввод CLI, Telegram =====
+RUNTIME = AsyncRuntime(workers=config.RUNTIME_BLOCKING_WORKERS)
+config.RUNTIME = RUNTIME
+
+
+# ===== telegram_bot (telebot, dotenv) импортируется только когда бот уже поднят =====
+# Пока config.TELEGRAM_BOT пуст, уведомлять некого и грузить модуль незачем;
+# после init_bot() он уже в sys.modules и import ничего не стоит.
+def _telegram():
+    if config.TELEGRAM_BOT is None:
+        return None
+    import telegram_bot
+    return telegram_bot
+
+
+def broadcast(message, parse_mode="Markdown", category=None):
+    bot = _telegram()
+    if bot is not None:
+        bot.broadcast(message, parse_mode=parse_mode, category=category)
+
+
+def notify_server_ready(instance):
+    bot = _telegram()
+    if bot is not None:
+        bot.notify_server_ready(instance)
+
+
+def notify_server_stopped(instance):
+    bot = _telegram()
+    if bot is not None:
+        bot.notify_server_stopped(instance)
+
+
+def notify_server_restarted(instance):
+    bot = _telegram()
+    if bot is not None:
+        bot.notify_server_restarted(instance)
 
-# ===== Убиваем процесс, который использует порт =====
+
+def get_broadcast_stats() -> dict:
+    bot = _telegram()
+    return bot.get_broadcast_stats() if bot is not None else {}
+
+
+# ===== psutil загружается один раз, при первом обращении (None — не установлен) =====
+_PSUTIL = None
+_PSUTIL_CHECKED = False
+
+
+def get_psutil():
+    global _PSUTIL, _PSUTIL_CHECKED
+    if not _PSUTIL_CHECKED:
+        _PSUTIL_CHECKED = True
+        try:
+            import psutil
+            _PSUTIL = psutil
+        except ImportError:
+            _PSUTIL = None
+    return _PSUTIL
+
+
+# ===== Освобождаем порт: только от чужого сервера Minecraft, сначала SIGTERM =====
 def kill_process_on_port(port=25565) -> bool:
-    import subprocess
-    try:
-        result = subprocess.run(
-            ["lsof", "-t", f"-i:{port}"],
-            capture_output=True,
-            text=True
-        )
-        pids = result.stdout.strip().split("\n")
-        if not pids or pids == ['']:
-            # Если на порту никого нет
-            return False
-        for pid in pids:
-            if pid:
-                subprocess.run(["kill", "-9", pid])
-                print(f"{RED}🔪 Killed process {pid} on port {port}{RESET}")
-        return True
-    except Exception as e:
-        print(f"{RED}❌ Failed to kill process on port {port}: {e}{RESET}")
+    from port_owner import find_port_owners, terminate_process
+
+    owners = find_port_owners(port, psutil=get_psutil())
+    if owners is None:
+        print(f"{RED}❌ Cannot check port {port}: no /proc and psutil is not installed{RESET}")
+        return False
+    if not owners:
+        # Если на порту никого нет
         return False
 
+    managed = {instance.pid(): instance.name for instance in config.SERVER_INSTANCES.values() if instance.pid()}
+    freed = False
+    for owner in owners:
+        if owner.pid == os.getpid() or owner.pid in managed:
+            name = managed.get(owner.pid, "tetOS")
+            print(f"{YELLOW}Port {port} is used by server '{name}' managed by this tetOS, not killing it{RESET}")
+            continue
+        if not owner.is_minecraft():
+            print(f"{RED}❌ Port {port} is used by {owner.describe()}, which is not a Minecraft server. Not killing it.{RESET}")
+            continue
+
+        print(f"{YELLOW}🔪 Stopping {owner.describe()} on port {port}...{RESET}")
+        result = terminate_process(owner.pid, timeout=config.PORT_OWNER_TERM_TIMEOUT)
+        if result == "terminated":
+            print(f"{RED}🔪 Process {owner.pid} on port {port} terminated{RESET}")
+            freed = True
+        elif result == "killed":
+            print(f"{RED}🔪 Process {owner.pid} on port {port} killed (ignored SIGTERM){RESET}")
+            freed = True
+        else:
+            print(f"{RED}❌ Failed to stop process {owner.pid} on port {port} (permission denied?){RESET}")
+    return freed
+
+
+# Свойства, которые можно менять командой set
+PROPERTY_OPTIONS = [
+    "max-players",
+    "motd",
+    "gamemode",
+    "difficulty",
+]
+
+
+# ===== Текущий экземпляр сервера (команды CLI без имени относятся к нему) =====
+def current_instance() -> ServerInstance:
+    if config.ACTIVE_INSTANCE is None:
+        load_instances()
+    return config.ACTIVE_INSTANCE
+
 
 # ===== Функция для получения порта из server.properties =====
-def get_server_port(default_port=25565) -> int:
-    props_file = config.SERVER_DIR.parent / "server.properties"
-    if not props_file.exists():
-        return default_port
+def get_server_port(default_port=25565, instance: ServerInstance = None) -> int:
+    instance = instance or current_instance()
     try:
-        with open(props_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("server-port="):
-                    return int(line.strip().split("=")[1])
-    except Exception:
-        pass
-    return default_port
+        return instance.properties.get_int("server-port", default_port)
+    except OSError:
+        return default_port
 
 
-# ===== Функция для получения статуса телеграм бота =====
+# ===== Функция для получения статуса телеграм бота (из кеша, без сети) =====
 def get_telegram_bot_status() -> str:
-    try:
-        if config.TELEGRAM_BOT is None:
-            return f"{YELLOW}Disabled{RESET}"
-
-        bot_info = config.TELEGRAM_BOT.get_me()
+    if config.TELEGRAM_BOT_STARTING:
+        return f"{YELLOW}Starting...{RESET}"
+    if config.TELEGRAM_BOT is None or config.TELEGRAM_HEALTH is None:
+        return f"{YELLOW}Disabled{RESET}"
 
-        return f"{GREEN}Connected (@{bot_info.username}){RESET}"
+    return config.TELEGRAM_HEALTH.status_text()
 
-    except Exception:
-        return f"{RED}Invalid token / connection failed{RESET}"
 
+# ===== Функция для получения состояния очереди Telegram рассылки =====
+def get_broadcast_queue_status() -> str:
+    stats = get_broadcast_stats()
+    if not stats:
+        return f"{YELLOW}Disabled{RESET}"
 
-# ===== Функция для проверки запуска сервера =====
-def is_server_running() -> bool:
     return (
-        config.SERVER_PROCESS is not None
-        and config.SERVER_PROCESS.poll() is None
+        f"{stats['queue_depth']} queued, {stats['sent']} sent, {stats['failed']} failed "
+        f"(avg {stats['latency_avg_ms']:.0f} ms, max {stats['latency_max_ms']:.0f} ms)"
     )
 
 
+# ===== Функция для проверки запуска сервера =====
+def is_server_running(instance: ServerInstance = None) -> bool:
+    return (instance or current_instance()).is_running()
+
+
 # ===== Функция для проверки остановленного сервера =====
-def is_server_stopped() -> bool:
-    return not is_server_running()
+def is_server_stopped(instance: ServerInstance = None) -> bool:
+    return not is_server_running(instance)
 
 
 # ===== Функция для cета значнеия в .env файле =====
@@ -127,90 +206,169 @@ def update_env_variable(key: str, value: str):
 
 
 # ===== Функция для запуска сервера =====
-def start_server(hard: bool = False):
-    if is_server_running():
-        print(f"{YELLOW}Server is already running!{RESET}")
-        return
+def start_server(hard: bool = False, instance: ServerInstance = None):
+    instance = instance or current_instance()
+    with instance.lifecycle_lock:
+        if instance.is_stopping():
+            print(f"{YELLOW}Server{instance.label()} is still {instance.status()}, try again when it has stopped.{RESET}")
+            return
+        if instance.is_running():
+            print(f"{YELLOW}Server{instance.label()} is already running!{RESET}")
+            return
+        # Бэкап остановленного сервера ещё копирует мир (или идёт restore) — не даём серверу писать в него
+        if instance.backups.lock.locked():
+            print(f"{YELLOW}A backup or restore of server{instance.label()} is in progress, try again when it has finished.{RESET}")
+            return
 
-    if hard:
-        print(f"{RED}🚨 Server HARD start ...{RESET}")
-        port = get_server_port()
-        kill_process_on_port(port)
-    else:
-        print(f"{GREEN}🚀 Starting server...{RESET}")
-
-    config.SERVER_IS_READY = False
-    config.SERVER_GAME_MODE = "UNKNOWN"
-    config.SERVER_MC_VERSION = "UNKNOWN"
-    config.SERVER_MAX_PLAYERS = get_max_players()
-    config.SERVER_MAX_RAM_MB = get_max_ram_mb()
-    config.SERVER_PROCESS = subprocess.Popen(
-        [str(config.RUN_SCRIPT)],
-        cwd=config.SERVER_DIR,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True
-    )
-    threading.Thread(target=read_output, args=(config.SERVER_PROCESS,), daemon=True).start()
-    
+        if hard:
+            print(f"{RED}🚨 Server{instance.label()} HARD start ...{RESET}")
+            port = get_server_port(instance=instance)
+            kill_process_on_port(port)
+        else:
+            print(f"{GREEN}🚀 Starting server{instance.label()}...{RESET}")
 
-# ===== Функция для остановки сервера =====
-def stop_server(silent: bool = False):
-    if is_server_running():
-        print(f"{RED}🛑 Stopping server...{RESET}")
-        config.SERVER_PROCESS.stdin.write("stop\n")
-        config.SERVER_PROCESS.stdin.flush()
-        config.SERVER_PROCESS.wait()
-        config.SERVER_PROCESS = None
-        config.SERVER_IS_READY = False
-        config.SERVER_GAME_MODE = "UNKNOWN"
-        config.SERVER_MC_VERSION = "UNKNOWN"
-        config.SERVER_IP = "Unknown"
-        config.SERVER_LOCAL_IP = "Unknown"
-        config.SERVER_PORT = "Unknown"
-
-        print(f"{RED}🛑 Server stopped!{RESET}")
+        instance.reset_state()
+        NETWORK.start()
+        instance.max_players = get_max_players(instance)
+        instance.max_ram_mb = get_max_ram_mb(instance)
+        instance.spawn()
+
+
+# ===== Функция для остановки сервера (не блокирует: остановка идёт в фоне) =====
+def stop_server(silent: bool = False, instance: ServerInstance = None, on_stopped=None) -> bool:
+    instance = instance or current_instance()
+    if instance.is_stopping():
+        print(f"{YELLOW}Server{instance.label()} is already {instance.status()}{RESET}")
+        return False
+    if not instance.is_running():
+        print(f"{YELLOW}Server{instance.label()} is not running! Use 'start' to launch.{RESET}")
+        return False
 
+    def finished(elapsed: float):
+        print(f"{RED}🛑 Server{instance.label()} stopped in {elapsed:.1f}s!{RESET}")
         if silent is False:
-            notify_server_stopped()
-    else:
-        print(f"{YELLOW}Server is not running! Use 'start' to launch.{RESET}")
+            notify_server_stopped(instance)
+        if on_stopped is not None:
+            on_stopped()
 
+    print(f"{RED}🛑 Stopping server{instance.label()}...{RESET}")
+    return instance.stop_async(finished)
 
-# ===== Функция для перезапуска сервера =====
-def restart_server():
-    if is_server_running():
-        print(f"{YELLOW}🔄 Restarting server...{RESET}")
-        stop_server(silent=True)
-        start_server()
-        notify_server_restarted()
 
-        config.SERVER_ONLINE_PLAYERS = 0
+# ===== Функция для перезапуска сервера (время до "Done" печатает on_ready) =====
+def restart_server(instance: ServerInstance = None):
+    import time
+
+    instance = instance or current_instance()
+    if not instance.is_running():
+        start_server(instance=instance)
+        return
+
+    print(f"{YELLOW}🔄 Restarting server{instance.label()}...{RESET}")
+    instance.restart_started = time.monotonic()
+    if stop_server(silent=True, instance=instance, on_stopped=lambda: start_server(instance=instance)):
+        notify_server_restarted(instance)
     else:
-        start_server()
+        instance.restart_started = None
+
+
+# ===== Выполнить действие для нескольких серверов параллельно =====
+def run_on_instances(action, instances: list):
+    if len(instances) == 1:
+        action(instances[0])
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = min(len(instances), config.INSTANCE_POOL_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tetos-instance") as pool:
+        futures = [(instance, pool.submit(action, instance)) for instance in instances]
+        for instance, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"{RED}❌ {instance.name}: {e}{RESET}")
+
+
+# ===== Разбор цели команды: пусто — текущий сервер, all — все, иначе имя =====
+def resolve_instances(args: list) -> Optional[list]:
+    names = [arg for arg in args if not arg.startswith("--")]
+    if not names:
+        return [current_instance()]
+    if names[0] == "all":
+        return list(config.SERVER_INSTANCES.values())
+
+    instance = config.SERVER_INSTANCES.get(names[0])
+    if instance is None:
+        print(f"{RED}❌ Unknown server: {names[0]}. Available: {', '.join(config.SERVER_INSTANCES)}{RESET}")
+        return None
+    return [instance]
+
+
+# ===== Команды start/stop/restart [all|<name>] =====
+def handle_start_command(args: list):
+    instances = resolve_instances(args)
+    if instances is not None:
+        hard = "--hard" in args
+        run_on_instances(lambda instance: start_server(hard=hard, instance=instance), instances)
+
+
+def handle_stop_command(args: list):
+    instances = resolve_instances(args)
+    if instances is None:
+        return
+    if len(instances) > 1:
+        instances = [instance for instance in instances if instance.is_running()]
+        if not instances:
+            print(f"{YELLOW}No servers are running.{RESET}")
+            return
+    run_on_instances(lambda instance: stop_server(instance=instance), instances)
+
+
+def handle_restart_command(args: list):
+    instances = resolve_instances(args)
+    if instances is not None:
+        run_on_instances(lambda instance: restart_server(instance=instance), instances)
+
+
+# ===== Команда status: состояние всех серверов одной строкой =====
+def print_status():
+    for instance in config.SERVER_INSTANCES.values():
+        status = instance.status()
+        color = GREEN if status == "running" else RED if status == "stopped" else YELLOW
+        print(f"{instance.name}: {color}{status}{RESET}")
+
+
+# ===== Команда use: переключение текущего сервера =====
+def handle_use_command(args: list):
+    if args:
+        instance = config.SERVER_INSTANCES.get(args[0])
+        if instance is None:
+            print(f"{RED}❌ Unknown server: {args[0]}. Available: {', '.join(config.SERVER_INSTANCES)}{RESET}")
+            return
+        config.ACTIVE_INSTANCE = instance
+        print(f"{GREEN}Using server: {instance.name} ({instance.server_dir}){RESET}")
+        return
+
+    print(f"{YELLOW}Usage: use <name>{RESET}")
+    for instance in config.SERVER_INSTANCES.values():
+        marker = "*" if instance is current_instance() else " "
+        status = f"{GREEN}running{RESET}" if instance.is_running() else f"{RED}stopped{RESET}"
+        print(f" {marker} {instance.name:<12} {status}  {instance.server_dir}")
 
 
 # ===== Функция для чтения max-players из server.properties =====
-def get_max_players():
-    props_file = config.SERVER_DIR / "server.properties"
-    if not props_file.exists():
-        return 1
+def get_max_players(instance: ServerInstance = None):
+    instance = instance or current_instance()
     try:
-        with open(props_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("max-players="):
-                    return int(line.split("=")[1].strip())
-    except:
-        pass
-    return 1
+        return instance.properties.get_int("max-players", 1)
+    except OSError:
+        return 1
 
 
 # ===== Функция для чтения максимальной RAM из run_server.sh =====
-def get_max_ram_mb():
-    script_file = config.RUN_SCRIPT
+def get_max_ram_mb(instance: ServerInstance = None):
+    script_file = (instance or current_instance()).run_script
     if not script_file.exists():
         return 4096  # дефолт, если файла нет
     try:
@@ -230,64 +388,57 @@ def get_max_ram_mb():
     return 4096  # fallback
 
 
-# ===== Функция для получения IP Hamachi =====
-def detect_hamachi_ip() -> str:
-    try:
-        ip = subprocess.check_output(
-            "hamachi | awk -F': +' '/address/ {print $2}' | awk '{print $1}'",
-            shell=True,
-            text=True
-        ).strip()
-        return ip if ip else "Unknown"
-    except Exception:
-        return "Unknown"
-
-
-# ===== Функция для получения IP Local =====
-def get_local_ip() -> str:
-    try:
-        ip = subprocess.check_output(
-            ["ipconfig", "getifaddr", "en0"],
-            text=True
-        ).strip()
-        return ip if ip else "Unknown"
-    except Exception:
-        return "Unknown"
-
-
-# ===== Функция для расчёта размера мира =====
-def get_world_size():
-    world_dir = config.SERVER_DIR / "world"
-    if not world_dir.exists():
-        return "Unknown"
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(world_dir):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            total_size += os.path.getsize(fp)
-    if total_size > 1024 * 1024 * 1024:
-        return f"{total_size / (1024**3):.2f} GB"
-    else:
-        return f"{total_size / (1024**2):.2f} MB"
+# ===== Кеш сетевых адресов (без hamachi/ipconfig, обновляется в фоне) =====
+NETWORK = NetworkAddressResolver(
+    get_psutil=get_psutil,
+    refresh_interval=config.NETWORK_REFRESH_INTERVAL,
+    change_poll_interval=config.NETWORK_CHANGE_POLL_INTERVAL
+)
+config.NETWORK_ADDRESSES = NETWORK
+
+
+# ===== Адреса для подключения к серверу: [(класс, подпись, "ip:port")] =====
+def get_server_addresses(instance: ServerInstance = None) -> list:
+    instance = instance or current_instance()
+    port = instance.port if instance.port != "Unknown" else get_server_port(instance=instance)
+    NETWORK.start()
+    return NETWORK.describe(port)
+
+
+# ===== Функция для получения размера мира (мгновенно, из кеша трекера) =====
+def get_world_size(instance: ServerInstance = None):
+    tracker = (instance or current_instance()).world_size
+    tracker.start()
+    totals = tracker.snapshot()
+    if totals is None:
+        return "Unknown" if not tracker.exists() else "Calculating..."
+
+    breakdown = ", ".join(
+        f"{part} {format_size(totals[part])}" for part in WORLD_PARTS
+    )
+    return f"{format_size(totals['total'])} ({breakdown})"
 
 
 # ===== Функция для used RAM =====
-def get_used_ram():
-    if is_server_stopped():
+def get_used_ram(instance: ServerInstance = None):
+    instance = instance or current_instance()
+    if is_server_stopped(instance):
         return "0 MB"
+    psutil = get_psutil()
+    if psutil is None:
+        return f"{CYAN}Unknown (install psutil for accurate){RESET}"
     try:
-        import psutil
-        p = psutil.Process(config.SERVER_PROCESS.pid)
+        p = psutil.Process(instance.process.pid)
         return f"{p.memory_info().rss / (1024**2):.2f} MB"
-    except:
-        return f"{CYAN}Unknown (install psutil for accurate){RESET}"
+    except psutil.Error:
+        return f"{CYAN}Unknown{RESET}"
 
 
 # ===== Команда для очистки терминала =====
 def clear_terminal():
-    if platform.system() in ["Linux", "Darwin"]:
+    if config.OS_NAME in ["Linux", "Darwin"]:
         os.system("clear")
-    elif platform.system() == "Windows":
+    elif config.OS_NAME == "Windows":
         os.system("cls")
 
 
@@ -312,32 +463,20 @@ def colorize_mspt(mspt: float) -> str:
 
 
 # ===== Функция для расчёта TPS и MSPT (только возвращает значения) =====
-def fetch_tps():
-    if is_server_stopped():
-        return 0.0, 0.0
-
-    import re
+def fetch_tps(instance: ServerInstance = None):
+    return (instance or current_instance()).fetch_tick()
 
-    # Отправляем команду серверу
-    config.SERVER_PROCESS.stdin.write("tick query\n")
-    config.SERVER_PROCESS.stdin.flush()
 
-    tps = 0.0
-    mspt = 0.0
-
-    # Читаем несколько строк ответа
-    for _ in range(15):  # максимум 15 строк
-        line = config.SERVER_PROCESS.stdout.readline()
-        if not line:
-            continue
-        if "Average time per tick:" in line:
-            match = re.search(r"Average time per tick: ([\d\.]+)ms", line)
-            if match:
-                mspt = float(match.group(1))
-                tps = min(20.0, 1000.0 / mspt)
-            break
-
-    return tps, mspt
+# ===== Функция для парсинга длительности (30s, 15m, 2h, 1d) в секунды =====
+def parse_duration(value: str) -> Optional[float]:
+    value = value.strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    try:
+        if value and value[-1] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+    except ValueError:
+        return None
 
 
 # ===== Функция для парсинга ввода команды set для RAM(min, max) =====
@@ -356,31 +495,23 @@ def parse_ram_value(value: str) -> Optional[int]:
 
 # ===== Функция для обновления значения RAM сервера =====
 def update_run_script_ram(run_script: config.RUN_SCRIPT, ram_min_mb=None, ram_max_mb=None, ram_min_unit="M", ram_max_unit="M"):
+    from jvm_profiles import rewrite_run_script
+
     if not run_script.exists():
         print(f"{RED}run_server.sh not found!{RESET}")
         return False
 
-    content = run_script.read_text()
-    import re
-
-    match = re.search(r"exec java .*", content)
-    if not match:
+    # Строка exec java пересобирается целиком: флаги профиля JVM зависят от heap
+    result = rewrite_run_script(
+        run_script.read_text(),
+        xms=None if ram_min_mb is None else f"{ram_min_mb}{ram_min_unit}",
+        xmx=None if ram_max_mb is None else f"{ram_max_mb}{ram_max_unit}"
+    )
+    if result is None:
         print(f"{RED}Cannot find java exec line in run_server.sh{RESET}")
         return False
 
-    old_line = match.group(0)
-    new_line = old_line
-
-    # Обновляем min RAM
-    if ram_min_mb is not None:
-        new_line = re.sub(r"-Xms\S+", f"-Xms{ram_min_mb}{ram_min_unit}", new_line)
-
-    # Обновляем max RA
-    if ram_max_mb is not None:
-        new_line = re.sub(r"-Xmx\S+", f"-Xmx{ram_max_mb}{ram_max_unit}", new_line)
-
-    content = content.replace(old_line, new_line)
-    run_script.write_text(content)
+    run_script.write_text(result[0])
 
     # Выводим в одну строку
     parts = []
@@ -395,8 +526,8 @@ def update_run_script_ram(run_script: config.RUN_SCRIPT, ram_min_mb=None, ram_ma
 
 
 # ===== Функция для получения значения min/max RAM из run_server.sh  =====
-def get_current_ram_value(which="min"):
-    content = config.RUN_SCRIPT.read_text()
+def get_current_ram_value(which="min", instance: ServerInstance = None):
+    content = (instance or current_instance()).run_script.read_text()
     import re
     if which == "min":
         match = re.search(r"-Xms(\d+[MG])", content, re.IGNORECASE)
@@ -410,12 +541,130 @@ def get_current_ram_value(which="min"):
     return None, None
 
 
+# ===== Память, которую держит запущенный сервер (вернётся при его перезапуске) =====
+# RSS процесса, без psutil — текущий -Xmx (профили с AlwaysPreTouch занимают его сразу)
+def held_memory_mb(instance: ServerInstance) -> int:
+    if is_server_stopped(instance):
+        return 0
+    psutil = get_psutil()
+    if psutil is not None:
+        try:
+            return int(psutil.Process(instance.process.pid).memory_info().rss / (1024**2))
+        except (psutil.Error, AttributeError):
+            pass
+    value, unit = get_current_ram_value("max", instance)
+    if value is None:
+        return 0
+    return value * (1024 if unit == "G" else 1)
+
+
+# ===== Проверка -Xmx по доступной памяти хоста (минус JVM_HEAP_HEADROOM_MB) =====
+# Память самого сервера (если он запущен) считается доступной: новый heap
+# займёт её место после перезапуска. Возвращает heap в МБ: тот же, урезанный
+# (JVM_AUTO_CAP_HEAP) или None, если урезать некуда.
+def check_heap_limit(heap_mb: int, instance: ServerInstance = None) -> Optional[int]:
+    from jvm_profiles import available_memory_mb, format_size_mb
+
+    instance = instance or current_instance()
+    available = available_memory_mb(get_psutil())
+    if available is None:
+        print(f"{CYAN}Cannot check available memory (install psutil), -Xmx is not verified{RESET}")
+        return heap_mb
+
+    held = held_memory_mb(instance)
+    limit = available + held - config.JVM_HEAP_HEADROOM_MB
+    if heap_mb <= limit:
+        return heap_mb
+
+    freed = f" (+{held} MB used by server{instance.label()})" if held else ""
+    print(f"{YELLOW}⚠️ -Xmx{format_size_mb(heap_mb)} exceeds available memory: {available} MB free{freed}, "
+          f"{config.JVM_HEAP_HEADROOM_MB} MB kept for the OS and JVM overhead{RESET}")
+    if not config.JVM_AUTO_CAP_HEAP:
+        return heap_mb
+    if limit < 512:
+        print(f"{RED}❌ Not enough free memory to cap the heap (limit {max(limit, 0)} MB){RESET}")
+        return None
+
+    capped = limit // 256 * 256
+    print(f"{YELLOW}Capping heap to -Xmx{format_size_mb(capped)}{RESET}")
+    return capped
+
+
+# ===== set jvm-profile: пересобрать строку exec java с флагами профиля =====
+def set_jvm_profile(profile: str, instance: ServerInstance = None) -> bool:
+    from jvm_profiles import find_java_line, rewrite_run_script
+
+    instance = instance or current_instance()
+    run_script = instance.run_script
+    if not run_script.exists():
+        print(f"{RED}run_server.sh not found!{RESET}")
+        return False
+
+    content = run_script.read_text()
+    line = find_java_line(content)
+    if line is None:
+        print(f"{RED}Cannot find java exec line in run_server.sh{RESET}")
+        return False
+
+    # Heap не меняется — только флаги; проверка памяти — в set ram-max
+    content, command = rewrite_run_script(content, profile=profile)
+    run_script.write_text(content)
+    instance.max_ram_mb = get_max_ram_mb(instance)
+
+    print(f"{GREEN}✅ JVM profile{instance.label()} set to {profile}{RESET}")
+    print(f"{CYAN}{' '.join(command.flags())}{RESET}")
+    return True
+
+
+# ===== set gc-log: флаг -Xlog:gc* с ротацией в строке exec java =====
+def set_gc_logging(enabled: bool, instance: ServerInstance = None) -> bool:
+    from jvm_profiles import build_gc_log_flag, rewrite_run_script
+
+    instance = instance or current_instance()
+    run_script = instance.run_script
+    if not run_script.exists():
+        print(f"{RED}run_server.sh not found!{RESET}")
+        return False
+
+    flag = build_gc_log_flag(config.GC_LOG_FILE, config.GC_LOG_FILE_COUNT, config.GC_LOG_FILE_SIZE) if enabled else None
+    result = rewrite_run_script(run_script.read_text(), gc_log=flag)
+    if result is None:
+        print(f"{RED}Cannot find java exec line in run_server.sh{RESET}")
+        return False
+
+    run_script.write_text(result[0])
+    if enabled:
+        print(f"{GREEN}✅ GC logging enabled{instance.label()}: {config.GC_LOG_FILE} "
+              f"({config.GC_LOG_FILE_COUNT} x {config.GC_LOG_FILE_SIZE}), applies on the next start{RESET}")
+    else:
+        print(f"{YELLOW}GC logging disabled{instance.label()}{RESET}")
+    return True
+
+
+# ===== Текущий профиль и флаги JVM из run_server.sh (для info) =====
+def get_jvm_settings(instance: ServerInstance = None):
+    from jvm_profiles import JavaCommand, find_java_line, read_profile
+
+    run_script = (instance or current_instance()).run_script
+    try:
+        content = run_script.read_text()
+    except OSError:
+        return None, []
+    line = find_java_line(content)
+    if line is None:
+        return None, []
+    return read_profile(content), JavaCommand(line).flags()
+
+
 # ===== Функция для обработки команды set =====
 def handle_set_command(args: list):
+    from jvm_profiles import JVM_PROFILES
+
     gamemodes = "|".join(config.AVAILABLE_GAME_MODES)
     difficulties = "|".join(config.AVAILABLE_DIFFICULTIES)
+    profiles = "|".join(JVM_PROFILES)
 
-    if len(args) < 2:
+    if len(args) < 2 and not (args and "=" in args[0]):
         print(f"{YELLOW}Usage: set <option> <value>{RESET}")
         print("Options:")
         print(f"  max-players  {CYAN}<1-999>{RESET}          - Set the maximum count of players on the server")
@@ -424,13 +673,17 @@ def handle_set_command(args: list):
         print(f"  difficulty   {CYAN}<{difficulties}>{RESET} - Set server difficulty")
         print(f"  ram-min      {CYAN}<GB|MB>{RESET}          - Set minimum RAM (e.g., 1G, 1024M)")
         print(f"  ram-max      {CYAN}<GB|MB>{RESET}          - Set maximum RAM (e.g., 4G, 4096M)")
+        print(f"  jvm-profile  {CYAN}<{profiles}>{RESET} - Set JVM GC flags (sized to the heap)")
+        print(f"  gc-log       {CYAN}<on|off>{RESET}         - Write JVM GC log (for the 'gc' command)")
         print(f"  notify       {CYAN}<on|off>{RESET}         - Enable/disable Telegram notifications")
         print(f"  token        {CYAN}<your:token>{RESET}     - For work Telegram notifications")
         print(f"\nExamples:")
         print(f"{CYAN}  set gamemode creative{RESET}")
         print(f"{CYAN}  set ram-max 4G{RESET}")
+        print(f"{CYAN}  set jvm-profile g1-tuned{RESET}")
         print(f"{CYAN}  set max-players 4{RESET}")
         print(f"{CYAN}  set motd Hello, it's TetOS 2O26!{RESET}")
+        print(f"{CYAN}  set max-players=10 gamemode=creative motd=\"My server\"{RESET}")
         return 
 
     if is_server_running():
@@ -440,34 +693,18 @@ def handle_set_command(args: list):
     option = args[0].lower()
     value = ' '.join(args[1:])
 
-    # ===== Проверка валидности и обработка =====
-    if option == "max-players":
-        try:
-            val = int(value)
-            if 1 <= val <= 999:
-                update_server_property("max-players", str(val))
-                config.SERVER_MAX_PLAYERS = val
-            else:
-                print(f"{RED}❌ Value must be between 1 and 999{RESET}")
-        except ValueError:
-            print(f"{RED}❌ Invalid number: {value}{RESET}")
-    
-    elif option == "motd":
-        update_server_property("motd", value)
-
-    elif option == "gamemode":
-        if value.lower() in config.AVAILABLE_GAME_MODES:
-            update_server_property("gamemode", value.lower())
-            config.SERVER_GAME_MODE = value.lower()
-        else:
-            print(f"{RED}❌ Invalid gamemode. Choose: {gamemodes}{RESET}")
+    # ===== Несколько свойств сразу: set max-players=10 gamemode=creative =====
+    if "=" in args[0]:
+        changes = parse_property_assignments(args)
+        if changes:
+            update_server_properties(changes)
+        return
 
-    elif option == "difficulty":
-        if value.lower() in config.AVAILABLE_DIFFICULTIES:
-            update_server_property("difficulty", value.lower())
-            config.SERVER_GAME_MODE = value.lower()
-        else:
-            print(f"{RED}❌ Invalid difficulty. Choose: {difficulties}{RESET}")
+    # ===== Проверка валидности и обработка =====
+    if option in PROPERTY_OPTIONS:
+        normalized = validate_property_value(option, value)
+        if normalized is not None:
+            update_server_properties({option: normalized})
 
     elif option == "ram-min":
         parsed = parse_ram_value(value)
@@ -485,7 +722,7 @@ def handle_set_command(args: list):
                 print(f"{RED}❌ Cannot set min RAM greater than current max RAM ({current_max_value}{current_max_unit}){RESET}")
                 return
 
-        update_run_script_ram(config.RUN_SCRIPT, ram_min_mb=ram_value, ram_min_unit=ram_unit)
+        update_run_script_ram(current_instance().run_script, ram_min_mb=ram_value, ram_min_unit=ram_unit)
 
     elif option == "ram-max":
         parsed = parse_ram_value(value)
@@ -494,6 +731,14 @@ def handle_set_command(args: list):
             return
         ram_value, ram_unit = parsed
 
+        # Не больше, чем есть свободной памяти на хосте
+        requested_mb = ram_value * (1024 if ram_unit.upper() == "G" else 1)
+        capped_mb = check_heap_limit(requested_mb, current_instance())
+        if capped_mb is None:
+            return
+        if capped_mb != requested_mb:
+            ram_value, ram_unit = (capped_mb // 1024, "G") if capped_mb % 1024 == 0 else (capped_mb, "M")
+
         # Берём текущий min из run_server.sh
         current_min_value, current_min_unit = get_current_ram_value("min")
         if current_min_value is not None:
@@ -503,7 +748,23 @@ def handle_set_command(args: list):
                 print(f"{RED}❌ Cannot set max RAM smaller than current min RAM ({current_min_value}{current_min_unit}){RESET}")
                 return
 
-        update_run_script_ram(config.RUN_SCRIPT, ram_max_mb=ram_value, ram_max_unit=ram_unit)
+        update_run_script_ram(current_instance().run_script, ram_max_mb=ram_value, ram_max_unit=ram_unit)
+
+    elif option == "jvm-profile":
+        profile = value.lower().strip()
+        if profile not in JVM_PROFILES:
+            print(f"{RED}❌ Invalid profile. Use: set jvm-profile <{profiles}>{RESET}")
+            return
+        set_jvm_profile(profile)
+
+    elif option == "gc-log":
+        val = value.lower().strip()
+        if val in ["on", "enable", "enabled"]:
+            set_gc_logging(True)
+        elif val in ["off", "disable", "disabled"]:
+            set_gc_logging(False)
+        else:
+            print(f"{RED}❌ Invalid value. Use: set gc-log <on|off>{RESET}")
 
     elif option == "notify":
         val = value.lower().strip()
@@ -526,46 +787,94 @@ def handle_set_command(args: list):
         print(f"{GREEN}✅ Telegram token updated{RESET}")
 
 
-# ===== Функция обновления server.properties =====
-def update_server_property(option: str, value: str):
-    props_file = config.SERVER_DIR / "server.properties"
-    if not props_file.exists():
-        print(f"{RED}server.properties not found at {props_file}{RESET}")
-        return False
+# ===== Проверка значения свойства для set (None — значение неверное) =====
+def validate_property_value(option: str, value: str) -> Optional[str]:
+    if option == "max-players":
+        try:
+            val = int(value)
+        except ValueError:
+            print(f"{RED}❌ Invalid number: {value}{RESET}")
+            return None
+        if not 1 <= val <= 999:
+            print(f"{RED}❌ Value must be between 1 and 999{RESET}")
+            return None
+        return str(val)
 
-    updated = False
-    lines = []
-    with open(props_file, "r", encoding="utf-8") as f:
-        for line in f:
-            stripped = line.strip()
-            if stripped.startswith(option + "="):
-                lines.append(f"{option}={value}\n")
-                updated = True
-            else:
-                lines.append(line)
+    if option == "gamemode":
+        if value.lower() not in config.AVAILABLE_GAME_MODES:
+            print(f"{RED}❌ Invalid gamemode. Choose: {'|'.join(config.AVAILABLE_GAME_MODES)}{RESET}")
+            return None
+        return value.lower()
+
+    if option == "difficulty":
+        if value.lower() not in config.AVAILABLE_DIFFICULTIES:
+            print(f"{RED}❌ Invalid difficulty. Choose: {'|'.join(config.AVAILABLE_DIFFICULTIES)}{RESET}")
+            return None
+        return value.lower()
+
+    return value
 
-    if not updated:
-        # если ключ не найден, добавляем его в конец
-        lines.append(f"{option}={value}\n")
+
+# ===== Разбор "key=value key2=value2" (кавычки для значений с пробелами) =====
+def parse_property_assignments(args: list) -> Optional[dict]:
+    import shlex
 
     try:
-        with open(props_file, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-        print(f"{GREEN}Updated server property: {option}={value}{RESET}")
-        return True
+        tokens = shlex.split(" ".join(args))
+    except ValueError as e:
+        print(f"{RED}❌ Invalid syntax: {e}{RESET}")
+        return None
+
+    changes = {}
+    for token in tokens:
+        option, sep, value = token.partition("=")
+        option = option.lower()
+        if not sep or option not in PROPERTY_OPTIONS:
+            print(f"{RED}❌ Invalid assignment: {token}. Options: {', '.join(PROPERTY_OPTIONS)}{RESET}")
+            return None
+        normalized = validate_property_value(option, value)
+        if normalized is None:
+            return None
+        changes[option] = normalized
+    return changes
+
+
+# ===== Функция обновления server.properties (все ключи — одна атомарная запись) =====
+def update_server_properties(changes: dict, instance: ServerInstance = None) -> bool:
+    instance = instance or current_instance()
+    if not instance.properties.exists():
+        print(f"{RED}server.properties not found at {instance.properties.path}{RESET}")
+        return False
+
+    try:
+        instance.properties.update(changes)
     except Exception as e:
         print(f"{RED}Failed to write server.properties: {e}{RESET}")
         return False
 
+    for option, value in changes.items():
+        print(f"{GREEN}Updated server property: {option}={value}{RESET}")
+
+    if "max-players" in changes:
+        instance.max_players = int(changes["max-players"])
+    if "gamemode" in changes:
+        instance.game_mode = changes["gamemode"]
+    return True
+
 
 # ===== Команда для вывода IP сервера =====
 def print_ip_server():
-    if is_server_stopped():
+    instance = current_instance()
+    if is_server_stopped(instance):
         print(f"{YELLOW}Server is not running! Use 'start' to launch.{RESET}")
         return
 
-    print(f"🌐 IP (Hamachi): {config.SERVER_IP}:{config.SERVER_PORT}")
-    print(f"📡 IP (Local): {config.SERVER_LOCAL_IP}:{config.SERVER_PORT}")        
+    addresses = get_server_addresses(instance)
+    if not addresses:
+        print(f"{YELLOW}No network addresses found (only loopback){RESET}")
+    for kind, label, address in addresses:
+        icon = "🌐" if kind == KIND_VPN else "📡"
+        print(f"{icon} IP ({label}): {address}")
 
 
 # ===== Команда для получения и вывода TPS и MSPT =====
@@ -586,98 +895,962 @@ def print_tps_info(mode="all"):
         print(f"⚡ TPS: {tps_color}{tps:.2f}{RESET} | 🕓 MSPT: {mspt_color}{mspt:.2f} ms{RESET}")
 
 
+# ===== Команда для вывода статистики метрик за окно (stats [window]) =====
+def print_stats(args: list):
+    from metrics_sampler import format_stats_table
+
+    window = args[0] if args else config.STATS_WINDOWS[0]
+    seconds = parse_duration(window)
+    if seconds is None or seconds <= 0:
+        print(f"{RED}❌ Invalid window: {window}. Use e.g. {', '.join(config.STATS_WINDOWS)}{RESET}")
+        return
+
+    stats = current_instance().sampler.window_stats(seconds)
+    if stats["samples"] == 0:
+        print(f"{YELLOW}No samples in the last {window} (metrics are collected while the server is running){RESET}")
+        return
+
+    print(f"📈 Stats for the last {CYAN}{window}{RESET} ({stats['samples']} samples):")
+    for line in format_stats_table(stats):
+        print(f"  {line}")
+
+
+# ===== Команда gc [window]: паузы GC, аллокация и heap после GC из gc.log =====
+def print_gc_stats(args: list):
+    instance = current_instance()
+    window = args[0] if args else config.STATS_WINDOWS[1]
+    seconds = parse_duration(window)
+    if seconds is None or seconds <= 0:
+        print(f"{RED}❌ Invalid window: {window}. Use e.g. {', '.join(config.STATS_WINDOWS)}{RESET}")
+        return
+
+    if instance.gc_log_path() is None:
+        print(f"{YELLOW}GC logging is off. Enable it with 'set gc-log on' (applies on the next start){RESET}")
+        return
+
+    stats = instance.gc.window_stats(seconds)
+    if stats["pauses"] == 0 and stats["heap_after"] is None:
+        print(f"{YELLOW}No GC activity in the last {window} (the GC log is read while the server is running){RESET}")
+        return
+
+    print(f"🗑 GC{instance.label()} for the last {CYAN}{window}{RESET}:")
+    print(f" - Pauses: {YELLOW}{stats['pauses']}{RESET} (total {stats['total_ms']:.0f} ms, {stats['pause_share'] * 100:.2f}% of time)")
+    if stats["pauses"]:
+        max_color = RED if stats["max_ms"] >= config.GC_LONG_PAUSE_MS else GREEN
+        print(f" - Pause p50 / p99 / max: {YELLOW}{stats['p50_ms']:.1f} / {stats['p99_ms']:.1f} / "
+              f"{max_color}{stats['max_ms']:.1f}{RESET} ms")
+        long_color = RED if stats["long_pauses"] else GREEN
+        print(f" - Pauses over {config.GC_LONG_PAUSE_MS:.0f} ms: {long_color}{stats['long_pauses']}{RESET}")
+
+    if stats["alloc_mb_s"] is not None:
+        print(f" - Allocation rate: {YELLOW}{stats['alloc_mb_s']:.1f} MB/s{RESET}")
+
+    heap = stats["heap_after"]
+    if heap is not None:
+        trend = "" if heap["trend_mb_min"] is None else f", trend {heap['trend_mb_min']:+.1f} MB/min"
+        print(f" - Heap after GC: {YELLOW}min {heap['min']:.0f} / avg {heap['avg']:.0f} / last {heap['last']:.0f} MB{RESET}{trend}")
+
+
+# ===== Команда для вывода истории метрик с диска (history [range]) =====
+def print_history(args: list):
+    import time
+    from metrics_store import MetricsStore, summarize
+
+    window = args[0] if args else "24h"
+    seconds = parse_duration(window)
+    if seconds is None or seconds <= 0:
+        print(f"{RED}❌ Invalid range: {window}. Use e.g. 6h, 7d, 30d{RESET}")
+        return
+
+    end = time.time()
+    start = end - seconds
+    tier = MetricsStore.tier_for(seconds)
+    records = current_instance().metrics_store.query(start, end, tier)
+    if not records:
+        print(f"{YELLOW}No history for the last {window}{RESET}")
+        return
+
+    time_format = "%m-%d %H:%M" if seconds > 86400 else "%H:%M"
+    print(f"🗂 History for the last {CYAN}{window}{RESET} ({len(records)} records, tier {tier}):")
+    print(f"  {'time':<12}{'MSPT avg':>10}{'MSPT max':>10}{'RAM MB':>9}{'players':>9}{'world':>12}")
+    for row in summarize(records, start, end):
+        mspt_color = colorize_mspt(row["mspt_max"])
+        print(
+            f"  {time.strftime(time_format, time.localtime(row['start'])):<12}"
+            f"{row['mspt_avg']:>10.1f}{mspt_color}{row['mspt_max']:>10.1f}{RESET}"
+            f"{row['rss_max'] / (1024**2):>9.0f}{row['players_max']:>9}"
+            f"{format_size(row['world_bytes'] or 0):>12}"
+        )
+
+
+# ===== Метрики для Prometheus (только закешированные значения) =====
+# Метрики сервера отдаются по каждому экземпляру с label instance="<name>".
+def collect_exporter_metrics() -> list:
+    def per_instance(value_of):
+        return [({"instance": instance.name}, value_of(instance)) for instance in config.SERVER_INSTANCES.values()]
+
+    def latest(instance, name):
+        if not instance.is_running() or instance.sampler.last_sample_time() is None:
+            return None
+        return instance.sampler.latest(name)
+
+    def rss_bytes(instance):
+        rss_mb = latest(instance, "rss_mb")
+        return rss_mb * 1024 * 1024 if rss_mb is not None else None
+
+    def world_sizes():
+        samples = []
+        for instance in config.SERVER_INSTANCES.values():
+            totals = instance.world_size.snapshot() or {}
+            samples += [({"instance": instance.name, "part": part}, totals.get(part)) for part in WORLD_PARTS + ["total"]]
+        return samples
+
+    queue = get_broadcast_stats()
+
+    metrics = [
+        ("tetos_info", "gauge", "tetOS version", [({"version": VERSION}, 1)]),
+        ("tetos_server_running", "gauge", "1 if the Minecraft server process is alive",
+            per_instance(lambda instance: int(instance.is_running()))),
+        ("tetos_server_ready", "gauge", "1 after the server printed Done",
+            per_instance(lambda instance: int(instance.is_running() and instance.is_ready))),
+        ("tetos_tps", "gauge", "Ticks per second (last sample)", per_instance(lambda instance: latest(instance, "tps"))),
+        ("tetos_mspt_milliseconds", "gauge", "Average milliseconds per tick (last sample)",
+            per_instance(lambda instance: latest(instance, "mspt"))),
+        ("tetos_process_resident_memory_bytes", "gauge", "Server process RSS", per_instance(rss_bytes)),
+        ("tetos_process_cpu_percent", "gauge", "Server process CPU usage",
+            per_instance(lambda instance: latest(instance, "cpu_percent"))),
+        ("tetos_process_threads", "gauge", "Server process thread count",
+            per_instance(lambda instance: latest(instance, "threads"))),
+        ("tetos_players_online", "gauge", "Online players",
+            per_instance(lambda instance: instance.online_players if instance.is_running() else 0)),
+        ("tetos_players_max", "gauge", "max-players from server.properties",
+            per_instance(lambda instance: instance.max_players)),
+        ("tetos_world_size_bytes", "gauge", "World size on disk", world_sizes()),
+        ("tetos_metrics_last_sample_timestamp_seconds", "gauge", "Unix time of the last metrics sample",
+            per_instance(lambda instance: instance.sampler.last_sample_time())),
+    ]
+
+    if queue:
+        metrics += [
+            ("tetos_telegram_queue_depth", "gauge", "Messages waiting in the Telegram queue", [({}, queue["queue_depth"])]),
+            ("tetos_telegram_messages_total", "counter", "Telegram messages by result",
+                [({"result": result}, queue[result]) for result in ("sent", "failed", "retried", "dropped")]),
+            ("tetos_telegram_latency_milliseconds", "gauge", "Telegram delivery latency",
+                [({"stat": "avg"}, queue["latency_avg_ms"]), ({"stat": "max"}, queue["latency_max_ms"])]),
+        ]
+    return metrics
+
+
+# ===== Запуск экспортёра метрик, если он включён в .env =====
+def start_metrics_exporter() -> bool:
+    # .env читает и бот, но экспортер от бота не зависит — загружаем сами
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(config.ENV_PATH)
+    except ImportError:
+        pass
+
+    enabled = os.getenv("METRICS_EXPORTER", str(config.METRICS_EXPORTER_ENABLED)).lower().strip()
+    if enabled not in ("true", "1", "on", "yes"):
+        return False
+
+    try:
+        port = int(os.getenv("METRICS_EXPORTER_PORT", config.METRICS_EXPORTER_PORT))
+    except ValueError:
+        port = config.METRICS_EXPORTER_PORT
+    host = os.getenv("METRICS_EXPORTER_HOST", config.METRICS_EXPORTER_HOST)
+
+    from metrics_exporter import MetricsExporter
+
+    config.METRICS_EXPORTER = MetricsExporter(collect_exporter_metrics, host=host, port=port)
+    for instance in config.SERVER_INSTANCES.values():
+        instance.world_size.start()
+        instance.sampler.start()
+    return config.METRICS_EXPORTER.start()
+
+
+# ===== Команда logs: поиск по архиву консоли =====
+def handle_logs_command(args: list):
+    import re
+    import time
+    import shlex
+
+    if len(args) < 2 or args[0] != "grep":
+        print(f"{YELLOW}Usage: logs grep <pattern> [--since 2h] [--until 30m] [--limit 200] [-i]{RESET}")
+        print(f"{CYAN}  logs grep \"joined the game\" --since 1d{RESET}")
+        return
+
+    try:
+        tokens = shlex.split(" ".join(args[1:]))
+    except ValueError as e:
+        print(f"{RED}❌ Invalid syntax: {e}{RESET}")
+        return
+
+    pattern_parts = []
+    since = 0.0
+    until = None
+    limit = 200
+    ignore_case = False
+    now = time.time()
+    tokens = iter(tokens)
+    for token in tokens:
+        if token in ("--since", "--until"):
+            value = next(tokens, "")
+            seconds = parse_duration(value)
+            if seconds is None:
+                print(f"{RED}❌ Invalid duration: {value}{RESET}")
+                return
+            if token == "--since":
+                since = now - seconds
+            else:
+                until = now - seconds
+        elif token == "--limit":
+            try:
+                limit = max(1, int(next(tokens, "")))
+            except ValueError:
+                print(f"{RED}❌ Invalid limit{RESET}")
+                return
+        elif token == "-i":
+            ignore_case = True
+        else:
+            pattern_parts.append(token)
+
+    pattern = " ".join(pattern_parts)
+    try:
+        matches = current_instance().log_archive.grep(pattern, since=since, until=until, limit=limit, ignore_case=ignore_case)
+    except re.error as e:
+        print(f"{RED}❌ Invalid pattern: {e}{RESET}")
+        return
+
+    for timestamp, line in matches:
+        print(f"{CYAN}{time.strftime('%m-%d %H:%M:%S', time.localtime(timestamp))}{RESET} {line}")
+    print(f"{YELLOW}{len(matches)} match(es){' (limit reached)' if len(matches) >= limit else ''}{RESET}")
+
+
+# ===== Команда log: фильтры вывода консоли сервера =====
+def handle_log_command(args: list):
+    import re
+
+    renderer = current_instance().renderer
+    option = args[0].lower() if args else ""
+    value = " ".join(args[1:])
+
+    if option == "level" and value:
+        if renderer.set_level(value):
+            print(f"{GREEN}Console level: {value.lower()} and above{RESET}")
+        else:
+            print(f"{RED}❌ Invalid level. Choose: {'|'.join(LOG_LEVELS)}{RESET}")
+        return
+
+    if option in ("mute", "only") and value:
+        try:
+            getattr(renderer, option)(value)
+        except re.error as e:
+            print(f"{RED}❌ Invalid pattern: {e}{RESET}")
+            return
+        print(f"{GREEN}Console {option}: {value}{RESET}")
+        return
+
+    if option == "unmute" and value:
+        if renderer.unmute(value):
+            print(f"{GREEN}Console unmuted: {value}{RESET}")
+        else:
+            print(f"{YELLOW}No mute filter: {value}{RESET}")
+        return
+
+    if option == "reset":
+        renderer.reset()
+        print(f"{GREEN}Console filters cleared{RESET}")
+        return
+
+    print(f"{YELLOW}Usage: log <level|mute|unmute|only|reset> [value]{RESET}")
+    print(f"{CYAN}  log level warn{RESET}")
+    print(f"{CYAN}  log mute Can't keep up{RESET}")
+    print(f"{CYAN}  log only joined|left{RESET}")
+    print("Current filters:")
+    for line in renderer.describe():
+        print(f"  {line}")
+    print(f"  hidden lines: {renderer.hidden}")
+
+
+# ===== Команда world stats: region-файлы по измерениям (только заголовки, без распаковки) =====
+def print_world_stats(instance: ServerInstance = None):
+    import time
+    from region_files import SECTOR_BYTES, HEADER_SECTORS, REGION_KINDS, world_region_stats
+
+    instance = instance or current_instance()
+    started = time.monotonic()
+    stats = world_region_stats(instance.world_dirs(), workers=config.WORLD_STATS_WORKERS, top=config.WORLD_STATS_TOP)
+    if stats["files"] == 0:
+        print(f"{YELLOW}No region files found in {instance.server_dir}{RESET}")
+        return
+
+    total_bytes = sum(group["file_bytes"] for group in stats["groups"].values())
+    print(f"🗺 World stats{instance.label()}: {stats['files']} region files, {format_size(total_bytes)} "
+          f"({time.monotonic() - started:.1f}s)")
+    print(f"  {'dimension':<12}{'kind':<10}{'files':>6}{'chunks':>9}{'chunks/file':>12}"
+          f"{'size':>12}{'used':>7}{'free':>12}{'last write':>18}")
+
+    def sort_key(item):
+        (dimension, kind), _ = item
+        order = {"overworld": 0, "nether": 1, "end": 2}
+        return order.get(dimension, 3), dimension, REGION_KINDS.index(kind)
+
+    for (dimension, kind), group in sorted(stats["groups"].items(), key=sort_key):
+        data_sectors = group["file_bytes"] / SECTOR_BYTES - group["files"] * HEADER_SECTORS
+        used = group["used_sectors"] / data_sectors if data_sectors > 0 else 0.0
+        used_color = GREEN if used >= 0.9 else YELLOW if used >= 0.7 else RED
+        newest = time.strftime("%Y-%m-%d %H:%M", time.localtime(group["newest"])) if group["newest"] else "-"
+        print(
+            f"  {dimension:<12}{kind:<10}{group['files']:>6}{group['chunks']:>9}"
+            f"{group['chunks'] / group['files']:>12.0f}{format_size(group['file_bytes']):>12}"
+            f"{used_color}{used * 100:>6.0f}%{RESET}{format_size(group['free_sectors'] * SECTOR_BYTES):>12}{newest:>18}"
+        )
+        # Упаковка внутри занятых секторов: сколько байт чанков против выделенного места
+        if group["used_sectors"]:
+            padding = group["used_sectors"] * SECTOR_BYTES - group["data_bytes"]
+            oldest = time.strftime("%Y-%m-%d", time.localtime(group["oldest"])) if group["oldest"] else "-"
+            external = f", {group['external']} oversized (.mcc)" if group["external"] else ""
+            print(f"  {'':<22}sector padding {format_size(padding)}, oldest write {oldest}{external}")
+
+    if stats["largest_chunks"]:
+        print("Largest chunks:")
+        for length, dimension, cx, cz, path in stats["largest_chunks"]:
+            print(f"  {dimension} chunk ({cx}, {cz}) in {os.path.basename(path)}: {YELLOW}{length / 1024:.1f} KB{RESET} compressed")
+
+    if stats["most_wasted"]:
+        print("Most free space inside files:")
+        for free_bytes, dimension, kind, path, file_bytes in stats["most_wasted"]:
+            share = free_bytes / file_bytes * 100 if file_bytes else 0.0
+            print(f"  {dimension} {kind}/{os.path.basename(path)}: {RED}{format_size(free_bytes)}{RESET} free ({share:.0f}% of file)")
+
+    if stats["errors"]:
+        print(f"{RED}⚠️ {len(stats['errors'])} damaged region file(s):{RESET}")
+        for path, error in stats["errors"][:config.WORLD_STATS_TOP]:
+            print(f"  {os.path.relpath(path, instance.server_dir)}: {error}")
+
+
+# ===== Команда world trim: удалить чанки, где игроки почти не были (сервер остановлен) =====
+# По умолчанию — только отчёт (dry run); --apply перезаписывает region-файлы.
+def trim_world_command(args: list):
+    import time
+    from world_trim import SessionLocks, WorldLocked, read_world_spawn, trim_world
+
+    instance = current_instance()
+    apply = "--apply" in args
+    min_inhabited = config.WORLD_TRIM_MIN_INHABITED
+    radius = config.WORLD_TRIM_SPAWN_RADIUS
+    try:
+        if "--min" in args:
+            min_inhabited = args[args.index("--min") + 1]
+        if "--radius" in args:
+            radius = int(args[args.index("--radius") + 1])
+    except (IndexError, ValueError):
+        print(f"{YELLOW}Usage: world trim [--min 1m] [--radius 1024] [--apply]{RESET}")
+        return
+    seconds = parse_duration(min_inhabited)
+    if seconds is None or seconds < 0 or radius < 0:
+        print(f"{YELLOW}Usage: world trim [--min 1m] [--radius 1024] [--apply]{RESET}")
+        return
+
+    if not is_server_stopped(instance):
+        print(f"{YELLOW}Stop server{instance.label()} before trimming the world{RESET}")
+        return
+    if not instance.backups.lock.acquire(blocking=False):
+        print(f"{YELLOW}A backup or restore of server{instance.label()} is in progress, try again later{RESET}")
+        return
+
+    try:
+        world_dirs = [path for path in instance.world_dirs() if path.is_dir()]
+        if not world_dirs:
+            print(f"{RED}❌ No world found in {instance.server_dir}{RESET}")
+            return
+
+        spawn_x, spawn_z = read_world_spawn(world_dirs[0])
+        protected = {dimension: list(areas) for dimension, areas in config.WORLD_TRIM_PROTECTED.items()}
+        protected.setdefault("overworld", []).append((spawn_x, spawn_z, radius))
+        for dimension in ("nether", "end"):
+            protected.setdefault(dimension, []).append((0, 0, radius))
+
+        with SessionLocks() as locks:
+            try:
+                locks.acquire(world_dirs)
+            except WorldLocked as e:
+                print(f"{RED}❌ World is in use, not trimming: {e}{RESET}")
+                return
+
+            mode = "Trimming" if apply else "Dry run: trimming"
+            print(f"✂️ {mode} chunks with less than {min_inhabited} of player time, "
+                  f"keeping {radius} blocks around spawn ({spawn_x}, {spawn_z})...")
+            started = time.monotonic()
+            result = trim_world(world_dirs, int(seconds * 20), protected, apply, workers=config.WORLD_STATS_WORKERS)
+    finally:
+        instance.backups.lock.release()
+
+    if result["files"] == 0:
+        print(f"{YELLOW}No region files found{RESET}")
+        return
+
+    total_before = total_after = 0
+    order = {"overworld": 0, "nether": 1, "end": 2}
+    for dimension, summary in sorted(result["dimensions"].items(), key=lambda item: (order.get(item[0], 3), item[0])):
+        reclaimed = summary["bytes_before"] - summary["bytes_after"]
+        total_before += summary["bytes_before"]
+        total_after += summary["bytes_after"]
+        unreadable = f", {summary['unreadable']} unreadable kept" if summary["unreadable"] else ""
+        print(f"  {dimension:<12}{summary['dropped']:>8} / {summary['chunks']} chunks, "
+              f"{format_size(summary['bytes_before'])} -> {format_size(summary['bytes_after'])} "
+              f"({GREEN}-{format_size(reclaimed)}{RESET}){unreadable}")
+
+    reclaimed = total_before - total_after
+    if apply:
+        instance.world_size.refresh_now(full=True)
+        print(f"{GREEN}✅ World trimmed in {time.monotonic() - started:.1f}s, reclaimed {format_size(reclaimed)}{RESET}")
+    else:
+        print(f"Would reclaim {GREEN}{format_size(reclaimed)}{RESET} ({time.monotonic() - started:.1f}s). "
+              f"Back up first ('backup'), then run 'world trim --apply'")
+
+    for path, error in result["errors"][:config.WORLD_STATS_TOP]:
+        print(f"{RED}⚠️ {os.path.relpath(path, instance.server_dir)}: {error}{RESET}")
+
+
+# ===== Команда world <stats|trim> =====
+def handle_world_command(args: list):
+    if args and args[0] == "stats":
+        print_world_stats()
+    elif args and args[0] == "trim":
+        trim_world_command(args[1:])
+    else:
+        print(f"{YELLOW}Usage: world <stats|trim>{RESET}")
+
+
+# ===== Команда pregen: прегенерация чанков через forceload с подстройкой под MSPT =====
+def print_pregen_status(instance: ServerInstance = None):
+    from pregen import format_eta
+
+    instance = instance or current_instance()
+    progress = instance.pregen.progress()
+    if progress is None:
+        print(f"{YELLOW}No pre-generation job{instance.label()}. Start one with 'pregen <radius> [dimension]'{RESET}")
+        return
+
+    color = GREEN if progress["status"] in ("running", "done") else YELLOW
+    state = progress["status"]
+    if state == "running" and not instance.is_ready:
+        state = "running (waiting for the server)"
+    elif state == "running" and progress["hours"]:
+        start, end = progress["hours"]
+        state += f" ({start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d} only)"
+
+    print(f"⛏ Pre-generation{instance.label()}: {color}{state}{RESET}")
+    print(f" - Area: {progress['dimension']}, {progress['radius'] * 16} blocks around chunk "
+          f"{progress['center'][0]}, {progress['center'][1]}")
+    print(f" - Progress: {YELLOW}{progress['chunks_done']}/{progress['total_chunks']}{RESET} chunks ({progress['percent']:.1f}%)")
+    if progress["rate"]:
+        eta = format_eta(progress["eta_seconds"]) if progress["status"] != "done" else "-"
+        print(f" - Speed: {progress['rate']:.1f} chunks/s, ETA {YELLOW}{eta}{RESET} of active time")
+    print(f" - Batch: {progress['batch_chunks']} chunks, pace {progress['pace']:.1f}s "
+          f"(MSPT budget {config.PREGEN_MSPT_BUDGET:.0f} ms)")
+
+
+def start_pregen(args: list):
+    from pregen import DIMENSIONS, dimension_id, parse_hours
+    from world_trim import read_world_spawn
+
+    instance = current_instance()
+    usage = f"{YELLOW}Usage: pregen <radius> [{'|'.join(DIMENSIONS)}] [--hours 01-07]{RESET}"
+    hours_text = config.PREGEN_ACTIVE_HOURS
+    if "--hours" in args:
+        position = args.index("--hours")
+        if position + 1 >= len(args):
+            print(usage)
+            return
+        hours_text = args[position + 1]
+        args = args[:position] + args[position + 2:]
+
+    hours = None
+    if hours_text:
+        hours = parse_hours(hours_text)
+        if hours is None:
+            print(usage)
+            return
+
+    try:
+        radius = int(args[0])
+    except (IndexError, ValueError):
+        print(usage)
+        return
+    dimension = args[1] if len(args) > 1 else "overworld"
+    if radius <= 0 or dimension_id(dimension) is None:
+        print(usage)
+        return
+
+    job = instance.pregen.job
+    if job is not None and job["status"] in ("running", "paused"):
+        print(f"{YELLOW}A pre-generation job{instance.label()} is already {job['status']} "
+              f"('pregen status'); cancel it first with 'pregen cancel'{RESET}")
+        return
+
+    center_x = center_z = 0
+    if dimension == "overworld":
+        world_dirs = instance.world_dirs()
+        spawn_x, spawn_z = read_world_spawn(world_dirs[0])
+        center_x, center_z = spawn_x >> 4, spawn_z >> 4
+
+    radius_chunks = (radius + 15) // 16
+    job = instance.pregen.create(dimension, center_x, center_z, radius_chunks, hours)
+    print(f"⛏ Pre-generating {job['total_chunks']} chunks{instance.label()} in {dimension} "
+          f"within {radius} blocks of ({center_x * 16}, {center_z * 16})")
+    if not instance.is_ready:
+        print(f"{YELLOW}Server{instance.label()} is not running, pre-generation starts when it is ready{RESET}")
+
+
+def handle_pregen_command(args: list):
+    instance = current_instance()
+    if not args or args[0] == "status":
+        print_pregen_status(instance)
+    elif args[0] == "pause":
+        if instance.pregen.set_status("paused"):
+            print(f"⏸ Pre-generation{instance.label()} paused (the current batch finishes first)")
+        else:
+            print(f"{YELLOW}No active pre-generation job{instance.label()}{RESET}")
+    elif args[0] == "resume":
+        if instance.pregen.set_status("running"):
+            print(f"▶️ Pre-generation{instance.label()} resumed")
+        else:
+            print(f"{YELLOW}No pre-generation job to resume{instance.label()}{RESET}")
+    elif args[0] == "cancel":
+        if not instance.pregen.cancel():
+            print(f"{YELLOW}No active pre-generation job{instance.label()}{RESET}")
+    else:
+        start_pregen(args)
+
+
+# ===== Бэкап мира (в фоне): save-off -> save-all flush -> копия изменённого -> save-on -> сжатие =====
+# Сервер не пишет мир только пока изменённые файлы копируются в staging;
+# нарезка, дедупликация и сжатие в пуле потоков идут уже с включёнными сохранениями.
+def run_backup(instance: ServerInstance = None) -> bool:
+    import time
+
+    instance = instance or current_instance()
+    store = instance.backups
+    if not store.lock.acquire(blocking=False):
+        print(f"{YELLOW}A backup or restore of server{instance.label()} is already in progress{RESET}")
+        return False
+
+    try:
+        started = time.monotonic()
+        paused = False
+        if instance.is_running():
+            if not instance.is_ready or instance.is_stopping():
+                print(f"{YELLOW}Server{instance.label()} is {instance.status()}, try the backup when it is running or stopped{RESET}")
+                return False
+            paused = True
+            if not instance.pause_saving():
+                instance.resume_saving()
+                print(f"{RED}❌ Backup{instance.label()} aborted: server did not confirm save-off / save-all flush{RESET}")
+                return False
+
+        try:
+            roots = [path.name for path in instance.world_dirs() if path.is_dir()]
+            if not roots:
+                print(f"{RED}❌ No world to back up in {instance.server_dir}{RESET}")
+                return False
+            pending = store.stage(instance.server_dir, roots)
+        except OSError as e:
+            store.discard()
+            print(f"{RED}❌ Backup{instance.label()} failed while copying the world: {e}{RESET}")
+            return False
+        finally:
+            if paused and not instance.resume_saving():
+                print(f"{RED}⚠️ Server{instance.label()} did not confirm save-on, run 'save-on' in the console{RESET}")
+
+        copied = time.monotonic() - started
+        if paused:
+            print(f"💾 World{instance.label()} copied in {copied:.1f}s, saving is back on "
+                  f"({len(pending.staged)} changed files, {format_size(pending.staged_bytes)})")
+
+        try:
+            snapshot = store.commit(pending)
+        except Exception as e:
+            store.discard()
+            print(f"{RED}❌ Backup{instance.label()} failed while packing: {e}{RESET}")
+            return False
+
+        removed, objects, freed = store.prune(config.BACKUP_KEEP)
+        print(f"{GREEN}✅ Backup {snapshot['id']}{instance.label()} done in {time.monotonic() - started:.1f}s: "
+              f"{snapshot['changed_files']}/{len(snapshot['files'])} files changed, "
+              f"{format_size(snapshot['new_bytes'])} new data stored as {format_size(snapshot['stored_bytes'])}{RESET}")
+        if removed:
+            print(f"🧹 Removed {removed} old backup(s), {objects} unused chunks ({format_size(freed)})")
+        return True
+    finally:
+        store.lock.release()
+
+
+def start_backup(instance: ServerInstance = None):
+    import threading
+
+    instance = instance or current_instance()
+    if instance.backups.lock.locked():
+        print(f"{YELLOW}A backup or restore of server{instance.label()} is already in progress{RESET}")
+        return
+    print(f"💾 Backing up world{instance.label()}...")
+    threading.Thread(target=run_backup, args=(instance,), name=f"tetos-backup-{instance.name}", daemon=True).start()
+
+
+def print_backups(instance: ServerInstance = None):
+    import time
+
+    instance = instance or current_instance()
+    store = instance.backups
+    ids = store.snapshot_ids()
+    if not ids:
+        print(f"{YELLOW}No backups yet{instance.label()}. Create one with 'backup'{RESET}")
+        return
+
+    print(f"💾 Backups{instance.label()} ({len(ids)}, store {format_size(store.store_size())}):")
+    print(f"  {'id':<17}{'created':<18}{'files':>8}{'world':>12}{'added':>12}")
+    for snapshot_id in ids:
+        snapshot = store.load(snapshot_id)
+        if snapshot is None:
+            print(f"  {snapshot_id:<17}{RED}unreadable{RESET}")
+            continue
+        print(
+            f"  {snapshot_id:<17}{time.strftime('%Y-%m-%d %H:%M', time.localtime(snapshot['created'])):<18}"
+            f"{len(snapshot['files']):>8}{format_size(snapshot['total_bytes']):>12}{format_size(snapshot['stored_bytes']):>12}"
+        )
+
+
+# ===== Восстановление мира из бэкапа (только при остановленном сервере) =====
+def restore_backup(args: list):
+    instance = current_instance()
+    if not args:
+        print(f"{YELLOW}Usage: restore <id> (see 'backup list'){RESET}")
+        return
+    if not is_server_stopped(instance):
+        print(f"{YELLOW}Stop server{instance.label()} before restoring a backup{RESET}")
+        return
+
+    store = instance.backups
+    snapshot_id = args[0]
+    if snapshot_id == "latest":
+        ids = store.snapshot_ids()
+        snapshot_id = ids[-1] if ids else snapshot_id
+    if snapshot_id not in store.snapshot_ids():
+        print(f"{RED}❌ Backup {snapshot_id} not found (see 'backup list'){RESET}")
+        return
+    if not store.lock.acquire(blocking=False):
+        print(f"{YELLOW}A backup or restore of server{instance.label()} is already in progress{RESET}")
+        return
+
+    try:
+        print(f"♻️ Restoring backup {snapshot_id}{instance.label()}...")
+        result = store.restore(snapshot_id, instance.server_dir)
+    except Exception as e:
+        print(f"{RED}❌ Restore failed, the current world was not touched: {e}{RESET}")
+        return
+    finally:
+        store.lock.release()
+
+    instance.world_size.refresh_now(full=True)
+    print(f"{GREEN}✅ Restored {result['files']} files ({format_size(result['bytes'])}) into {', '.join(result['roots'])}{RESET}")
+    if result["replaced"]:
+        print(f"The previous world was kept as {', '.join(result['replaced'])}")
+
+
+# ===== Команда backup [list|prune] =====
+def handle_backup_command(args: list):
+    if not args or args[0] == "now":
+        start_backup()
+    elif args[0] == "list":
+        print_backups()
+    elif args[0] == "prune":
+        instance = current_instance()
+        if not instance.backups.lock.acquire(blocking=False):
+            print(f"{YELLOW}A backup or restore of server{instance.label()} is already in progress{RESET}")
+            return
+        try:
+            removed, objects, freed = instance.backups.prune(config.BACKUP_KEEP)
+        finally:
+            instance.backups.lock.release()
+        print(f"🧹 Removed {removed} old backup(s), {objects} unused chunks ({format_size(freed)})")
+    else:
+        print(f"{YELLOW}Usage: backup [now|list|prune]{RESET}")
+
+
 # ===== Команда для help-сообщения (помощи) =====
 def print_help_server():
     print(f"====== TetOS command list ======")
     print(f"{YELLOW}info{RESET} - Show server status (RAM, players, version, etc.)")
-    print(f"{YELLOW}start{RESET} - Start the server (optional: --hard for hard start)")
-    print(f"{YELLOW}stop{RESET} - Stop the server")
+    print(f"{YELLOW}start [all|name]{RESET} - Start the server (optional: --hard for hard start)")
+    print(f"{YELLOW}stop [all|name]{RESET} - Stop the server")
     print(f"{YELLOW}help{RESET} - Show help menu")
-    print(f"{YELLOW}restart{RESET} - Restart the server")
+    print(f"{YELLOW}restart [all|name]{RESET} - Restart the server")
+    print(f"{YELLOW}status{RESET} - Show the state of every server (running, stopping (12s), ...)")
+    print(f"{YELLOW}use [name]{RESET} - Switch the server other commands apply to (no name: list servers)")
     print(f"{YELLOW}clear/cls{RESET} - Clear the terminal")
     print(f"{YELLOW}tps{RESET} - Show server TPS")
     print(f"{YELLOW}mspt{RESET} - Show MSPT servers")
-    print(f"{YELLOW}set{RESET} - Set server properties (max-ram, gamemode, telegram notify, etc.)")
+    print(f"{YELLOW}stats [window]{RESET} - Show min/avg/p95/max metrics (1m, 15m, 1h)")
+    print(f"{YELLOW}history [range]{RESET} - Show stored MSPT/RAM/players/world history (e.g. 24h, 7d)")
+    print(f"{YELLOW}gc [window]{RESET} - Show GC pauses p50/p99/max, allocation rate, heap trend (needs 'set gc-log on')")
+    print(f"{YELLOW}log <level|mute|only|reset>{RESET} - Filter server console output (events and archive still get all lines)")
+    print(f"{YELLOW}logs grep <pattern>{RESET} - Search archived console output (--since 2h, --limit N, -i)")
+    print(f"{YELLOW}world stats{RESET} - Region files per dimension: chunks, sector use, free space, largest chunks, last writes")
+    print(f"{YELLOW}world trim [--min 1m] [--radius N] [--apply]{RESET} - Drop rarely visited chunks (dry run unless --apply, server must be stopped)")
+    print(f"{YELLOW}pregen <radius> [dimension] [--hours 01-07]{RESET} - Pre-generate chunks via forceload, throttled by MSPT (pregen status|pause|resume|cancel)")
+    print(f"{YELLOW}backup [now|list|prune]{RESET} - Incremental world backup (save-off, flush, copy, save-on), list or prune backups")
+    print(f"{YELLOW}restore <id|latest>{RESET} - Restore the world from a backup (server must be stopped)")
+    print(f"{YELLOW}set{RESET} - Set server properties (max-ram, jvm-profile, gc-log, gamemode, telegram notify, etc.)")
     print(f"{YELLOW}exit{RESET} - Exit the utility")
 
     if is_server_running():
         print("====== Minecraft server commands ======")
-        config.SERVER_PROCESS.stdin.write("help\n")
-        config.SERVER_PROCESS.stdin.flush()
+        current_instance().console.send("help")
 
 
 # ===== Выводим основную информацию про сервер в терминал =====
 def print_server_info():
-    print(f"📋 Server Info:")
+    instance = current_instance()
+    title = f" {instance.name}" if len(config.SERVER_INSTANCES) > 1 else ""
+    print(f"📋 Server Info{title}:")
 
-    config.SERVER_MAX_PLAYERS = get_max_players()
-    config.SERVER_MAX_RAM_MB = get_max_ram_mb()
+    instance.max_players = get_max_players(instance)
+    instance.max_ram_mb = get_max_ram_mb(instance)
 
-    if is_server_stopped():
+    if is_server_stopped(instance):
         print(f" - Status: {RED}Not running{RESET}")
         print(f" - Minecraft version: {YELLOW}Unknown{RESET}")
         print(f" - Game mode: {YELLOW}Unknown{RESET}")
-        print(f" - Online players: {YELLOW}0 / {config.SERVER_MAX_PLAYERS}{RESET}")
-        print(f" - Used RAM: {YELLOW}0 MB / {config.SERVER_MAX_RAM_MB} MB{RESET}")
-        print(f" - World size: {YELLOW}Unknown{RESET}")
+        print(f" - Online players: {YELLOW}0 / {instance.max_players}{RESET}")
+        print(f" - Used RAM: {YELLOW}0 MB / {instance.max_ram_mb} MB{RESET}")
+        print(f" - World size: {YELLOW}{get_world_size(instance)}{RESET}")
         print(f" - Telegram bot: {CYAN}{get_telegram_bot_status()} {RESET}")
+        print(f" - Telegram queue: {CYAN}{get_broadcast_queue_status()}{RESET}")
     else:
-        status = f"{GREEN}Running (ready){RESET}" if config.SERVER_IS_READY else f"{YELLOW}Running (starting...){RESET}"
-        bot_info = config.TELEGRAM_BOT.get_me()
+        if instance.is_stopping():
+            status = f"{YELLOW}{instance.status().capitalize()}{RESET}"
+        elif instance.is_ready:
+            status = f"{GREEN}Running (ready){RESET}"
+        else:
+            status = f"{YELLOW}Running (starting...){RESET}"
         print(f" - Status: {status}")
-        print(f" - Minecraft version: {YELLOW}{config.SERVER_MC_VERSION}{RESET}")
-        print(f" - Game mode: {YELLOW}{config.SERVER_GAME_MODE}{RESET}")
-        print(f" - Online players: {GREEN}{config.SERVER_ONLINE_PLAYERS} / {config.SERVER_MAX_PLAYERS}{RESET}")
-        print(f" - Used RAM: {YELLOW}{get_used_ram()} / {config.SERVER_MAX_RAM_MB} MB{RESET}")
-        print(f" - World size: {YELLOW}{get_world_size()}{RESET}")
+        print(f" - Minecraft version: {YELLOW}{instance.mc_version}{RESET}")
+        print(f" - Game mode: {YELLOW}{instance.game_mode}{RESET}")
+        print(f" - Online players: {GREEN}{instance.online_players} / {instance.max_players}{RESET}")
+        print(f" - Used RAM: {YELLOW}{get_used_ram(instance)} / {instance.max_ram_mb} MB{RESET}")
+        print(f" - World size: {YELLOW}{get_world_size(instance)}{RESET}")
         print(f" - Telegram bot: {CYAN}{get_telegram_bot_status()} {RESET}")
+        print(f" - Telegram queue: {CYAN}{get_broadcast_queue_status()}{RESET}")
+
+    profile, flags = get_jvm_settings(instance)
+    if profile is not None:
+        print(f" - JVM profile: {YELLOW}{profile}{RESET}")
+        print(f" - JVM flags: {CYAN}{' '.join(flags)}{RESET}")
+
+    if len(config.SERVER_INSTANCES) > 1:
+        print_instances_summary()
+
+
+# ===== Сводка по всем серверам (только закешированные значения) =====
+def print_instances_summary():
+    total_players = 0
+    total_rss_mb = 0.0
+    running = 0
+
+    print(f"🗄 Servers:")
+    print(f"   {'name':<12}{'status':<16}{'players':>9}{'RAM MB':>9}{'MSPT':>8}  version")
+    for instance in config.SERVER_INSTANCES.values():
+        marker = "*" if instance is current_instance() else " "
+        if instance.is_running():
+            running += 1
+            total_players += instance.online_players
+            if instance.is_stopping():
+                status_color, status = YELLOW, instance.status()
+            else:
+                status_color, status = (GREEN, "ready") if instance.is_ready else (YELLOW, "starting")
+            rss_mb = instance.sampler.latest("rss_mb")
+            mspt = instance.sampler.latest("mspt")
+            if rss_mb is not None and rss_mb == rss_mb:
+                total_rss_mb += rss_mb
+            rss_text = f"{rss_mb:.0f}" if rss_mb is not None and rss_mb == rss_mb else "-"
+            mspt_text = f"{mspt:.1f}" if mspt else "-"
+            mspt_color = colorize_mspt(mspt) if mspt else ""
+            players_text = f"{instance.online_players}/{instance.max_players}"
+            version = instance.mc_version
+        else:
+            status_color, status = RED, "stopped"
+            rss_text = mspt_text = "-"
+            mspt_color = ""
+            players_text = f"0/{instance.max_players}"
+            version = "-"
+        print(
+            f" {marker} {instance.name:<12}{status_color}{status:<16}{RESET}{players_text:>9}{rss_text:>9}"
+            f"{mspt_color}{mspt_text:>8}{RESET}  {version}"
+        )
+    print(f"   {running}/{len(config.SERVER_INSTANCES)} running, {total_players} players, {total_rss_mb:.0f} MB RAM")
 
 
 # ===== Функция выхода из утилиты =====
 def exit_utility():
-    if is_server_running():
+    running = [instance for instance in config.SERVER_INSTANCES.values() if instance.is_running()]
+    if running:
         print(f"{RED}🛑 Stopping server before exiting...{RESET}")
-        stop_server()
+        for instance in running:
+            if not instance.is_stopping():
+                stop_server(instance=instance)
+        wait_all_stopped()
+    for instance in config.SERVER_INSTANCES.values():
+        instance.close()
     clear_terminal()
     sys.exit(0)
 
 
-# ===== Функция для чтения логов сервера =====
-def read_output(process):
+# ===== Ожидание остановки всех серверов (повторный Ctrl+C — SIGKILL) =====
+def wait_all_stopped():
     try:
-        for line in iter(process.stdout.readline, ''):
-            if line:  # Проверяем, что строка не пустая
-                sys.stdout.write(line)
-                sys.stdout.flush()
-
-                if "Starting Minecraft server on" in line:
-                    try:
-                        address_part = line.split("on")[1].strip()
-                        if ":" in address_part:
-                            ip_part, port_part = address_part.split(":", 1)
-                            detected_port = port_part.strip()
-                            config.SERVER_PORT = detected_port
-                            config.SERVER_IP = detect_hamachi_ip()
-                            config.SERVER_LOCAL_IP = get_local_ip()
-                    except Exception as e:
-                        print(f"{RED}Failed to recognize address: {e}{RESET}")
-
-
-                if "Default game type:" in line:
-                    config.SERVER_GAME_MODE = line.split("Default game type:")[1].strip()
-                if "Starting minecraft server version" in line:
-                    config.SERVER_MC_VERSION = line.split("Starting minecraft server version")[1].strip()
-                if "Done (" in line and not config.SERVER_IS_READY:
-                    config.SERVER_IS_READY = True
-                    notify_server_ready()
-                    print(f"{GREEN}✅ Server is ready!{RESET}")
-                if "joined the game" in line:
-                    config.SERVER_ONLINE_PLAYERS += 1
-                    username = line.split("joined the game")[0].split()[-1]
-                    broadcast(f"🎮 {username} joined the game!")
-                if "left the game" in line:
-                    config.SERVER_ONLINE_PLAYERS = max(0, config.SERVER_ONLINE_PLAYERS - 1)
-                    username = line.split("left the game")[0].split()[-1]
-                    broadcast(f"🔚 {username} left the game!")
-    except ValueError:
-        pass
+        for instance in config.SERVER_INSTANCES.values():
+            instance.wait_stopped()
+    except KeyboardInterrupt:
+        print(f"{RED}⚡ Killing servers...{RESET}")
+        for instance in config.SERVER_INSTANCES.values():
+            instance.kill()
+
+
+# ===== Остановка всех серверов по Ctrl+C (без уведомлений) =====
+def interrupt_all():
+    for instance in config.SERVER_INSTANCES.values():
+        if instance.is_running() and not instance.is_stopping():
+            stop_server(silent=True, instance=instance)
+    wait_all_stopped()
+
+
+# ===== Обработчики событий лога (выполняются в потоке диспетчера, не в потоке чтения) =====
+def on_server_starting(instance: ServerInstance, event: "ServerStarting"):
+    instance.port = event.port
+    NETWORK.refresh_now()
+
+
+def on_version_detected(instance: ServerInstance, event: "VersionDetected"):
+    instance.mc_version = event.version
+
+
+def on_game_mode_detected(instance: ServerInstance, event: "GameModeDetected"):
+    instance.game_mode = event.game_mode
+
+
+def on_ready(instance: ServerInstance, event: "Ready"):
+    import time
+
+    if instance.is_ready:
+        return
+    instance.is_ready = True
+    notify_server_ready(instance)
+    print(f"{GREEN}✅ Server{instance.label()} is ready!{RESET}")
+
+    if instance.restart_started is not None:
+        print(f"{GREEN}🔄 Server{instance.label()} restarted in {time.monotonic() - instance.restart_started:.1f}s{RESET}")
+        instance.restart_started = None
+
+    if instance.pregen.job is not None and instance.pregen.job["status"] == "running":
+        print(f"⛏ Resuming pre-generation{instance.label()} ({instance.pregen.progress()['percent']:.1f}% done)")
+        instance.pregen.resume_pending()
+
+
+# Длинная пауза GC рядом с текущим MSPT — чтобы было видно, что лаг от GC
+def on_gc_pause(instance: ServerInstance, event: "GcPause"):
+    mspt = instance.sampler.latest("mspt")
+    lag = f", MSPT {mspt:.1f} ms" if mspt is not None else ""
+    print(f"{YELLOW}🗑 Long GC pause{instance.label()}: {event.pause_ms:.0f} ms ({event.kind}){lag}{RESET}")
+
+
+# Лаг и восстановление — в консоль и в Telegram (категория lag), с паузами GC за то же окно
+def on_lag_spike(instance: ServerInstance, event: "LagSpike"):
+    details = f"MSPT {event.ewma_ms:.1f} ms for {event.seconds:.0f}s, peak {event.peak_ms:.1f} ms"
+    if event.unresponsive:
+        details = f"server is not answering 'tick query' ({event.seconds:.0f}s)"
+        if event.peak_ms:
+            details += f", peak MSPT {event.peak_ms:.1f} ms"
+    if event.p95_ms is not None:
+        details += f", p95 {event.p95_ms:.1f} ms"
+    if instance.gc.has_data():
+        gc_stats = instance.gc.window_stats(config.LAG_WINDOW_SECONDS)
+        if gc_stats["max_ms"] is not None:
+            details += f", GC max pause {gc_stats['max_ms']:.0f} ms"
+
+    print(f"{RED}🐢 Lag spike{instance.label()}: {details}{RESET}")
+    broadcast(f"🐢 *Lag spike{instance.label()}*\n{details}", category="lag")
+
+
+def on_lag_recovered(instance: ServerInstance, event: "LagRecovered"):
+    details = f"MSPT back to {event.ewma_ms:.1f} ms after {event.seconds:.0f}s (peak {event.peak_ms:.1f} ms)"
+    print(f"{GREEN}✅ Lag recovered{instance.label()}: {details}{RESET}")
+    broadcast(f"✅ *Lag recovered{instance.label()}*\n{details}", category="lag")
+
+
+def on_player_joined(instance: ServerInstance, event: "PlayerJoined"):
+    instance.online_players += 1
+    broadcast(f"🎮{instance.label()} {event.username} joined the game!", category="players")
+
+
+def on_player_left(instance: ServerInstance, event: "PlayerLeft"):
+    instance.online_players = max(0, instance.online_players - 1)
+    broadcast(f"🔚{instance.label()} {event.username} left the game!", category="players")
+
+
+# ===== Создание экземпляра сервера с подписанными обработчиками событий =====
+def create_instance(name: str, server_dir, run_script, data_dir_name: str = None) -> ServerInstance:
+    from log_events import (
+        ServerStarting,
+        VersionDetected,
+        GameModeDetected,
+        Ready,
+        PlayerJoined,
+        PlayerLeft,
+        GcPause,
+        LagSpike,
+        LagRecovered
+        )
+
+    instance = ServerInstance(name, server_dir, run_script, data_dir_name=data_dir_name)
+    instance.events.on(ServerStarting, partial(on_server_starting, instance))
+    instance.events.on(VersionDetected, partial(on_version_detected, instance))
+    instance.events.on(GameModeDetected, partial(on_game_mode_detected, instance))
+    instance.events.on(Ready, partial(on_ready, instance))
+    instance.events.on(PlayerJoined, partial(on_player_joined, instance))
+    instance.events.on(PlayerLeft, partial(on_player_left, instance))
+    instance.events.on(GcPause, partial(on_gc_pause, instance))
+    instance.events.on(LagSpike, partial(on_lag_spike, instance))
+    instance.events.on(LagRecovered, partial(on_lag_recovered, instance))
+    config.SERVER_INSTANCES[name] = instance
+    return instance
+
+
+# ===== Основной сервер (server/) + все из servers/<name>/ =====
+# Не при импорте: экземпляры (события, архив логов, трекеры) собираются в фоне
+# после prompt (main.deferred_startup) или первой командой — что раньше.
+_INSTANCES_LOCK = threading.Lock()
+
+
+def load_instances():
+    with _INSTANCES_LOCK:
+        if config.ACTIVE_INSTANCE is not None:
+            return
+
+        main = create_instance(config.MAIN_INSTANCE_NAME, config.SERVER_DIR, config.RUN_SCRIPT)
+        for name, server_dir, run_script in discover_instance_dirs(config.SERVERS_DIR):
+            if name in config.SERVER_INSTANCES:
+                print(f"{YELLOW}Skipping servers/{name}: name is already used{RESET}")
+                continue
+            create_instance(name, server_dir, run_script, data_dir_name=name)
+
+        for instance in config.SERVER_INSTANCES.values():
+            # Несколько серверов пишут в одну консоль — помечаем строки именем
+            if len(config.SERVER_INSTANCES) > 1:
+                instance.renderer.prefix = f"[{instance.name}] "
+            # Макс значения игроков и памяти
+            instance.max_players = get_max_players(instance)
+            instance.max_ram_mb = get_max_ram_mb(instance)
+
+        config.ACTIVE_INSTANCE = main
@@ -0,0 +1,535 @@
+# ==============================================================================
+# server_instance.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import time
+import signal
+import locale
+import threading
+import config
+
+from pathlib import Path
+from server_properties import ServerProperties
+from console_channel import ConsoleChannel, query
+from console_renderer import ConsoleRenderer
+from config import (
+    YELLOW,
+    RED,
+    RESET
+    )
+
+
+# ===== Шаблоны ответа на "tick query" =====
+# До 1.20.3 команды нет: vanilla отвечает "Unknown or incomplete command" и
+# строкой "tick query<--[HERE]", Bukkit/Paper — "Unknown command".
+TICK_QUERY_TIMEOUT = 5.0
+TICK_QUERY_PATTERN = r"Average time per tick: ([\d\.]+)ms|\]: (Unknown or incomplete command|Unknown command)"
+TICK_QUERY_BLOCK = (r"\]: (The game is running normally|The game is frozen|Target tick rate:|Average time per tick:|Percentiles:"
+                    r"|Unknown or incomplete command|Unknown command|tick query<--\[HERE\])")
+
+# Замеры MSPT выключаются после стольких "Unknown command" подряд (одна такая
+# строка может быть ответом на опечатку в консоли) или стольких запросов без
+# ответа, если сервер не ответил ни разу с запуска (формат ответа не наш).
+# Без ответа у работающего сервера — пауза между запросами растёт до TICK_BACKOFF_MAX.
+TICK_UNKNOWN_LIMIT = 2
+TICK_TIMEOUT_LIMIT = 3
+TICK_BACKOFF_MAX = 60.0
+
+# Ответ на "save-all flush" / "save-all"
+SAVE_DONE_PATTERN = r"\]: Saved the game"
+
+# Ответы на "save-off" / "save-on" (в том числе, если уже выключено/включено)
+SAVE_OFF_PATTERN = r"\]: (Automatic saving is now disabled|Saving is already turned off)"
+SAVE_ON_PATTERN = r"\]: (Automatic saving is now enabled|Saving is already turned on)"
+SAVE_TOGGLE_TIMEOUT = 10.0
+
+# Вывод сервера читается в кодировке системы, как раньше у Popen(text=True);
+# строка длиннее лимита буфера пропускается целиком
+OUTPUT_ENCODING = locale.getpreferredencoding(False)
+OUTPUT_LINE_LIMIT = 1024 * 1024
+
+
+# ===== Один Minecraft сервер под управлением tetOS =====
+# Всё, что раньше было глобальным в config (процесс, состояние из лога) и
+# синглтонами server_commands (консоль, события, архив, метрики), живёт в
+# экземпляре. Данные основного сервера лежат там же, где и раньше; данные
+# остальных — в подпапке instances/<name>.
+# Модули компонентов грузятся здесь, а не при импорте: экземпляры создаются
+# уже после prompt. Хранилище метрик, GC монитор, бэкапы и прегенерация
+# создаются при первом обращении (см. свойства ниже).
+class ServerInstance:
+    def __init__(self, name: str, server_dir: Path, run_script: Path, data_dir_name: str = None):
+        from log_archive import LogArchive
+        from log_events import LogEventEngine
+        from world_size import WorldSizeTracker
+        from metrics_sampler import MetricsSampler
+        from lag_watchdog import LagWatchdog
+
+        self.name = name
+        self.server_dir = Path(server_dir)
+        self.run_script = Path(run_script)
+
+        log_dir = config.LOG_ARCHIVE_DIR
+        self.metrics_dir = config.METRICS_STORE_DIR
+        self.backup_dir = config.BACKUP_DIR
+        self.pregen_dir = config.PREGEN_DIR
+        if data_dir_name is not None:
+            log_dir = log_dir / "instances" / data_dir_name
+            self.metrics_dir = self.metrics_dir / "instances" / data_dir_name
+            self.backup_dir = self.backup_dir / "instances" / data_dir_name
+            self.pregen_dir = self.pregen_dir / "instances" / data_dir_name
+
+        self.properties = ServerProperties(self.server_dir / "server.properties")
+        self.console = ConsoleChannel()
+        self.renderer = ConsoleRenderer(flush_interval=config.CONSOLE_FLUSH_INTERVAL)
+        self.events = LogEventEngine()
+        self.log_archive = LogArchive(
+            log_dir,
+            segment_bytes=config.LOG_ARCHIVE_SEGMENT_BYTES,
+            keep_segments=config.LOG_ARCHIVE_KEEP_SEGMENTS,
+            block_lines=config.LOG_ARCHIVE_BLOCK_LINES,
+            flush_interval=config.LOG_ARCHIVE_FLUSH_INTERVAL
+        )
+        self.world_size = WorldSizeTracker(
+            self.world_dirs,
+            refresh_interval=config.WORLD_SIZE_REFRESH_INTERVAL,
+            full_rescan_interval=config.WORLD_SIZE_FULL_RESCAN_INTERVAL
+        )
+        self.sampler = MetricsSampler(
+            get_pid=self.pid,
+            fetch_tick=self._fetch_tick_for_sampler,
+            get_players=lambda: self.online_players,
+            interval=config.METRICS_SAMPLE_INTERVAL,
+            history_seconds=config.METRICS_HISTORY_SECONDS,
+            on_sample=self._on_sample
+        )
+        self.lag = LagWatchdog(
+            threshold_ms=config.LAG_THRESHOLD_MS,
+            clear_ms=config.LAG_CLEAR_MS,
+            hold_seconds=config.LAG_HOLD_SECONDS,
+            clear_hold_seconds=config.LAG_CLEAR_HOLD_SECONDS,
+            alpha=config.LAG_EWMA_ALPHA,
+            window_seconds=config.LAG_WINDOW_SECONDS,
+            cooldown_seconds=config.LAG_COOLDOWN_SECONDS
+        )
+
+        self._metrics_store = None
+        self._gc = None
+        self._backups = None
+        self._pregen = None
+        self._components_lock = threading.Lock()
+
+        # start/stop одного экземпляра не должны пересекаться
+        self.lifecycle_lock = threading.Lock()
+        self.process = None
+        self._reader_task = None
+        self.stopping_since = None
+        self.stop_phase = None
+        self.restart_started = None
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self.max_players = 1
+        self.max_ram_mb = 2048
+        self._tick_unanswered = False
+        self.reset_state()
+
+    def __repr__(self):
+        return f"ServerInstance({self.name!r}, {str(self.server_dir)!r})"
+
+    # ===== Компоненты, которые создаются при первом обращении =====
+    @property
+    def metrics_store(self):
+        with self._components_lock:
+            if self._metrics_store is None:
+                from metrics_store import MetricsStore
+
+                self._metrics_store = MetricsStore(
+                    self.metrics_dir,
+                    segment_records=config.METRICS_SEGMENT_RECORDS,
+                    keep_segments=config.METRICS_KEEP_SEGMENTS
+                )
+            return self._metrics_store
+
+    @property
+    def gc(self):
+        with self._components_lock:
+            if self._gc is None:
+                from gc_log import GcMonitor
+                from log_events import GcPause
+
+                self._gc = GcMonitor(
+                    self.server_dir / config.GC_LOG_FILE,
+                    name=self.name,
+                    poll_interval=config.GC_POLL_INTERVAL,
+                    history_seconds=config.GC_HISTORY_SECONDS,
+                    long_pause_ms=config.GC_LONG_PAUSE_MS,
+                    on_long_pause=lambda pause: self.events.emit(GcPause(pause.line, pause.kind, pause.pause_ms))
+                )
+            return self._gc
+
+    @property
+    def backups(self):
+        with self._components_lock:
+            if self._backups is None:
+                from backup_store import BackupStore
+
+                self._backups = BackupStore(
+                    self.backup_dir,
+                    chunk_bytes=config.BACKUP_CHUNK_BYTES,
+                    workers=config.BACKUP_WORKERS
+                )
+            return self._backups
+
+    @property
+    def pregen(self):
+        with self._components_lock:
+            if self._pregen is None:
+                from pregen import PregenScheduler
+
+                self._pregen = PregenScheduler(
+                    self.pregen_dir / "job.json",
+                    console=self.console,
+                    fetch_tick=self.fetch_tick,
+                    is_ready=lambda: self.is_ready and self.is_running(),
+                    name=self.name,
+                    label=self.label,
+                    mspt_budget=config.PREGEN_MSPT_BUDGET,
+                    tile=config.PREGEN_TILE_CHUNKS,
+                    max_batch_tiles=config.PREGEN_MAX_BATCH_TILES,
+                    min_dwell=config.PREGEN_MIN_DWELL,
+                    max_dwell=config.PREGEN_MAX_DWELL,
+                    idle_poll=config.PREGEN_IDLE_POLL
+                )
+            return self._pregen
+
+    # ===== Состояние, которое заполняется из лога сервера =====
+    def reset_state(self):
+        self.is_ready = False
+        self.game_mode = "UNKNOWN"
+        self.mc_version = "UNKNOWN"
+        self.online_players = 0
+        self.port = "Unknown"
+
+        # Поддержка "tick query" (None — ещё не знаем) и счётчики для отката
+        self.tick_supported = None
+        self._tick_unknown = 0
+        self._tick_timeouts = 0
+        self._tick_retry_at = 0.0
+
+    # " [lobby]" для сообщений, когда серверов несколько; иначе пусто
+    def label(self) -> str:
+        return f" [{self.name}]" if len(config.SERVER_INSTANCES) > 1 else ""
+
+    def is_running(self) -> bool:
+        process = self.process
+        return process is not None and process.returncode is None
+
+    def is_stopping(self) -> bool:
+        return self.stopping_since is not None
+
+    # "stopped", "starting", "running", "stopping (12s)", "stopping (70s, SIGTERM)"
+    def status(self) -> str:
+        stopping_since = self.stopping_since
+        if stopping_since is not None:
+            elapsed = time.monotonic() - stopping_since
+            if self.stop_phase in ("SIGTERM", "SIGKILL"):
+                return f"stopping ({elapsed:.0f}s, {self.stop_phase})"
+            return f"stopping ({elapsed:.0f}s)"
+        if not self.is_running():
+            return "stopped"
+        return "running" if self.is_ready else "starting"
+
+    def pid(self):
+        process = self.process
+        if process is None or process.returncode is not None:
+            return None
+        return process.pid
+
+    # ===== Запуск процесса сервера и задачи чтения его вывода (в цикле RUNTIME) =====
+    def spawn(self):
+        self.events.start()
+        self.world_size.start()
+        self.sampler.start()
+        if config.LOG_ARCHIVE_ENABLED:
+            self.log_archive.start()
+        self.renderer.start()
+        self.lag.reset()
+        gc_path = self.gc_log_path()
+        if gc_path is not None:
+            self.gc.start(gc_path)
+        self.process = config.RUNTIME.run(self._spawn_process())
+
+    async def _spawn_process(self):
+        import asyncio
+
+        process = await asyncio.create_subprocess_exec(
+            str(self.run_script),
+            cwd=self.server_dir,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=OUTPUT_LINE_LIMIT,
+            # Своя группа процессов: Ctrl+C в tetOS не долетает до java напрямую,
+            # а SIGTERM/SIGKILL уходят и java, и обёртке run_server.sh
+            start_new_session=True
+        )
+        self.console.attach(lambda text: self._write_stdin(process, text))
+        self._reader_task = config.RUNTIME.loop.create_task(self._read_output(process))
+        return process
+
+    # Запись в stdin без блокировки: текст уходит в буфер транспорта в цикле,
+    # порядок команд сохраняется (call_soon — FIFO)
+    def _write_stdin(self, process, text: str) -> bool:
+        if process.returncode is not None or process.stdin is None or process.stdin.is_closing():
+            return False
+        config.RUNTIME.call_soon(process.stdin.write, text.encode(OUTPUT_ENCODING))
+        return True
+
+    async def _read_output(self, process):
+        try:
+            while True:
+                try:
+                    raw = await process.stdout.readline()
+                except ValueError:
+                    continue  # строка длиннее OUTPUT_LINE_LIMIT, буфер уже очищен
+                if not raw:
+                    break
+                if raw.endswith(b"\r\n"):
+                    raw = raw[:-2] + b"\n"
+                line = raw.decode(OUTPUT_ENCODING, errors="replace")
+
+                if self.console.feed(line):
+                    continue
+                self.renderer.write(line)
+                self.events.feed(line)
+                if config.LOG_ARCHIVE_ENABLED:
+                    self.log_archive.write(line)
+        finally:
+            self.console.detach()
+
+    # Файл GC лога из флага -Xlog:gc в run_server.sh; None — GC лог выключен
+    def gc_log_path(self):
+        from jvm_profiles import JavaCommand, find_java_line, gc_log_path
+
+        try:
+            line = find_java_line(self.run_script.read_text())
+        except OSError:
+            return None
+        flag = JavaCommand(line).gc_log_flag() if line else None
+        path = gc_log_path(flag) if flag else None
+        return self.server_dir / path if path else None
+
+    # ===== Папки мира: level-name и папки измерений Bukkit/Paper рядом с ним =====
+    def world_dirs(self) -> list:
+        level = self.properties.get("level-name", "world") or "world"
+        dirs = [self.server_dir / level]
+        for suffix in ("_nether", "_the_end"):
+            path = self.server_dir / f"{level}{suffix}"
+            if path.is_dir():
+                dirs.append(path)
+        return dirs
+
+    # ===== save-off + save-all flush: мир на диске полон и не меняется до resume_saving =====
+    # False — сервер не ответил; сохранения тогда уже могут быть выключены,
+    # resume_saving() вызывать в любом случае.
+    def pause_saving(self) -> bool:
+        if query(self.console, "save-off", SAVE_OFF_PATTERN, timeout=SAVE_TOGGLE_TIMEOUT) is None:
+            return False
+        return query(self.console, "save-all flush", SAVE_DONE_PATTERN, timeout=config.BACKUP_SAVE_TIMEOUT) is not None
+
+    def resume_saving(self) -> bool:
+        return query(self.console, "save-on", SAVE_ON_PATTERN, timeout=SAVE_TOGGLE_TIMEOUT) is not None
+
+    # ===== TPS и MSPT через "tick query" (ответ разбирает задача чтения) =====
+    def fetch_tick(self):
+        if not self.is_running() or self.tick_supported is False:
+            return 0.0, 0.0
+
+        match = query(self.console, "tick query", TICK_QUERY_PATTERN, timeout=TICK_QUERY_TIMEOUT, swallow=TICK_QUERY_BLOCK)
+        if match is None:
+            self._tick_timeouts += 1
+            return 0.0, 0.0
+        if match.group(1) is None:
+            self._tick_unknown += 1
+            if self._tick_unknown >= TICK_UNKNOWN_LIMIT and self.tick_supported is None:
+                self._disable_tick_sampling("has no 'tick query' (Minecraft before 1.20.3)")
+            return 0.0, 0.0
+
+        self.tick_supported = True
+        self._tick_unknown = 0
+        self._tick_timeouts = 0
+        mspt = float(match.group(1))
+        tps = min(20.0, 1000.0 / mspt) if mspt > 0 else 20.0
+        return tps, mspt
+
+    def _disable_tick_sampling(self, reason: str):
+        self.tick_supported = False
+        print(f"{YELLOW}Server{self.label()} {reason}, MSPT sampling is off until the next start{RESET}")
+
+    # Сервер готов, но на "tick query" не ответил — обычно он перегружен.
+    # Пока он не отвечает, запросы идут реже; пропущенный замер — тоже без ответа.
+    def _fetch_tick_for_sampler(self):
+        self._tick_unanswered = False
+        if not self.is_ready or self.tick_supported is False:
+            return 0.0, 0.0
+        if time.monotonic() < self._tick_retry_at:
+            self._tick_unanswered = self.tick_supported is True
+            return 0.0, 0.0
+
+        timeouts = self._tick_timeouts
+        tps, mspt = self.fetch_tick()
+        if self._tick_timeouts > timeouts and self.is_ready and self.is_running():
+            if self.tick_supported is None:
+                if self._tick_timeouts >= TICK_TIMEOUT_LIMIT:
+                    self._disable_tick_sampling("never answered 'tick query'")
+            else:
+                self._tick_unanswered = True
+            backoff = config.METRICS_SAMPLE_INTERVAL * 2 ** (self._tick_timeouts - 1)
+            self._tick_retry_at = time.monotonic() + min(TICK_BACKOFF_MAX, backoff)
+        return tps, mspt
+
+    # Каждый замер: на диск и в детектор лагов (спайк уходит в события сервера)
+    def _on_sample(self, timestamp, values):
+        self._persist_sample(timestamp, values)
+        event = self.lag.feed(timestamp, values["mspt"], unresponsive=self._tick_unanswered)
+        if event is not None:
+            self.events.emit(event)
+
+    def _persist_sample(self, timestamp, values):
+        rss_mb = values["rss_mb"]
+        rss_bytes = 0 if rss_mb != rss_mb else int(rss_mb * 1024 * 1024)  # NaN -> 0
+        totals = self.world_size.snapshot()
+        world_bytes = totals["total"] if totals else 0
+        try:
+            self.metrics_store.append(timestamp, values["mspt"], rss_bytes, values["players"], world_bytes)
+        except OSError as e:
+            print(f"{RED}❌ Failed to write metrics history ({self.name}): {e}{RESET}")
+
+    # ===== Остановка в фоне: save-all -> stop -> SIGTERM -> SIGKILL =====
+    # Сама остановка — корутина в цикле RUNTIME; on_stopped(elapsed)
+    # вызывается в пуле потоков. False — сервер не запущен или уже
+    # останавливается.
+    def stop_async(self, on_stopped=None) -> bool:
+        with self.lifecycle_lock:
+            if not self.is_running() or self.stopping_since is not None:
+                return False
+            self.stopping_since = time.monotonic()
+            self.stop_phase = "save-all"
+            self._stopped.clear()
+            process = self.process
+
+        config.RUNTIME.submit(self._shutdown(process, on_stopped))
+        return True
+
+    def wait_stopped(self, timeout: float = None) -> bool:
+        return self._stopped.wait(timeout)
+
+    async def _shutdown(self, process, on_stopped):
+        started = self.stopping_since
+        try:
+            if self.is_ready:
+                await self._query("save-all", SAVE_DONE_PATTERN, timeout=config.SERVER_SAVE_TIMEOUT)
+
+            self.stop_phase = "stop"
+            self.console.send("stop")
+            if not await self._wait_exit(process, config.SERVER_STOP_TIMEOUT):
+                self.stop_phase = "SIGTERM"
+                print(f"{YELLOW}⚠️ Server{self.label()} did not stop in {config.SERVER_STOP_TIMEOUT:.0f}s, sending SIGTERM{RESET}")
+                self._signal(process, force=False)
+
+                if not await self._wait_exit(process, config.SERVER_TERM_TIMEOUT):
+                    self.stop_phase = "SIGKILL"
+                    print(f"{RED}⚠️ Server{self.label()} ignored SIGTERM, sending SIGKILL{RESET}")
+                    self._signal(process, force=True)
+                    await process.wait()
+        except Exception as e:
+            print(f"{RED}❌ Failed to stop server{self.label()}: {e}{RESET}")
+            self._signal(process, force=True)
+        finally:
+            # lifecycle_lock — обычный Lock, берём его вне цикла
+            await config.RUNTIME.run_blocking(self._finish_stop, process)
+
+        if on_stopped is not None:
+            try:
+                await config.RUNTIME.run_blocking(on_stopped, time.monotonic() - started)
+            except Exception as e:
+                print(f"{RED}❌ {self.name}: {e}{RESET}")
+
+    def _finish_stop(self, process):
+        with self.lifecycle_lock:
+            if self.process is process:
+                self.process = None
+            self.reset_state()
+            self.stopping_since = None
+            self.stop_phase = None
+        self._stopped.set()
+
+    # Запрос в консоль из цикла (ответ разбирает задача чтения); None — нет ответа
+    async def _query(self, command: str, pattern, timeout: float):
+        import asyncio
+
+        try:
+            future = self.console.request(command, pattern, timeout=timeout)
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except Exception:
+            return None
+
+    # Ждём выхода процесса, печатая прогресс; False — не вышел за timeout
+    async def _wait_exit(self, process, timeout: float) -> bool:
+        import asyncio
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return process.returncode is not None
+            try:
+                await asyncio.wait_for(process.wait(), min(remaining, config.SERVER_STOP_PROGRESS_INTERVAL))
+                return True
+            except asyncio.TimeoutError:
+                print(f"{YELLOW}⏳ Server{self.label()} {self.status()}...{RESET}")
+
+    @staticmethod
+    def _signal(process, force: bool):
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+            elif force:
+                process.kill()
+            else:
+                process.terminate()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    # Немедленное завершение (второй Ctrl+C)
+    def kill(self):
+        process = self.process
+        if process is not None and process.returncode is None:
+            self._signal(process, force=True)
+
+    # Сначала останавливается сэмплер: после закрытия хранилища писать в него некому
+    def close(self):
+        self.sampler.stop(timeout=TICK_QUERY_TIMEOUT + config.METRICS_SAMPLE_INTERVAL)
+        if self._metrics_store is not None:
+            self._metrics_store.close()
+        self.log_archive.close()
+
+
+# ===== Поиск дополнительных серверов: servers/<name>/run_server.sh =====
+def discover_instance_dirs(servers_dir: Path) -> list:
+    servers_dir = Path(servers_dir)
+    if not servers_dir.is_dir():
+        return []
+
+    found = []
+    for path in sorted(servers_dir.iterdir()):
+        script = path / config.INSTANCE_RUN_SCRIPT_NAME
+        if path.is_dir() and script.exists():
+            found.append((path.name, path, script))
+    return found
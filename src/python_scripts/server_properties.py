@@ -0,0 +1,142 @@
+# ==============================================================================
+# server_properties.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import re
+import threading
+
+from pathlib import Path
+from typing import Optional
+
+
+# ===== Экранирование в стиле java.util.Properties =====
+_UNESCAPE = re.compile(r"\\(u[0-9a-fA-F]{4}|.)")
+_UNESCAPE_MAP = {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}
+
+
+def _unescape(text: str) -> str:
+    def replace(match):
+        token = match.group(1)
+        if token[0] == "u" and len(token) == 5:
+            return chr(int(token[1:], 16))
+        return _UNESCAPE_MAP.get(token, token)
+    return _UNESCAPE.sub(replace, text)
+
+
+def _escape(text: str) -> str:
+    text = text.replace("\\", "\\\\")
+    for char, escaped in (("\n", "\\n"), ("\r", "\\r"), ("\t", "\\t"), (":", "\\:"), ("=", "\\="),
+                          ("#", "\\#"), ("!", "\\!")):
+        text = text.replace(char, escaped)
+    return text
+
+
+# ===== Разбор строки key=value (комментарии и пустые строки -> None) =====
+def _parse_line(line: str):
+    stripped = line.strip()
+    if not stripped or stripped[0] in "#!":
+        return None
+    match = re.match(r"((?:\\.|[^=:\s\\])+)\s*[=:\s]\s*(.*)$", stripped)
+    if match is None:
+        return _unescape(stripped), ""
+    return _unescape(match.group(1)), _unescape(match.group(2))
+
+
+# ===== Модель server.properties =====
+# Файл разбирается один раз и перечитывается только при смене mtime/размера.
+# Строки хранятся как есть, так что комментарии и порядок ключей сохраняются;
+# изменённые ключи переписываются на своих местах, новые — в конец.
+class ServerProperties:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._lines = []
+        self._index = {}
+        self._values = {}
+        self._stamp = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _current_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self):
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return
+        lines = []
+        if stamp is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        self._load_lines(lines)
+        self._stamp = stamp
+
+    def _load_lines(self, lines: list):
+        self._lines = lines
+        self._index = {}
+        self._values = {}
+        for number, line in enumerate(lines):
+            parsed = _parse_line(line)
+            if parsed is not None:
+                key, value = parsed
+                self._index[key] = number
+                self._values[key] = value
+
+    # ===== Типизированные геттеры =====
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return self._values.get(key, default)
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        value = self.get(key)
+        try:
+            return int(value.strip())
+        except (AttributeError, ValueError):
+            return default
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self.get(key)
+        if value is None:
+            return default
+        return value.strip().lower() == "true"
+
+    def items(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._values)
+
+    # ===== Атомарная запись нескольких ключей за одну операцию =====
+    def update(self, changes: dict):
+        with self._lock:
+            self._ensure_loaded()
+            lines = list(self._lines)
+            index = dict(self._index)
+            for key, value in changes.items():
+                line = f"{_escape(key)}={_escape(str(value))}"
+                if key in index:
+                    lines[index[key]] = line
+                else:
+                    index[key] = len(lines)
+                    lines.append(line)
+
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            self._load_lines(lines)
+            self._stamp = self._current_stamp()
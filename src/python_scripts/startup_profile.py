@@ -0,0 +1,50 @@
+# ==============================================================================
+# startup_profile.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import time
+import threading
+
+from contextlib import contextmanager
+
+
+# ===== Замер фаз запуска (main.py --startup-profile) =====
+# Импортируется первым в main.py и сам ничего тяжёлого не тянет. Фазы
+# основного потока (импорты, баннер) и фоновые (telegram_bot, init_bot,
+# экспортёр) печатаются отдельными отчётами, когда каждая часть готова.
+class StartupProfile:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, background: bool = False):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases.append((name, background, begin - self.started, time.perf_counter() - begin))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def report(self, title: str, background: bool = False):
+        if not self.enabled:
+            return
+        with self._lock:
+            phases = [phase for phase in self._phases if phase[1] == background]
+
+        print(f"⏱ Startup profile: {title} at {self.elapsed_ms():.1f} ms")
+        for name, _, offset, duration in phases:
+            print(f"   {name:<28}{duration * 1000:>9.1f} ms  (+{offset * 1000:.1f} ms)")
+
+
+PROFILE = StartupProfile()
@@ -8,11 +8,14 @@
 
 
 import os
-import threading
-import telebot
 import config
 
 from dotenv import load_dotenv
+from telebot.async_telebot import AsyncTeleBot
+from telegram_dispatcher import BroadcastDispatcher
+from telegram_users import SubscriberStore, NOTIFICATION_CATEGORIES
+from metrics_sampler import format_stats_table
+from bot_health import BotHealthMonitor
 from config import (
     GREEN,
     YELLOW,
@@ -24,6 +27,14 @@ from config import (
     )
 
 
+# ===== Подписчики (загружаются один раз и живут в памяти) =====
+SUBSCRIBERS = SubscriberStore(
+    config.TELEGRAM_USERS_FILE,
+    config.TELEGRAM_USERS_JOURNAL,
+    compact_every=config.TELEGRAM_USERS_COMPACT_EVERY
+)
+
+
 # Иницилизируем бота
 def init_bot():
     load_dotenv(ENV_PATH)
@@ -36,9 +47,27 @@ def init_bot():
         print("❌ TELEGRAM_TOKEN not found in .env")
         return False
 
+    SUBSCRIBERS.load()
+
     try:
-        config.TELEGRAM_BOT = telebot.TeleBot(config.TELEGRAM_TOKEN)
+        config.TELEGRAM_BOT = AsyncTeleBot(config.TELEGRAM_TOKEN)
         config.TELEGRAM_BOT_RUNNING = True
+        config.TELEGRAM_DISPATCHER = BroadcastDispatcher(
+            send_dispatched_message,
+            workers=config.TELEGRAM_DISPATCH_WORKERS,
+            max_queue=config.TELEGRAM_DISPATCH_QUEUE_SIZE,
+            global_rate=config.TELEGRAM_GLOBAL_RATE,
+            chat_rate=config.TELEGRAM_CHAT_RATE,
+            max_retries=config.TELEGRAM_MAX_RETRIES
+        )
+        config.TELEGRAM_DISPATCHER.start()
+        # Проверка живости ходит в сеть из своего потока, сам запрос — в цикле RUNTIME
+        config.TELEGRAM_HEALTH = BotHealthMonitor(
+            lambda: config.RUNTIME.run(config.TELEGRAM_BOT.get_me()),
+            ttl=config.TELEGRAM_HEALTH_TTL,
+            max_backoff=config.TELEGRAM_HEALTH_MAX_BACKOFF
+        )
+        config.TELEGRAM_HEALTH.start()
         #bot_info = config.TELEGRAM_BOT.get_me()
         #print(f"{GREEN}✅ Telegram bot connected: @{bot_info.username}{RESET}")
 
@@ -50,9 +79,9 @@ def init_bot():
     # Обработка команд в Telegram боте
     # Обработка /start
     @config.TELEGRAM_BOT.message_handler(commands=["start"])
-    def tg_start(message):
-        save_user(message.chat.id)
-        config.TELEGRAM_BOT.send_message(
+    async def tg_start(message):
+        await config.RUNTIME.run_blocking(SUBSCRIBERS.subscribe, message.chat.id)
+        await config.TELEGRAM_BOT.send_message(
             message.chat.id,
             (
             "🤖 *TetOS connected*\n"
@@ -65,39 +94,39 @@ def init_bot():
 
     # Обработка /help
     @config.TELEGRAM_BOT.message_handler(commands=["help"])
-    def tg_help(message):
-        config.TELEGRAM_BOT.send_message(
+    async def tg_help(message):
+        await config.TELEGRAM_BOT.send_message(
             message.chat.id,
             (
                 "📖 *TetOS commands*\n\n"
                 "/start — start bot\n"
                 "/info — server info\n"
                 "/status - status server (on/off)\n"
+                "/stats [1m|15m|1h] — server metrics\n"
+                "/mute <server|players|lag> — mute a notification type\n"
+                "/unmute <server|players|lag> — unmute a notification type\n"
+                "/stop — unsubscribe from notifications\n"
                 "/help — show this message"
             ),
             parse_mode="Markdown"
         )
 
 
-    # Обработка /info
+    # Обработка /info (по всем серверам)
     @config.TELEGRAM_BOT.message_handler(commands=["info"])
-    def tg_info(message):
-        status_text = "🟢 Server is ON" if config.SERVER_IS_READY else "🔴 Server is OFF"
-
-        text = (
-            "ℹ️ *Server info*\n\n"
-            f"{status_text}\n"
-        )
-
-        if config.SERVER_IS_READY:
-            text += (
-                f"📦 Version Minecraft: {config.SERVER_MC_VERSION}\n"
-                f"🎮 Online players: {config.SERVER_ONLINE_PLAYERS} / {config.SERVER_MAX_PLAYERS}\n"
-                f"🌐 IP (Hamachi): `{config.SERVER_IP}:{config.SERVER_PORT}`\n"
-                f"📡 IP (Local): `{config.SERVER_LOCAL_IP}:{config.SERVER_PORT}`\n"
-            )
-
-        config.TELEGRAM_BOT.send_message(
+    async def tg_info(message):
+        text = "ℹ️ *Server info*\n"
+
+        for instance in config.SERVER_INSTANCES.values():
+            text += f"\n{server_status_text(instance)}\n"
+            if instance.is_ready:
+                text += (
+                    f"📦 Version Minecraft: {instance.mc_version}\n"
+                    f"🎮 Online players: {instance.online_players} / {instance.max_players}\n"
+                    f"{address_lines(instance)}"
+                )
+
+        await config.TELEGRAM_BOT.send_message(
             message.chat.id,
             text,
             parse_mode="Markdown"
@@ -106,95 +135,166 @@ def init_bot():
 
     # Обработка /status
     @config.TELEGRAM_BOT.message_handler(commands=["status"])
-    def tg_info(message):
-        status_text = "🟢 Server is ON" if config.SERVER_IS_READY else "🔴 Server is OFF"
+    async def tg_info(message):
+        text = "ℹ️ *Server status*\n\n"
+        for instance in config.SERVER_INSTANCES.values():
+            text += f"{server_status_text(instance)}\n"
 
-        text = (
-            "ℹ️ *Server status*\n\n"
-            f"{status_text}\n"
-        )
-
-        config.TELEGRAM_BOT.send_message(
+        await config.TELEGRAM_BOT.send_message(
             message.chat.id,
             text,
             parse_mode="Markdown"
         )
 
 
+    # Обработка /stats [window]
+    @config.TELEGRAM_BOT.message_handler(commands=["stats"])
+    async def tg_stats(message):
+        from server_commands import parse_duration
+
+        parts = message.text.split()
+        window = parts[1] if len(parts) > 1 else config.STATS_WINDOWS[0]
+        seconds = parse_duration(window)
+
+        if seconds is None or seconds <= 0:
+            await config.TELEGRAM_BOT.send_message(message.chat.id, "Usage: /stats [1m|15m|1h]")
+            return
+
+        text = ""
+        for instance in config.SERVER_INSTANCES.values():
+            stats = instance.sampler.window_stats(seconds)
+            if stats["samples"] == 0:
+                text += f"📈{instance.label()} No samples in the last {window}\n"
+            else:
+                table = "\n".join(format_stats_table(stats))
+                text += f"📈 *Stats{instance.label()} for the last {window}* ({stats['samples']} samples)\n```\n{table}\n```\n"
+
+        await config.TELEGRAM_BOT.send_message(message.chat.id, text, parse_mode="Markdown")
+
+
+    # Обработка /stop (отписка)
+    @config.TELEGRAM_BOT.message_handler(commands=["stop"])
+    async def tg_stop(message):
+        await config.RUNTIME.run_blocking(SUBSCRIBERS.unsubscribe, message.chat.id)
+        await config.TELEGRAM_BOT.send_message(
+            message.chat.id,
+            "🔕 You are unsubscribed from notifications.\nType /start to subscribe again."
+        )
+
+
+    # Обработка /mute и /unmute
+    @config.TELEGRAM_BOT.message_handler(commands=["mute", "unmute"])
+    async def tg_mute(message):
+        parts = message.text.split()
+        command = parts[0].lstrip("/").split("@")[0]
+        categories = "|".join(NOTIFICATION_CATEGORIES)
+
+        if len(parts) < 2 or parts[1].lower() not in NOTIFICATION_CATEGORIES:
+            await config.TELEGRAM_BOT.send_message(message.chat.id, f"Usage: /{command} <{categories}>")
+            return
+
+        if not SUBSCRIBERS.is_subscribed(message.chat.id):
+            await config.TELEGRAM_BOT.send_message(message.chat.id, "Type /start to subscribe first.")
+            return
+
+        category = parts[1].lower()
+        await config.RUNTIME.run_blocking(SUBSCRIBERS.set_preference, message.chat.id, category, "off" if command == "mute" else "on")
+        state = "muted" if command == "mute" else "unmuted"
+        await config.TELEGRAM_BOT.send_message(message.chat.id, f"✅ '{category}' notifications {state}.")
+
+
     # Обработка ВСЕГО.
     @config.TELEGRAM_BOT.message_handler(func=lambda message: True)
-    def echo_all(message):
-        config.TELEGRAM_BOT.send_message(
+    async def echo_all(message):
+        await config.TELEGRAM_BOT.send_message(
             message.chat.id,
             "❓ Unknown command.\nType /help to see available commands."
         )
 
 
     # Функция для запуска Telegram бота, бесконечная робота пока утилита живёт
-    def run_bot():
+    async def run_bot():
         try:
-            config.TELEGRAM_BOT.infinity_polling(skip_pending=True)#timeout=15, long_polling_timeout=30)
+            await config.TELEGRAM_BOT.infinity_polling(skip_pending=True)#timeout=15, long_polling_timeout=30)
             TELEGRAM_BOT_RUNNING = True
         except Exception as e:
             print(f"{RED}❌ Telegram bot crashed: {e}{RESET}")
 
-    # Переводим Telegram бота в отдельный поток
-    TELEGRAM_BOT_THREAD = threading.Thread(target=run_bot, daemon=True)
-    TELEGRAM_BOT_THREAD.start()
+    # Long polling — задача в общем цикле RUNTIME, без отдельного потока
+    config.RUNTIME.submit(run_bot())
     return True
 
 
-# ===== Загружаем Telegram юзеров =====
-def load_users():
-    if not config.TELEGRAM_USERS_FILE.exists():
-        return set()
-    return set(config.TELEGRAM_USERS_FILE.read_text().splitlines())
-
-
-# ===== Сохраняем Telegram юзеров =====
-def save_user(user_id):
-    users = load_users()
-    users.add(str(user_id))
-    config.TELEGRAM_USERS_FILE.write_text("\n".join(users))
+# ===== Отправка одного сообщения (вызывается воркерами диспетчера) =====
+# Воркер ждёт результат, чтобы лимиты и повторы диспетчера работали как раньше
+def send_dispatched_message(chat_id, text, parse_mode=None):
+    config.RUNTIME.run(config.TELEGRAM_BOT.send_message(chat_id, text, parse_mode=parse_mode))
 
 
-# ===== Уведомляем всех Telegram юзеров =====
-def broadcast(message, parse_mode="Markdown"):
+# ===== Уведомляем всех Telegram юзеров (только постановка в очередь, без ожидания сети) =====
+def broadcast(message, parse_mode="Markdown", category=None):
     if config.TELEGRAM_BOT is None or config.TELEGRAM_BOT_NOTIFICATION is False:
         return
-    for user_id in load_users():
-        try:
-            config.TELEGRAM_BOT.send_message(user_id, message, parse_mode=parse_mode if parse_mode else None)
-        except Exception as e:
-            print(f"Failed to send to {user_id}: {e}")
+    if config.TELEGRAM_DISPATCHER is None:
+        return
+    recipients = list(SUBSCRIBERS.recipients(category))
+    if not config.TELEGRAM_DISPATCHER.submit_many(recipients, message, parse_mode if parse_mode else None):
+        print(f"{YELLOW}Telegram queue is full, dropped message to {len(recipients)} chat(s){RESET}")
+
+
+# ===== Метрики очереди рассылки =====
+def get_broadcast_stats() -> dict:
+    if config.TELEGRAM_DISPATCHER is None:
+        return {}
+    return config.TELEGRAM_DISPATCHER.stats()
+
+
+# ===== Адреса сервера из кеша (config.NETWORK_ADDRESSES), по строке на адрес =====
+def address_lines(instance) -> str:
+    if config.NETWORK_ADDRESSES is None:
+        return ""
+    lines = ""
+    for kind, label, address in config.NETWORK_ADDRESSES.describe(instance.port):
+        icon = "🌐" if kind == "vpn" else "📡"
+        lines += f"{icon} IP ({label}): `{address}`\n"
+    return lines
+
+
+# ===== Строка статуса одного сервера для /info и /status =====
+def server_status_text(instance) -> str:
+    if instance.is_stopping():
+        return f"🟡 Server{instance.label()} is {instance.status()}"
+    state = "ON" if instance.is_ready else "OFF"
+    icon = "🟢" if instance.is_ready else "🔴"
+    return f"{icon} Server{instance.label()} is {state}"
 
 
 # ===== Уведомляем про запуск сервера =====
-def notify_server_ready():
+def notify_server_ready(instance):
     if not config.TELEGRAM_BOT_NOTIFICATION:
         return
 
     broadcast(
-        f"🟢 *Minecraft server started*\n\n"
-        f"📦 Verison Minecraft: {config.SERVER_MC_VERSION}\n"
-        f"🌐 IP (Hamachi): `{config.SERVER_IP}:{config.SERVER_PORT}`\n"
-        f"📡 IP (Local): `{config.SERVER_LOCAL_IP}:{config.SERVER_PORT}`\n"
+        f"🟢 *Minecraft server{instance.label()} started*\n\n"
+        f"📦 Verison Minecraft: {instance.mc_version}\n"
+        f"{address_lines(instance)}",
+        category="server"
         )
 
 # ===== Уведомляем про остановку сервера =====
-def notify_server_stopped():
+def notify_server_stopped(instance):
     if not config.TELEGRAM_BOT_NOTIFICATION:
         return
 
-    broadcast("🔴 *Minecraft server stopped*")
+    broadcast(f"🔴 *Minecraft server{instance.label()} stopped*", category="server")
 
 
 # ===== Уведомляем про рестарт сервера =====
-def notify_server_restarted():
+def notify_server_restarted(instance):
     if not config.TELEGRAM_BOT_NOTIFICATION:
         return
 
-    broadcast("🔄 *Minecraft server restarting*")
+    broadcast(f"🔄 *Minecraft server{instance.label()} restarting*", category="server")
 
 
 # ===== Функция для остановки бота =====
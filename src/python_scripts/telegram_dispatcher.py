@@ -0,0 +1,262 @@
+# ==============================================================================
+# telegram_dispatcher.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import time
+import heapq
+import itertools
+import threading
+
+from config import (
+    YELLOW,
+    RED,
+    RESET
+    )
+
+
+# ===== Token bucket для глобального лимита Telegram =====
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Забираем токен; возвращает, сколько нужно подождать до отправки
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+# ===== Одно сообщение в очереди =====
+class _Job:
+    __slots__ = ("chat_id", "text", "parse_mode", "enqueued", "attempt")
+
+    def __init__(self, chat_id, text, parse_mode):
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+        self.enqueued = time.monotonic()
+        self.attempt = 0
+
+
+# ===== Рассылка одного сообщения многим чатам: одна запись в очереди =====
+# Воркеры разворачивают её по одному чату, так что 10k подписчиков не
+# занимают 10k мест в очереди и не переполняют её одним событием.
+class _FanOut:
+    __slots__ = ("chat_ids", "position", "text", "parse_mode", "enqueued")
+
+    def __init__(self, chat_ids, text, parse_mode):
+        self.chat_ids = chat_ids
+        self.position = 0
+        self.text = text
+        self.parse_mode = parse_mode
+        self.enqueued = time.monotonic()
+
+    def remaining(self) -> int:
+        return len(self.chat_ids) - self.position
+
+    def next_job(self) -> _Job:
+        job = _Job(self.chat_ids[self.position], self.text, self.parse_mode)
+        job.enqueued = self.enqueued
+        self.position += 1
+        return job
+
+
+# ===== Достаём код ошибки и retry_after из исключения Telegram API =====
+def _parse_error(error):
+    code = getattr(error, "error_code", None)
+    retry_after = None
+    result = getattr(error, "result_json", None)
+    if isinstance(result, dict):
+        retry_after = (result.get("parameters") or {}).get("retry_after")
+    return code, retry_after
+
+
+# ===== Фоновая очередь рассылки с пулом воркеров и лимитами =====
+# Сообщения лежат в куче по времени готовности: лимит на чат (1 сообщение/сек)
+# задаёт это время при постановке, глобальный лимит проверяется воркером.
+class BroadcastDispatcher:
+    def __init__(self, send_func, workers=4, max_queue=10000, global_rate=30.0, chat_rate=1.0, max_retries=5):
+        self._send = send_func
+        self._workers_count = workers
+        self._max_queue = max_queue
+        self._chat_interval = 1.0 / chat_rate
+        self._max_retries = max_retries
+        self._bucket = TokenBucket(global_rate, global_rate)
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._chat_next = {}
+        self._fanouts = 0           # записей _FanOut в куче
+        self._fanout_pending = 0    # ещё не развёрнутых из них сообщений
+        self._not_before = 0.0      # после 429: до этого момента бот не шлёт ничего
+        self._threads = []
+        self._running = False
+
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+        self._dropped = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self._workers_count):
+            thread = threading.Thread(target=self._worker, name=f"tetos-tg-dispatch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._threads = []
+
+    # Неблокирующая постановка в очередь; False, если очередь переполнена
+    def submit(self, chat_id, text, parse_mode=None) -> bool:
+        job = _Job(chat_id, text, parse_mode)
+        with self._cond:
+            if len(self._heap) >= self._max_queue:
+                self._dropped += 1
+                return False
+            self._schedule(job, time.monotonic())
+            self._cond.notify()
+        return True
+
+    # Одно сообщение всем chat_ids одной записью; False — очередь переполнена
+    def submit_many(self, chat_ids, text, parse_mode=None) -> bool:
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return True
+        fanout = _FanOut(chat_ids, text, parse_mode)
+        with self._cond:
+            if len(self._heap) >= self._max_queue:
+                self._dropped += len(chat_ids)
+                return False
+            heapq.heappush(self._heap, (time.monotonic(), next(self._seq), fanout))
+            self._fanouts += 1
+            self._fanout_pending += len(chat_ids)
+            self._cond.notify()
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            delivered = self._sent or 1
+            return {
+                "queue_depth": len(self._heap) - self._fanouts + self._fanout_pending,
+                "sent": self._sent,
+                "failed": self._failed,
+                "retried": self._retried,
+                "dropped": self._dropped,
+                "latency_avg_ms": self._latency_total / delivered * 1000.0,
+                "latency_max_ms": self._latency_max * 1000.0,
+                "latency_last_ms": self._latency_last * 1000.0,
+            }
+
+    # Время отправки не раньше, чем разрешает лимит чата (вызывать под self._cond)
+    def _schedule(self, job, not_before):
+        ready = max(not_before, self._chat_next.get(job.chat_id, 0.0))
+        self._chat_next[job.chat_id] = ready + self._chat_interval
+        heapq.heappush(self._heap, (ready, next(self._seq), job))
+
+    def _next_job(self):
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                ready = self._heap[0][0]
+                now = time.monotonic()
+                if ready > now:
+                    self._cond.wait(ready - now)
+                    continue
+                job = heapq.heappop(self._heap)[2]
+
+                if isinstance(job, _FanOut):
+                    fanout = job
+                    job = fanout.next_job()
+                    self._fanout_pending -= 1
+                    if fanout.remaining():
+                        heapq.heappush(self._heap, (now, next(self._seq), fanout))
+                    else:
+                        self._fanouts -= 1
+                    # Чат ещё под своим лимитом — в кучу на его время
+                    if self._chat_next.get(job.chat_id, 0.0) > now:
+                        self._schedule(job, now)
+                        continue
+                    self._chat_next[job.chat_id] = now + self._chat_interval
+
+                # Чистим устаревшие отметки лимита по чатам, чтобы словарь не рос
+                if len(self._chat_next) > self._max_queue:
+                    self._chat_next = {chat: t for chat, t in self._chat_next.items() if t > now}
+                return job
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            delay = max(self._bucket.reserve(), self._not_before - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                self._send(job.chat_id, job.text, job.parse_mode)
+            except Exception as e:
+                self._handle_error(job, e)
+                continue
+
+            latency = time.monotonic() - job.enqueued
+            with self._cond:
+                self._sent += 1
+                self._latency_total += latency
+                self._latency_last = latency
+                self._latency_max = max(self._latency_max, latency)
+
+    # 429 — ждём retry_after, 5xx и сетевые ошибки — экспоненциальная задержка,
+    # остальное (403 — бот заблокирован и т.п.) не повторяем
+    def _handle_error(self, job, error):
+        code, retry_after = _parse_error(error)
+        retryable = code is None or code == 429 or code >= 500
+
+        if not retryable or job.attempt >= self._max_retries:
+            with self._cond:
+                self._failed += 1
+            print(f"{RED}Failed to send to {job.chat_id}: {error}{RESET}")
+            return
+
+        job.attempt += 1
+        if retry_after is None:
+            retry_after = min(60.0, 2 ** job.attempt)
+        if code == 429:
+            print(f"{YELLOW}Telegram rate limit hit, retrying {job.chat_id} in {retry_after}s{RESET}")
+
+        with self._cond:
+            self._retried += 1
+            # Flood limit Telegram — на весь бот: остальные воркеры тоже ждут
+            if code == 429:
+                self._not_before = max(self._not_before, time.monotonic() + float(retry_after))
+            self._chat_next.pop(job.chat_id, None)
+            self._schedule(job, time.monotonic() + float(retry_after))
+            self._cond.notify()
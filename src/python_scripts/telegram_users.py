@@ -0,0 +1,186 @@
+# ==============================================================================
+# telegram_users.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import threading
+
+from pathlib import Path
+from config import (
+    RED,
+    RESET
+    )
+
+
+# ===== Категории уведомлений, которые юзер может выключить =====
+NOTIFICATION_CATEGORIES = [
+    "server",
+    "players",
+    "lag",
+]
+
+
+# ===== Хранилище подписчиков: в памяти + append-only журнал =====
+# Снимок (tg_users.txt) совместим со старым форматом: один id на строку,
+# настройки дописываются после id как key=value. Журнал хранит изменения
+# с момента последнего снимка:
+#   + <id>                 подписка
+#   - <id>                 отписка
+#   = <id> <key> <value>   настройка
+class SubscriberStore:
+    def __init__(self, snapshot_path: Path, journal_path: Path = None, compact_every: int = 500):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = Path(journal_path) if journal_path else self.snapshot_path.with_suffix(".journal")
+        self.compact_every = compact_every
+
+        self._lock = threading.RLock()
+        self._users = {}
+        self._recipients_cache = {}
+        self._journal = None
+        self._journal_records = 0
+        self._loaded = False
+
+    # Загружаем снимок и проигрываем журнал (один раз за жизнь процесса)
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._users = {}
+
+            if self.snapshot_path.exists():
+                for line in self.snapshot_path.read_text(encoding="utf-8").splitlines():
+                    parts = line.split()
+                    if not parts:
+                        continue
+                    prefs = dict(part.split("=", 1) for part in parts[1:] if "=" in part)
+                    self._users[parts[0]] = prefs
+
+            if self.journal_path.exists():
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        self._apply(line.split())
+                        self._journal_records += 1
+
+            self._loaded = True
+            if self._journal_records >= self.compact_every:
+                self.compact()
+
+    def _apply(self, record):
+        if len(record) < 2:
+            return
+        op, user_id = record[0], record[1]
+        if op == "+":
+            self._users.setdefault(user_id, {})
+        elif op == "-":
+            self._users.pop(user_id, None)
+        elif op == "=" and len(record) >= 4 and user_id in self._users:
+            self._users[user_id][record[2]] = record[3]
+
+    # Дописываем запись в журнал и применяем её в памяти
+    def _append(self, *record):
+        record = [str(part) for part in record]
+        with self._lock:
+            self.load()
+            self._apply(record)
+            self._recipients_cache.clear()
+            try:
+                if self._journal is None:
+                    self._journal = open(self.journal_path, "a", encoding="utf-8")
+                self._journal.write(" ".join(record) + "\n")
+                self._journal.flush()
+                self._journal_records += 1
+            except OSError as e:
+                print(f"{RED}❌ Failed to write {self.journal_path.name}: {e}{RESET}")
+                return
+
+            if self._journal_records >= self.compact_every:
+                self.compact()
+
+    # Переписываем снимок через временный файл + rename и обнуляем журнал
+    def compact(self):
+        with self._lock:
+            lines = []
+            for user_id, prefs in self._users.items():
+                lines.append(" ".join([user_id] + [f"{key}={value}" for key, value in sorted(prefs.items())]))
+
+            tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                open(self.journal_path, "w", encoding="utf-8").close()
+                self._journal_records = 0
+            except OSError as e:
+                print(f"{RED}❌ Failed to compact {self.snapshot_path.name}: {e}{RESET}")
+
+    def subscribe(self, user_id) -> bool:
+        user_id = str(user_id)
+        with self._lock:
+            self.load()
+            if user_id in self._users:
+                return False
+            self._append("+", user_id)
+            return True
+
+    def unsubscribe(self, user_id) -> bool:
+        user_id = str(user_id)
+        with self._lock:
+            self.load()
+            if user_id not in self._users:
+                return False
+            self._append("-", user_id)
+            return True
+
+    def is_subscribed(self, user_id) -> bool:
+        with self._lock:
+            self.load()
+            return str(user_id) in self._users
+
+    def set_preference(self, user_id, key: str, value: str) -> bool:
+        user_id = str(user_id)
+        with self._lock:
+            self.load()
+            if user_id not in self._users or self._users[user_id].get(key) == value:
+                return False
+            self._append("=", user_id, key, value)
+            return True
+
+    def get_preferences(self, user_id) -> dict:
+        with self._lock:
+            self.load()
+            return dict(self._users.get(str(user_id), {}))
+
+    # Получатели категории; кортеж кешируется до следующего изменения
+    def recipients(self, category: str = None) -> tuple:
+        with self._lock:
+            self.load()
+            cached = self._recipients_cache.get(category)
+            if cached is None:
+                cached = tuple(
+                    user_id for user_id, prefs in self._users.items()
+                    if category is None or prefs.get(category, "on") != "off"
+                )
+                self._recipients_cache[category] = cached
+            return cached
+
+    def __len__(self):
+        with self._lock:
+            self.load()
+            return len(self._users)
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
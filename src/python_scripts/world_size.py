@@ -0,0 +1,252 @@
+# ==============================================================================
+# world_size.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import time
+import struct
+import threading
+
+from pathlib import Path
+from config import (
+    RED,
+    RESET
+    )
+
+
+# ===== Разделы мира для разбивки размера =====
+WORLD_PARTS = [
+    "overworld",
+    "nether",
+    "end",
+    "playerdata",
+]
+
+# Первая папка внутри world -> раздел (остальное считается overworld)
+_PART_BY_DIR = {
+    "DIM-1": "nether",
+    "DIM1": "end",
+    "playerdata": "playerdata",
+}
+
+# Новый формат мира: world/dimensions/minecraft/<имя>
+_PART_BY_DIMENSION = {
+    "the_nether": "nether",
+    "the_end": "end",
+}
+
+
+# ===== Форматирование размера в MB/GB =====
+def format_size(total_size: int) -> str:
+    if total_size > 1024 * 1024 * 1024:
+        return f"{total_size / (1024**3):.2f} GB"
+    else:
+        return f"{total_size / (1024**2):.2f} MB"
+
+
+# ===== inotify через ctypes (только Linux, без сторонних библиотек) =====
+class _InotifyWatcher:
+    _MASK = (
+        0x00000002      # IN_MODIFY
+        | 0x00000008    # IN_CLOSE_WRITE
+        | 0x00000040    # IN_MOVED_FROM
+        | 0x00000080    # IN_MOVED_TO
+        | 0x00000100    # IN_CREATE
+        | 0x00000200    # IN_DELETE
+    )
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = {}
+        self._watches = {}
+
+    def watch(self, path: str):
+        if path in self._watches:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self._MASK)
+        if wd >= 0:
+            self._watches[path] = wd
+            self._paths[wd] = path
+
+    # Папки, в которых что-то поменялось с прошлого вызова
+    def changed(self) -> set:
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + self._EVENT.size <= len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size + length
+                path = self._paths.get(wd)
+                if path is None:
+                    continue
+                changed.add(path)
+                if mask & 0x00008000:   # IN_IGNORED: папку удалили, watch снят ядром
+                    del self._paths[wd]
+                    self._watches.pop(path, None)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+# ===== Кеш одной папки: mtime папки, сумма размеров файлов, подпапки =====
+class _DirCache:
+    __slots__ = ("mtime_ns", "files_size", "subdirs")
+
+    def __init__(self, mtime_ns, files_size, subdirs):
+        self.mtime_ns = mtime_ns
+        self.files_size = files_size
+        self.subdirs = subdirs
+
+
+# ===== Фоновый трекер размера мира =====
+# Папка пересканируется, только если поменялся её mtime, пришло событие
+# inotify или подошло время полного прохода (ловит дозапись в файлы без
+# inotify — mtime папки при этом не меняется).
+# world_dirs() -> [папки мира]: level-name и world_nether/world_the_end у
+# Bukkit/Paper (ServerInstance.world_dirs); вызывается на каждом обновлении.
+class WorldSizeTracker:
+    def __init__(self, world_dirs, refresh_interval: float = 30.0, full_rescan_interval: float = 600.0,
+                 use_inotify: bool = True):
+        self.world_dirs = world_dirs
+        self.refresh_interval = refresh_interval
+        self.full_rescan_interval = full_rescan_interval
+        self.use_inotify = use_inotify
+
+        self._dirs = {}
+        self._totals = None
+        self._updated_at = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._watcher = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="tetos-world-size", daemon=True)
+            self._thread.start()
+
+    # Попросить внеочередное обновление (например, после бэкапа/обрезки мира)
+    def refresh_now(self, full: bool = False):
+        if full:
+            self._dirs = {}
+        self._wake.set()
+
+    # Мгновенный ответ из кеша: {"total": ..., "overworld": ..., ...} или None
+    def snapshot(self):
+        return self._totals
+
+    def exists(self) -> bool:
+        return any(Path(path).exists() for path in self.world_dirs())
+
+    def age(self):
+        if self._updated_at is None:
+            return None
+        return time.monotonic() - self._updated_at
+
+    def _run(self):
+        if self.use_inotify and hasattr(os, "O_NONBLOCK"):
+            try:
+                self._watcher = _InotifyWatcher()
+            except Exception:
+                self._watcher = None
+
+        last_full = 0.0
+        while True:
+            now = time.monotonic()
+            full = now - last_full >= self.full_rescan_interval
+            try:
+                self.refresh(full=full)
+                if full:
+                    last_full = now
+            except Exception as e:
+                print(f"{RED}❌ World size refresh failed: {e}{RESET}")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def refresh(self, full: bool = False):
+        roots = [str(path) for path in self.world_dirs() if Path(path).exists()]
+        if not roots:
+            self._dirs = {}
+            self._totals = None
+            return
+
+        dirty = self._watcher.changed() if self._watcher is not None else set()
+        dirs = {}
+        totals = dict.fromkeys(WORLD_PARTS, 0)
+
+        for root in roots:
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+
+                cached = self._dirs.get(path)
+                if cached is None or full or cached.mtime_ns != mtime_ns or path in dirty:
+                    cached = self._scan_dir(path, mtime_ns)
+                    if cached is None:
+                        continue
+                    if self._watcher is not None:
+                        self._watcher.watch(path)
+
+                dirs[path] = cached
+                totals[self._part_of(path, root)] += cached.files_size
+                stack.extend(cached.subdirs)
+
+        totals["total"] = sum(totals.values())
+
+        self._dirs = dirs
+        self._totals = totals
+        self._updated_at = time.monotonic()
+
+    @staticmethod
+    def _scan_dir(path: str, mtime_ns: int):
+        files_size = 0
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files_size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        return _DirCache(mtime_ns, files_size, subdirs)
+
+    @staticmethod
+    def _part_of(path: str, root: str) -> str:
+        parts = Path(os.path.relpath(path, root)).parts
+        if not parts or parts[0] == ".":
+            return "overworld"
+        if parts[0] == "dimensions" and len(parts) >= 3:
+            return _PART_BY_DIMENSION.get(parts[2], "overworld")
+        return _PART_BY_DIR.get(parts[0], "overworld")
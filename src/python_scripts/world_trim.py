@@ -0,0 +1,403 @@
+# ==============================================================================
+# world_trim.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import os
+import gzip
+import zlib
+import struct
+
+from pathlib import Path
+from typing import Optional
+from runtime import worker_pool
+from region_files import (
+    SECTOR_BYTES,
+    HEADER_SECTORS,
+    EXTERNAL_FLAG,
+    REGION_KINDS,
+    region_coords,
+    find_region_files,
+    read_header
+    )
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# ===== Сжатие данных чанка (байт после длины) =====
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+
+_WBITS = {
+    COMPRESSION_GZIP: 16 + zlib.MAX_WBITS,
+    COMPRESSION_ZLIB: zlib.MAX_WBITS,
+}
+
+_READ_PIECE = 16 * 1024
+
+
+# ===== Распаковка по мере чтения: NBT разбирается, пока не найдено нужное =====
+class _NbtStream:
+    def __init__(self, source: bytes, compression: int):
+        self._source = source
+        self._pos = 0
+        self._inflater = zlib.decompressobj(_WBITS[compression]) if compression in _WBITS else None
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def _fill(self) -> bool:
+        if self._offset > _READ_PIECE:
+            del self._buffer[:self._offset]
+            self._offset = 0
+
+        if self._inflater is None:
+            piece = self._source[self._pos:self._pos + _READ_PIECE]
+            self._pos += len(piece)
+            self._buffer += piece
+            return bool(piece)
+
+        while True:
+            if self._inflater.unconsumed_tail:
+                data = self._inflater.decompress(self._inflater.unconsumed_tail, _READ_PIECE)
+            elif self._pos < len(self._source):
+                piece = self._source[self._pos:self._pos + _READ_PIECE]
+                self._pos += len(piece)
+                data = self._inflater.decompress(piece, _READ_PIECE)
+            else:
+                return False
+            if data:
+                self._buffer += data
+                return True
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) - self._offset < size:
+            if not self._fill():
+                raise EOFError("NBT data ends early")
+        data = bytes(self._buffer[self._offset:self._offset + size])
+        self._offset += size
+        return data
+
+    def skip(self, size: int):
+        while size > 0:
+            available = len(self._buffer) - self._offset
+            if available == 0 and not self._fill():
+                raise EOFError("NBT data ends early")
+            step = min(size, len(self._buffer) - self._offset)
+            self._offset += step
+            size -= step
+
+    def unpack(self, fmt: struct.Struct):
+        return fmt.unpack(self.read(fmt.size))
+
+
+# ===== Минимальный разбор NBT: только числа по имени, остальное пропускается =====
+TAG_END, TAG_COMPOUND, TAG_LIST = 0, 10, 9
+_NUMBER_TAGS = {
+    1: struct.Struct(">b"),
+    2: struct.Struct(">h"),
+    3: struct.Struct(">i"),
+    4: struct.Struct(">q"),
+    5: struct.Struct(">f"),
+    6: struct.Struct(">d"),
+}
+_ARRAY_ITEM_BYTES = {7: 1, 11: 4, 12: 8}
+_U16 = struct.Struct(">H")
+_I32 = struct.Struct(">i")
+_LIST_HEADER = struct.Struct(">bi")
+
+
+def _skip_payload(stream: _NbtStream, tag: int):
+    if tag in _NUMBER_TAGS:
+        stream.skip(_NUMBER_TAGS[tag].size)
+    elif tag in _ARRAY_ITEM_BYTES:
+        stream.skip(stream.unpack(_I32)[0] * _ARRAY_ITEM_BYTES[tag])
+    elif tag == 8:
+        stream.skip(stream.unpack(_U16)[0])
+    elif tag == TAG_LIST:
+        item, count = stream.unpack(_LIST_HEADER)
+        if item in _NUMBER_TAGS:
+            stream.skip(_NUMBER_TAGS[item].size * max(count, 0))
+        else:
+            for _ in range(count):
+                _skip_payload(stream, item)
+    elif tag == TAG_COMPOUND:
+        while True:
+            child = stream.read(1)[0]
+            if child == TAG_END:
+                return
+            stream.skip(stream.unpack(_U16)[0])
+            _skip_payload(stream, child)
+    else:
+        raise ValueError(f"unknown NBT tag {tag}")
+
+
+# Числовые теги wanted из корневого compound (и вложенных compound с именами
+# из descend). Разбор останавливается, как только найдены все.
+def read_nbt_numbers(stream: _NbtStream, wanted: set, descend: set = frozenset()) -> dict:
+    found = {}
+    if stream.read(1)[0] != TAG_COMPOUND:
+        raise ValueError("NBT root is not a compound")
+    stream.skip(stream.unpack(_U16)[0])
+
+    def walk():
+        while len(found) < len(wanted):
+            tag = stream.read(1)[0]
+            if tag == TAG_END:
+                return
+            name = stream.read(stream.unpack(_U16)[0]).decode("utf-8", "replace")
+            if name in wanted and tag in _NUMBER_TAGS:
+                found[name] = stream.unpack(_NUMBER_TAGS[tag])[0]
+            elif name in descend and tag == TAG_COMPOUND:
+                walk()
+            else:
+                _skip_payload(stream, tag)
+
+    walk()
+    return found
+
+
+# ===== InhabitedTime чанка (тики, которые рядом был игрок); None — прочитать нельзя =====
+# 1.18+: в корне, раньше — в compound "Level". LZ4 (1.20.5+) и свои кодеки не читаем.
+def chunk_inhabited_time(data, offset: int, sectors: int, mcc_path: str = None) -> Optional[int]:
+    start = offset * SECTOR_BYTES
+    length, compression = struct.unpack_from(">IB", data, start)
+    if compression & EXTERNAL_FLAG:
+        if mcc_path is None:
+            return None
+        try:
+            with open(mcc_path, "rb") as f:
+                payload = f.read()
+        except OSError:
+            return None
+        compression &= ~EXTERNAL_FLAG
+    else:
+        if length < 1 or length > sectors * SECTOR_BYTES - 4:
+            return None
+        payload = data[start + 5:start + 4 + length]
+
+    if compression not in (COMPRESSION_GZIP, COMPRESSION_ZLIB, COMPRESSION_NONE):
+        return None
+    try:
+        found = read_nbt_numbers(_NbtStream(payload, compression), {"InhabitedTime"}, {"Level"})
+    except (EOFError, ValueError, zlib.error, struct.error, IndexError):
+        return None
+    return found.get("InhabitedTime")
+
+
+# ===== Точка спавна из level.dat (Data.SpawnX / Data.SpawnZ) =====
+def read_world_spawn(world_dir: Path) -> tuple:
+    try:
+        with gzip.open(Path(world_dir) / "level.dat", "rb") as f:
+            data = f.read()
+        found = read_nbt_numbers(_NbtStream(data, COMPRESSION_NONE), {"SpawnX", "SpawnZ"}, {"Data"})
+        return int(found.get("SpawnX", 0)), int(found.get("SpawnZ", 0))
+    except (OSError, EOFError, ValueError, struct.error, IndexError):
+        return 0, 0
+
+
+# ===== Блокировка мира: session.lock держит запущенный сервер (FileChannel.tryLock) =====
+class WorldLocked(Exception):
+    pass
+
+
+class SessionLocks:
+    def __init__(self):
+        self._files = []
+
+    # Берём lock сами: пока идёт обрезка, сервер не сможет открыть мир.
+    # Нет session.lock — создаём: иначе сервер, запущенный посреди обрезки, его не увидит
+    def acquire(self, world_dirs: list):
+        for world_dir in world_dirs:
+            path = Path(world_dir) / "session.lock"
+            if fcntl is None or not Path(world_dir).is_dir():
+                continue
+            f = open(path, "a+b")
+            try:
+                fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                self.release()
+                raise WorldLocked(f"{path} is locked by another process")
+            self._files.append(f)
+
+    def release(self):
+        for f in self._files:
+            try:
+                fcntl.lockf(f, fcntl.LOCK_UN)
+            finally:
+                f.close()
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# ===== Компактная перезапись region-файла без чанков drop =====
+# Данные оставшихся чанков копируются как есть (без пересжатия) подряд после
+# заголовка, метки времени сохраняются. Пустой файл удаляется вместе с .mcc
+# удалённых чанков. apply=False — только посчитать.
+# Битую запись (вне файла, 0 секторов) перенести нельзя — такой файл не
+# переписываем вовсе (ValueError), чтобы не потерять чанк молча.
+# Возвращает (размер до, размер после, удалено чанков).
+def compact_region(path: str, drop: set, apply: bool) -> tuple:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0, 0, 0
+    if len(data) < HEADER_SECTORS * SECTOR_BYTES:
+        return len(data), len(data), 0
+
+    region = region_coords(path) or (0, 0)
+    file_sectors = (len(data) + SECTOR_BYTES - 1) // SECTOR_BYTES
+    header = bytearray(HEADER_SECTORS * SECTOR_BYTES)
+    body = []
+    sector = HEADER_SECTORS
+    dropped = []
+    broken = []
+    for index, offset, sectors, timestamp in read_header(data):
+        if index in drop:
+            dropped.append(index)
+            continue
+        if offset < HEADER_SECTORS or sectors == 0 or offset + sectors > file_sectors:
+            broken.append(index)
+            continue
+        struct.pack_into(">I", header, index * 4, (sector << 8) | sectors)
+        struct.pack_into(">I", header, SECTOR_BYTES + index * 4, timestamp)
+        piece = data[offset * SECTOR_BYTES:(offset + sectors) * SECTOR_BYTES]
+        body.append(piece + bytes(sectors * SECTOR_BYTES - len(piece)))
+        sector += sectors
+
+    after = 0 if not body else sector * SECTOR_BYTES
+    if not dropped:
+        return len(data), len(data), 0
+    if broken:
+        index = broken[0]
+        raise ValueError(f"{os.path.basename(path)}: {len(broken)} broken chunk entries "
+                         f"(first {region[0] * 32 + index % 32},{region[1] * 32 + index // 32}), not rewritten")
+    if not apply:
+        return len(data), after, len(dropped)
+
+    directory = os.path.dirname(path)
+    for index in dropped:
+        mcc = os.path.join(directory, f"c.{region[0] * 32 + index % 32}.{region[1] * 32 + index // 32}.mcc")
+        if os.path.exists(mcc):
+            os.unlink(mcc)
+
+    if not body:
+        os.unlink(path)
+        return len(data), 0, len(dropped)
+
+    temp = path + ".trim.tmp"
+    with open(temp, "wb") as f:
+        f.write(header)
+        for piece in body:
+            f.write(piece)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    return len(data), after, len(dropped)
+
+
+# ===== Один region-файл (выполняется в пуле) =====
+# protected — прямоугольники в координатах чанков (x1, z1, x2, z2) этого измерения.
+# Чанки, у которых InhabitedTime прочитать нельзя, всегда остаются.
+# Те же чанки убираются из entities/ и poi/ рядом, чтобы там не осталось сирот.
+def trim_region(path: str, min_inhabited: int, protected: list, apply: bool) -> dict:
+    result = {
+        "chunks": 0,
+        "dropped": 0,
+        "unreadable": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "error": None,
+    }
+    try:
+        region = region_coords(path) or (0, 0)
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER_SECTORS * SECTOR_BYTES:
+            result["bytes_before"] = result["bytes_after"] = len(data)
+            return result
+
+        file_sectors = (len(data) + SECTOR_BYTES - 1) // SECTOR_BYTES
+        directory = os.path.dirname(path)
+        drop = set()
+        for index, offset, sectors, _ in read_header(data):
+            result["chunks"] += 1
+            cx = region[0] * 32 + index % 32
+            cz = region[1] * 32 + index // 32
+            if any(x1 <= cx <= x2 and z1 <= cz <= z2 for x1, z1, x2, z2 in protected):
+                continue
+            if offset < HEADER_SECTORS or sectors == 0 or offset + sectors > file_sectors:
+                result["unreadable"] += 1
+                continue
+            inhabited = chunk_inhabited_time(data, offset, sectors, os.path.join(directory, f"c.{cx}.{cz}.mcc"))
+            if inhabited is None:
+                result["unreadable"] += 1
+            elif inhabited < min_inhabited:
+                drop.add(index)
+        del data
+
+        # Сначала считаем все три файла: битый entities/poi не должен остаться
+        # недописанным после уже переписанного region
+        dimension_dir = os.path.dirname(directory)
+        name = os.path.basename(path)
+        siblings = [os.path.join(dimension_dir, kind, name) for kind in REGION_KINDS]
+        sizes = [compact_region(sibling, drop, False) for sibling in siblings]
+        if apply:
+            sizes = [compact_region(sibling, drop, True) for sibling in siblings]
+        result["dropped"] = len(drop)
+        result["bytes_before"] = sum(before for before, _, _ in sizes)
+        result["bytes_after"] = sum(after for _, after, _ in sizes)
+    except (OSError, ValueError, struct.error) as e:
+        result["error"] = str(e)
+    return result
+
+
+# ===== Обрезка мира: region-файлы параллельно в пуле =====
+# protected_by_dimension: измерение -> [(центр x, центр z, радиус в блоках)]
+def trim_world(world_dirs: list, min_inhabited: int, protected_by_dimension: dict, apply: bool,
+               workers: int = None) -> dict:
+    files = [(path, dimension) for path, dimension, kind in find_region_files(world_dirs) if kind == "region"]
+    workers = workers or os.cpu_count() or 2
+
+    def chunk_boxes(dimension):
+        boxes = []
+        for x, z, radius in protected_by_dimension.get(dimension, []):
+            boxes.append(((x - radius) // 16, (z - radius) // 16, (x + radius) // 16, (z + radius) // 16))
+        return boxes
+
+    results = []
+    if files:
+        with worker_pool(min(workers, len(files)), "tetos-trim") as pool:
+            results = list(pool.map(
+                trim_region,
+                [path for path, _ in files],
+                [min_inhabited] * len(files),
+                [chunk_boxes(dimension) for _, dimension in files],
+                [apply] * len(files)
+            ))
+
+    dimensions = {}
+    errors = []
+    for (path, dimension), result in zip(files, results):
+        summary = dimensions.setdefault(dimension, dict.fromkeys(
+            ("files", "chunks", "dropped", "unreadable", "bytes_before", "bytes_after"), 0))
+        summary["files"] += 1
+        for key in ("chunks", "dropped", "unreadable", "bytes_before", "bytes_after"):
+            summary[key] += result[key]
+        if result["error"] is not None:
+            errors.append((path, result["error"]))
+    return {"files": len(files), "dimensions": dimensions, "errors": errors}
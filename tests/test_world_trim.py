@@ -0,0 +1,134 @@
+# ==============================================================================
+# test_world_trim.py
+# ==============================================================================
+# Author:      AndriiBash
+# Created:     2026-10-18
+# Project:     TetOS (github.com/AndriiBash/tetOS)
+# ==============================================================================
+
+
+import sys
+import zlib
+import struct
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "python_scripts"))
+
+import pytest
+
+from region_files import SECTOR_BYTES, HEADER_SECTORS, read_header
+from world_trim import compact_region, trim_region
+
+
+# ===== Синтетический region-файл =====
+def _name(text: str) -> bytes:
+    data = text.encode()
+    return struct.pack(">H", len(data)) + data
+
+
+def _chunk_nbt(inhabited: int, filler: bytes) -> bytes:
+    body = b"\x07" + _name("Blob") + struct.pack(">i", len(filler)) + filler
+    body += b"\x04" + _name("InhabitedTime") + struct.pack(">q", inhabited)
+    return b"\x0a" + _name("") + body + b"\x00"
+
+
+# chunks: индекс -> (InhabitedTime, байты-наполнитель); возвращает {индекс: метка времени}
+def _write_region(path: Path, chunks: dict) -> dict:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = bytearray(HEADER_SECTORS * SECTOR_BYTES)
+    body = bytearray()
+    sector = HEADER_SECTORS
+    timestamps = {}
+    for index, (inhabited, filler) in chunks.items():
+        payload = zlib.compress(_chunk_nbt(inhabited, filler))
+        data = struct.pack(">IB", len(payload) + 1, 2) + payload
+        sectors = (len(data) + SECTOR_BYTES - 1) // SECTOR_BYTES
+        timestamps[index] = 1700000000 + index
+        struct.pack_into(">I", header, index * 4, (sector << 8) | sectors)
+        struct.pack_into(">I", header, SECTOR_BYTES + index * 4, timestamps[index])
+        body += data + bytes(sectors * SECTOR_BYTES - len(data))
+        sector += sectors
+    path.write_bytes(bytes(header) + bytes(body))
+    return timestamps
+
+
+# {индекс: (метка времени, байты чанка по его секторам)}
+def _chunks_of(path: Path) -> dict:
+    data = path.read_bytes()
+    return {
+        index: (timestamp, data[offset * SECTOR_BYTES:(offset + sectors) * SECTOR_BYTES])
+        for index, offset, sectors, timestamp in read_header(data)
+    }
+
+
+@pytest.fixture
+def region(tmp_path):
+    path = tmp_path / "world" / "region" / "r.0.0.mca"
+    chunks = {index: (50000, bytes([index]) * (3000 + index * 2500)) for index in (0, 1, 2, 33)}
+    chunks[1] = (0, chunks[1][1])  # игрок здесь не был
+    timestamps = _write_region(path, chunks)
+    return path, timestamps
+
+
+def test_compact_drops_one_chunk_and_keeps_the_rest_byte_identical(region):
+    path, timestamps = region
+    original = _chunks_of(path)
+    size = path.stat().st_size
+
+    before, after, dropped = compact_region(str(path), {1}, apply=True)
+
+    assert (before, dropped) == (size, 1)
+    assert path.stat().st_size == after < before
+    compacted = _chunks_of(path)
+    assert set(compacted) == {0, 2, 33}
+    for index, (timestamp, data) in compacted.items():
+        assert timestamp == timestamps[index]
+        assert data == original[index][1]
+
+
+def test_dry_run_does_not_touch_the_file(region):
+    path, _ = region
+    data = path.read_bytes()
+
+    before, after, dropped = compact_region(str(path), {1}, apply=False)
+
+    assert dropped == 1 and after < before
+    assert path.read_bytes() == data
+
+
+def test_broken_entry_is_not_dropped_silently(region):
+    path, _ = region
+    data = bytearray(path.read_bytes())
+    struct.pack_into(">I", data, 5 * 4, (9999 << 8) | 1)  # чанк 5 указывает за конец файла
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError):
+        compact_region(str(path), {1}, apply=True)
+    assert path.read_bytes() == bytes(data)
+
+
+def test_trim_region_drops_unvisited_chunks_in_region_and_entities(region, tmp_path):
+    path, timestamps = region
+    entities = tmp_path / "world" / "entities" / "r.0.0.mca"
+    _write_region(entities, {index: (0, b"entity" * 100) for index in (0, 1, 33)})
+    kept = _chunks_of(path)
+
+    result = trim_region(str(path), 1200, [], apply=True)
+
+    assert result["error"] is None
+    assert (result["chunks"], result["dropped"], result["unreadable"]) == (4, 1, 0)
+    assert set(_chunks_of(path)) == {0, 2, 33}
+    assert set(_chunks_of(entities)) == {0, 33}
+    for index, (timestamp, data) in _chunks_of(path).items():
+        assert (timestamp, data) == kept[index]
+
+
+def test_trim_region_keeps_protected_chunks(region):
+    path, _ = region
+    data = path.read_bytes()
+
+    result = trim_region(str(path), 1200, [(1, 0, 1, 0)], apply=True)
+
+    assert result["dropped"] == 0
+    assert path.read_bytes() == data